@@ -32,6 +32,93 @@ def client(server_ip: str = None) -> None:
     starter.start(mode=const.CLIENT_MODE, args=dict({'server_ip': server_ip}))
 
 
+@cli.command(help="Run a storage benchmark against a temporary array")
+@click.argument('name', type=click.Choice(['aggregate', 'codecs', 'layout', 'append', 'formats']))
+@click.option('-r', '--rows', default=1000000, help='INTEGER = number of synthetic rows to write.')
+def benchmark(name: str, rows: int = 1000000) -> None:
+    shutdown_handler.init()
+    results = starter.run_benchmark(name, rows=rows)
+    click.echo(results)
+
+
+@cli.command(name="migrate-layout", help="Rewrite a stored array into the sparse or the dense bar layout")
+@click.argument('name')
+@click.option('-d', '--datatype', default='raw', help='TEXT = bucket of the array (raw, health).')
+@click.option('-l', '--layout', type=click.Choice(['sparse', 'dense']), default='dense', help='TEXT = target layout.')
+@click.option('-p', '--period', default=None, help='TEXT = bar period of the dense layout (m1, m5, H1, D1...).')
+def migrate_layout(name: str, datatype: str = 'raw', layout: str = 'dense', period: str = None) -> None:
+    shutdown_handler.init()
+    nrows = starter.run_layout_migration(datatype, name, layout, period)
+    click.echo(f"migrated {nrows} rows of {name} to the {layout} layout")
+
+
+@cli.command(name="build-rollups", help="Roll up the whole history of the given pairs (all configured pairs by default)")
+@click.argument('pairs', nargs=-1)
+def build_rollups(pairs: tuple = ()) -> None:
+    shutdown_handler.init()
+    built = starter.run_rollup_build(list(pairs) or None)
+    for pair, done in built.items():
+        click.echo(f"{pair}: {'built' if done else 'no data to roll up'}")
+
+
+@cli.command(name="tune-storage", help="Sweep tiledb settings on a synthetic workload and save the best profile")
+@click.option('-p', '--profile', default='analytics', help='TEXT = tiledb profile to tune (ingest, analytics, ...).')
+@click.option('-w', '--workload', type=click.Choice(['read', 'write', 'mixed']), default='mixed',
+              help='TEXT = workload to optimize for.')
+@click.option('-r', '--rows', default=200000, help='INTEGER = number of synthetic rows per trial.')
+@click.option('--dry-run', is_flag=True, help='Only report the best settings without saving them.')
+def tune_storage(profile: str = 'analytics', workload: str = 'mixed', rows: int = 200000, dry_run: bool = False) -> None:
+    shutdown_handler.init()
+    result = starter.run_storage_tuning(profile, workload, rows, save=not dry_run)
+    click.echo(result)
+
+
+@cli.command(help="Backfill historical candles of the given pairs (all configured pairs by default)")
+@click.argument('pairs', nargs=-1)
+@click.option('-s', '--start', default=None, help='TEXT = first date to backfill, [backfill] start by default.')
+@click.option('-e', '--end', default=None, help='TEXT = date to backfill up to (excluded), now by default.')
+@click.option('--source', type=click.Choice(['fxcm', 'synthetic']), default=None,
+              help='TEXT = candle source, [backfill] source by default.')
+def backfill(pairs: tuple = (), start: str = None, end: str = None, source: str = None) -> None:
+    shutdown_handler.init()
+    progress = starter.run_backfill(list(pairs) or None, start, end, source)
+    for pair, state in progress.items():
+        click.echo(f"{pair}: {state['state']}, {state['done']}/{state['chunks']} chunks, {state['rows']} rows "
+                   f"at {state['rows_per_s']:.0f} rows/s")
+
+
+@cli.command(name="repair-gaps", help="Fetch the gaps of the gap index again (all configured pairs by default)")
+@click.argument('pairs', nargs=-1)
+@click.option('-u', '--retry-unavailable', is_flag=True, help='Also fetch gaps a previous repair got no candles for.')
+@click.option('--source', type=click.Choice(['fxcm', 'synthetic']), default=None,
+              help='TEXT = candle source, [crawlers] source by default.')
+def repair_gaps(pairs: tuple = (), retry_unavailable: bool = False, source: str = None) -> None:
+    shutdown_handler.init()
+    progress = starter.run_gap_repair(list(pairs) or None, retry_unavailable, source)
+    for pair, state in progress.items():
+        click.echo(f"{pair}: {state['state']}, {state['gaps']} gaps in {state['done']}/{state['requests']} requests, "
+                   f"{state['rows']} rows, {state['repaired_seconds']:.0f}s repaired, "
+                   f"{state['unavailable_seconds']:.0f}s unavailable")
+
+
+@cli.command(name="load-test", help="Drive the crawler -> TileDB ingest path with a local synthetic candle source")
+@click.option('-p', '--pairs', 'pair_counts', multiple=True, type=int, default=[3, 30, 300],
+              help='INTEGER = number of pairs of a run, repeat the option for several runs.')
+@click.option('-d', '--duration', default=60.0, help='FLOAT = seconds of every run.')
+@click.option('-l', '--latency', default=0.05, help='FLOAT = seconds the synthetic source spends per request.')
+@click.option('-e', '--error-rate', default=0.01, help='FLOAT = share of synthetic requests which fail.')
+@click.option('-c', '--concurrency', default=None, type=int, help='INTEGER = pairs crawled at once, [fxcm] concurrency by default.')
+def load_test(pair_counts: tuple = (3, 30, 300), duration: float = 60.0, latency: float = 0.05, error_rate: float = 0.01,
+              concurrency: int = None) -> None:
+    shutdown_handler.init()
+    results = starter.run_load_test(list(pair_counts), duration, latency, error_rate, concurrency)
+    for run, result in results.items():
+        click.echo(f"{run}: {result['rows_per_s']:.0f} rows/s, buffer append p50/p95/p99 {result['append_p50_ms']:.1f}/"
+                   f"{result['append_p95_ms']:.1f}/{result['append_p99_ms']:.1f}ms, {result['flushes']} flushes "
+                   f"of {result['flush_avg_ms']:.1f}ms at {result['flush_rows_per_s']:.0f} rows/s, ingest lag p50/p95 "
+                   f"{result['lag_p50_s']:.1f}/{result['lag_p95_s']:.1f}s, {result['caught_up']} pairs caught up")
+
+
 if __name__ == "__main__":
     multiprocessing.freeze_support()
     logging.basicConfig(
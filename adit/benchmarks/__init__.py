@@ -0,0 +1,18 @@
+from .common import *
+from .aggregate import *
+from .compression import *
+from .layout import *
+from .append import *
+from .formats import *
+from .tuning import *
+from .ingest import *
+
+__all__ = common.__all__ + aggregate.__all__ + compression.__all__ + layout.__all__ + append.__all__ + formats.__all__ + tuning.__all__ + ingest.__all__ + ['BENCHMARKS']
+
+BENCHMARKS = {
+    'aggregate': run_aggregate_benchmark,
+    'codecs': run_codec_benchmark,
+    'layout': run_layout_benchmark,
+    'append': run_append_benchmark,
+    'formats': run_format_benchmark,
+}
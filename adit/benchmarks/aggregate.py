@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import logging
+from typing import Dict, Any
+
+import numpy as np
+
+from adit.controllers import TileDBController
+from adit.utils import make_fx_bars
+from .common import measure, temporary_array, format_report
+
+__all__ = ['run_aggregate_benchmark']
+
+
+def _load_then_resample(tiledb: TileDBController, name: str, from_ts, to_ts, freq: str):
+    df = tiledb.get_ts_dataframe('raw', name, from_ts, to_ts - np.timedelta64(1, 'ns')).set_index('date')
+    resampler = df.resample(freq, closed='left', label='left')
+    return resampler.agg(tiledb.ohlc_rules(df.columns))[resampler.size() > 0]
+
+
+def run_aggregate_benchmark(rows: int = 1000000, freq: str = 'h') -> Dict[str, Any]:
+    logger = logging.getLogger("AggregateBenchmark")
+    tiledb = TileDBController.instance()
+    df = make_fx_bars(rows)
+    from_ts = df.index[0].to_datetime64()
+    to_ts = (df.index[-1] + (df.index[1] - df.index[0])).to_datetime64()
+
+    with temporary_array('raw', df) as name:
+        del df
+        expected, load_stats = measure(_load_then_resample, tiledb, name, from_ts, to_ts, freq)
+        actual, aggregate_stats = measure(tiledb.aggregate, name, from_ts, to_ts, freq, how='ohlc')
+
+    equal = expected.shape == actual.shape and np.allclose(expected.values, actual[expected.columns].values)
+    results = {
+        'rows': rows,
+        'bars': len(actual),
+        'equal': equal,
+        'load_then_resample': load_stats,
+        'aggregate': aggregate_stats,
+    }
+    logger.info(format_report(f"aggregate {rows} rows to {freq} bars (equal={equal})", {
+        'load_then_resample': load_stats,
+        'aggregate': aggregate_stats,
+    }))
+    return results
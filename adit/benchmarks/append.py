@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import time
+import logging
+from typing import Dict, Any
+
+import tiledb as tiledb_lib
+
+from adit.controllers import TileDBController
+from adit.utils import make_fx_bars
+from .common import temporary_array, format_report
+
+__all__ = ['run_append_benchmark']
+
+
+def _from_pandas_append(tiledb: TileDBController, uri: str, df) -> None:
+    # the append path used before the fast writer, kept here as the baseline
+    tiledb_lib.from_pandas(uri, df, sparse=True, mode='append', tile_order='row_major', cell_order='row_major',
+                           attrs_filters=tiledb_lib.FilterList([tiledb_lib.GzipFilter(level=-1)], chunksize=512000),
+                           coords_filters=tiledb_lib.FilterList([tiledb_lib.GzipFilter(level=-1)], chunksize=512000))
+
+
+def _fast_append(tiledb: TileDBController, uri: str, df) -> None:
+    tiledb.writer.write(uri, df)
+
+
+def run_append_benchmark(rows: int = 1000000, small_rows: int = 300, repeats: int = 50) -> Dict[str, Any]:
+    logger = logging.getLogger("AppendBenchmark")
+    tiledb = TileDBController.instance()
+    small = make_fx_bars(small_rows * repeats)
+    large = make_fx_bars(rows, start='2030-01-01')
+    writers = {'from_pandas': _from_pandas_append, 'fast_writer': _fast_append}
+
+    results = {}
+    for label, append in writers.items():
+        with temporary_array('raw', small.iloc[:1]) as name:
+            uri = tiledb.get_uri('raw', name)
+            starttime = time.perf_counter()
+            for i in range(repeats):
+                append(tiledb, uri, small.iloc[i * small_rows:(i + 1) * small_rows])
+            small_seconds = (time.perf_counter() - starttime) / repeats
+
+            starttime = time.perf_counter()
+            append(tiledb, uri, large)
+            large_seconds = time.perf_counter() - starttime
+
+        results[label] = {
+            f'{small_rows}_rows_ms': small_seconds * 1000,
+            f'{rows}_rows_ms': large_seconds * 1000,
+            f'{rows}_rows_per_s': rows / large_seconds,
+        }
+
+    logger.info(format_report(f"append of {repeats} x {small_rows} rows and 1 x {rows} rows", results))
+    return results
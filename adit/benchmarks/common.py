@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import time
+import uuid
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, Tuple
+
+import pandas as pd
+
+from adit.controllers import TileDBController
+
+__all__ = ['measure', 'temporary_array', 'format_report']
+
+
+def measure(fn: Callable, *args, **kwargs) -> Tuple[Any, Dict[str, float]]:
+    tracemalloc.start()
+    starttime = time.perf_counter()
+    try:
+        result = fn(*args, **kwargs)
+        elapsed = time.perf_counter() - starttime
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, {'seconds': elapsed, 'peak_mb': peak / (1024 * 1024)}
+
+
+@contextmanager
+def temporary_array(datatype: str, df: pd.DataFrame, prefix: str = "BENCH", filters: str = None,
+                    layout: str = None, period: str = None):
+    tiledb = TileDBController.instance()
+    # names starting with '__' always get their own array, even when instruments share arrays
+    name = f"__{prefix}_{uuid.uuid4().hex[:8].upper()}"
+    uri = tiledb.get_uri(datatype, name)
+    tiledb.create_dataarray(uri, filters=filters, layout=layout, period=period)
+    tiledb.write_df(uri, df)
+    try:
+        yield name
+    finally:
+        tiledb.remove_array(datatype, name)
+
+
+def format_report(title: str, rows: Dict[str, Dict[str, Any]]) -> str:
+    lines = [title]
+    for label, values in rows.items():
+        cells = ", ".join([f"{key}={value:.4f}" if isinstance(value, float) else f"{key}={value}"
+                           for key, value in values.items()])
+        lines.append(f"  {label:<24} {cells}")
+    return "\n".join(lines)
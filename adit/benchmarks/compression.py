@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import time
+import logging
+from typing import Dict, Any, List
+
+import numpy as np
+
+from adit.controllers import TileDBController
+from adit.utils import make_fx_bars
+from .common import temporary_array, format_report
+
+__all__ = ['run_codec_benchmark']
+
+
+def run_codec_benchmark(rows: int = 1000000, profiles: List[str] = None) -> Dict[str, Any]:
+    logger = logging.getLogger("CodecBenchmark")
+    tiledb = TileDBController.instance()
+    df = make_fx_bars(rows)
+    nbytes = df.memory_usage(index=True, deep=False).sum()
+    megabytes = nbytes / (1024 * 1024)
+    from_ts = df.index[0].to_datetime64()
+    to_ts = df.index[-1].to_datetime64()
+
+    results = {}
+    for profile in (profiles or tiledb.filters.names()):
+        starttime = time.perf_counter()
+        with temporary_array('raw', df, filters=profile) as name:
+            write_seconds = time.perf_counter() - starttime
+            uri = tiledb.get_uri('raw', name)
+            size = tiledb.get_array_size(uri)
+
+            starttime = time.perf_counter()
+            result = tiledb.get_ts_dataarray('raw', name, from_ts, to_ts, cache=False)
+            read_seconds = time.perf_counter() - starttime
+
+        results[profile] = {
+            'ratio': nbytes / size,
+            'write_mb_s': megabytes / write_seconds,
+            'read_mb_s': megabytes / read_seconds,
+            'equal': len(result['date']) == rows and np.array_equal(result['bidclose'], df['bidclose'].values),
+        }
+
+    logger.info(format_report(f"codecs on {rows} rows ({megabytes:.1f} MB uncompressed)", results))
+    return results
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import time
+import logging
+from typing import Dict, Any
+
+import numpy as np
+
+from adit.controllers import TileDBController, RESULT_FORMATS, to_result_format, column_buffers, arrow_available
+from adit.utils import make_fx_bars
+from .common import temporary_array, format_report
+
+__all__ = ['run_format_benchmark']
+
+
+def _read(tiledb: TileDBController, name: str, from_ts, to_ts, attrs, result_format: str):
+    # the consumer takes numpy views of every column, which is where a format may have to copy
+    raw = tiledb.get_ts_dataarray('raw', name, from_ts, to_ts, attrs=attrs, cache=False)
+    columns = column_buffers(to_result_format(raw, result_format))
+    copied = sum(values.nbytes for column, values in columns.items() if not np.shares_memory(values, raw[column]))
+    return sum(values.nbytes for values in raw.values()), copied
+
+
+def run_format_benchmark(rows: int = 1000000, windows: int = 200, window_rows: int = 1440, full_reads: int = 5,
+                         seed: int = 13) -> Dict[str, Any]:
+    logger = logging.getLogger("FormatBenchmark")
+    tiledb = TileDBController.instance()
+    df = make_fx_bars(rows, freq='1min')
+    dates = df.index.values
+    rng = np.random.RandomState(seed)
+    span = np.timedelta64(window_rows, 'm')
+    # dashboard: short windows of the close prices, metrics: whole history of every column
+    paths = {
+        'dashboard': ([(start, start + span) for start in dates[rng.randint(0, max(1, len(dates) - window_rows),
+                                                                           windows)]], ['bidclose', 'askclose']),
+        'metrics': ([(dates[0], dates[-1])] * full_reads, None),
+    }
+    formats = [result_format for result_format in RESULT_FORMATS if result_format != 'arrow' or arrow_available()]
+
+    results = {}
+    with temporary_array('raw', df) as name:
+        del df
+        for path, (ranges, attrs) in paths.items():
+            for result_format in formats:
+                nbytes, copied = 0, 0
+                starttime = time.perf_counter()
+                for from_ts, to_ts in ranges:
+                    read_bytes, copied_bytes = _read(tiledb, name, from_ts, to_ts, attrs, result_format)
+                    nbytes += read_bytes
+                    copied += copied_bytes
+                seconds = time.perf_counter() - starttime
+                results[f"{path}/{result_format}"] = {
+                    'reads': len(ranges),
+                    'ms_per_read': 1000 * seconds / len(ranges),
+                    'read_mb_per_read': nbytes / len(ranges) / (1024 * 1024),
+                    'copied_mb_per_read': copied / len(ranges) / (1024 * 1024),
+                    'copied_ratio': copied / nbytes if nbytes > 0 else 0.0,
+                }
+
+    if not arrow_available():
+        logger.info("pyarrow is not installed, the arrow result format is skipped")
+    logger.info(format_report(f"result formats on {rows} m1 bars", results))
+    return results
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import time
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, Sequence
+
+import numpy as np
+
+from adit.controllers import AsyncTileDBController, EventLoopController
+from adit.ingestors import FXCMCrawler, SyntheticCandleSource
+from .common import format_report
+
+__all__ = ['run_ingest_load_test']
+
+
+async def _load_test(npairs: int, duration: float, latency: float, error_rate: float, backlog: int,
+                     frequency: float, concurrency: int, live_window: int) -> Dict[str, Any]:
+    atiledb = AsyncTileDBController.instance()
+    # the market is always open so a run gives the same load on any day
+    source = SyntheticCandleSource(period='m1', latency=latency, error_rate=error_rate, instruments=npairs,
+                                   open_weekends=True)
+    # names starting with '__' always get their own array, they are removed after the run
+    pairs = source.get_instruments(prefix=f"__LOAD{uuid.uuid4().hex[:6].upper()}_")
+    crawler = FXCMCrawler(source=source, pairs=pairs)
+    FXCMCrawler.CRAWLERS_REGISTER.remove(crawler)
+    crawler.frequency = frequency
+    if concurrency is not None:
+        crawler.concurrency = concurrency
+    crawler.live_window = live_window
+    crawler.check_windows()
+    crawler.paused = False
+
+    # every pair starts `backlog` seconds behind, the run covers its catch-up and then live crawling
+    start = np.datetime64('now', 'ns') - np.timedelta64(backlog, 's')
+    await atiledb.store_kv_many({FXCMCrawler.checkpoint_key(pair): start for pair in pairs})
+    flushes_before = atiledb.tiledb.get_write_stats()
+
+    starttime = time.time()
+    task = asyncio.ensure_future(crawler._run(None))
+    try:
+        await asyncio.sleep(duration)
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+    # store_df only appends to the write buffer, the rows still buffered are written to tiledb before the
+    # clock stops so the run pays for every fragment it produced
+    flushstart = time.time()
+    for pair in pairs:
+        await atiledb.flush(atiledb.tiledb.get_uri('raw', pair.replace("/", "")))
+    final_flush = time.time() - flushstart
+    elapsed = time.time() - starttime
+    flushes_after = atiledb.tiledb.get_write_stats()
+
+    stats = crawler.get_stats()
+    try:
+        for pair in pairs:
+            await atiledb.remove_array('raw', pair.replace("/", ""))
+            await atiledb.run(atiledb.tiledb.rollups.remove, pair.replace("/", ""))
+        await atiledb.delete_kv_many([FXCMCrawler.checkpoint_key(pair) for pair in pairs])
+    except Exception as ex:
+        logging.getLogger("IngestLoadTest").warning("Failed to remove load test arrays", exc_info=ex)
+
+    pair_stats = stats['pairs'].values()
+    rows = sum(state['rows'] for state in pair_stats)
+    writes, lag = stats['write_durations'], stats['ingest_lag']
+    flushes = flushes_after['flushes'] - flushes_before['flushes']
+    flushed_rows = flushes_after['flushed_rows'] - flushes_before['flushed_rows']
+    flush_time = flushes_after['flush_latency_total'] - flushes_before['flush_latency_total']
+    return {
+        'rows': rows,
+        'rows_per_s': rows / elapsed,
+        'crawls': stats['cycle_durations']['count'],
+        'crawl_p95_s': stats['cycle_durations']['p95'],
+        # store_df calls of the crawler, a call only includes a tiledb write when it fills the buffer
+        'append_p50_ms': writes['p50'] * 1000,
+        'append_p95_ms': writes['p95'] * 1000,
+        'append_p99_ms': writes['p99'] * 1000,
+        # fragments written to tiledb during the run and by its final flush
+        'flushes': flushes,
+        'flush_avg_ms': flush_time / flushes * 1000 if flushes > 0 else 0.0,
+        'flush_rows_per_s': flushed_rows / flush_time if flush_time > 0 else 0.0,
+        'final_flush_s': final_flush,
+        'flush_errors': flushes_after['flush_errors'] - flushes_before['flush_errors'],
+        'lag_p50_s': lag['p50'],
+        'lag_p95_s': lag['p95'],
+        'lag_max_s': lag['max'],
+        'caught_up': sum(1 for state in pair_stats if not state['catching_up']),
+        'timeouts': sum(state['timeouts'] for state in pair_stats),
+        'source_errors': stats['connections']['errors'],
+    }
+
+
+def run_ingest_load_test(pair_counts: Sequence[int] = (3, 30, 300), duration: float = 60.0, latency: float = 0.05,
+                         error_rate: float = 0.01, backlog: int = 3600, frequency: float = 5.0, concurrency: int = None,
+                         live_window: int = 60) -> Dict[str, Any]:
+    # drives crawler -> tiledb against the synthetic source for every pair count, `concurrency` defaults to
+    # the configured crawl concurrency
+    logger = logging.getLogger("IngestLoadTest")
+    loop = EventLoopController.instance().get_loop()
+    results = OrderedDict()
+    for npairs in pair_counts:
+        logger.info(f"load testing the ingest path with {npairs} pairs for {duration}s")
+        results[f"{npairs} pairs"] = loop.run_until_complete(
+            _load_test(npairs, duration, latency, error_rate, backlog, frequency, concurrency, live_window))
+
+    logger.info(format_report(f"ingest load test, {duration}s per run, {latency * 1000:.0f}ms latency, "
+                              f"{error_rate * 100:.1f}% errors", results))
+    return results
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import time
+import logging
+from typing import Dict, Any
+
+import numpy as np
+
+from adit.controllers import TileDBController
+from adit.utils import make_fx_bars
+from .common import temporary_array, format_report
+
+__all__ = ['run_layout_benchmark']
+
+
+def run_layout_benchmark(rows: int = 1000000, windows: int = 200, window_rows: int = 1440,
+                         seed: int = 13) -> Dict[str, Any]:
+    logger = logging.getLogger("LayoutBenchmark")
+    tiledb = TileDBController.instance()
+    df = make_fx_bars(rows, freq='1min')
+    # drop a few bars to mimic weekends and missing candles, the dense layout has to skip them on read
+    rng = np.random.RandomState(seed)
+    df = df[rng.rand(len(df.index)) > 0.05]
+    dates = df.index.values
+    starts = dates[rng.randint(0, max(1, len(dates) - window_rows), windows)]
+    span = np.timedelta64(window_rows, 'm')
+
+    results = {}
+    reference = None
+    for layout in ['sparse', 'dense']:
+        with temporary_array('raw', df, layout=layout, period='m1') as name:
+            size = tiledb.get_array_size(tiledb.get_uri('raw', name))
+
+            starttime = time.perf_counter()
+            full = tiledb.get_ts_dataarray('raw', name, dates[0], dates[-1], cache=False)
+            full_seconds = time.perf_counter() - starttime
+
+            starttime = time.perf_counter()
+            nrows = 0
+            for start in starts:
+                window = tiledb.get_ts_dataarray('raw', name, start, start + span, attrs=['bidclose'], cache=False)
+                nrows += len(window['date'])
+            window_seconds = time.perf_counter() - starttime
+
+        if reference is None:
+            reference = full
+        results[layout] = {
+            'size_mb': size / (1024 * 1024),
+            'full_read_s': full_seconds,
+            'window_reads_s': window_seconds,
+            'window_rows': nrows,
+            'equal': np.array_equal(reference['date'], full['date']) and
+                     np.array_equal(reference['bidclose'], full['bidclose']),
+        }
+
+    logger.info(format_report(f"layouts on {len(df.index)} m1 bars with {windows} windows of {window_rows} bars",
+                              results))
+    return results
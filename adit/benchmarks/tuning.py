@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, Any
+
+import numpy as np
+import tiledb as tiledb_lib
+
+from adit.controllers import TileDBController, FastArrayWriter
+from adit.utils import make_fx_bars, get_ncores
+from .common import temporary_array, format_report
+
+__all__ = ['run_storage_tuning']
+
+_MB = 1024 * 1024
+
+
+def _sweep(ncores: int) -> OrderedDict:
+    return OrderedDict([
+        ('sm.num_reader_threads', [1, 2, 4, ncores]),
+        ('sm.num_writer_threads', [1, 2, 4, ncores]),
+        ('sm.tile_cache_size', [10 * _MB, 100 * _MB, 500 * _MB]),
+        ('vfs.num_threads', [2, 4, ncores]),
+        ('vfs.s3.max_parallel_ops', [ncores, 2 * ncores, 4 * ncores]),
+        ('vfs.s3.multipart_part_size', [5 * _MB, 16 * _MB, 64 * _MB]),
+    ])
+
+
+def _run_workload(ctx, uri: str, df, workload: str, chunk_rows: int, windows: np.ndarray) -> float:
+    seconds = 0.0
+    writer = FastArrayWriter(ctx=ctx)
+    starttime = time.perf_counter()
+    for i in range(0, len(df.index), chunk_rows):
+        writer.write(uri, df.iloc[i:i + chunk_rows])
+    if workload in ('write', 'mixed'):
+        seconds += time.perf_counter() - starttime
+
+    if workload in ('read', 'mixed'):
+        starttime = time.perf_counter()
+        with tiledb_lib.open(uri, 'r', ctx=ctx) as A:
+            A[df.index.values[0]:df.index.values[-1]]
+            for start in windows:
+                A.query(attrs=['bidclose', 'askclose'])[start:start + np.timedelta64(1, 'D')]
+        seconds += time.perf_counter() - starttime
+    return seconds
+
+
+def run_storage_tuning(rows: int = 200000, profile: str = 'analytics', workload: str = 'mixed',
+                       chunk_rows: int = 10000, windows: int = 50, save: bool = True) -> Dict[str, Any]:
+    # coordinate descent over the sweep: every setting is tried on its own, keeping the best value so far
+    logger = logging.getLogger("StorageTuning")
+    tiledb = TileDBController.instance()
+    if tiledb.storage.backend == 'mem':
+        # every profile shares the one context holding the in-memory filesystem, there are no settings to try
+        raise ValueError(f"Cannot tune tiledb settings on the in-memory storage root {tiledb.storage.root}, "
+                         f"point [tiledb] storage_root to a local directory or s3 to tune them")
+    df = make_fx_bars(rows)
+    rng = np.random.RandomState(13)
+    starts = df.index.values[rng.randint(0, len(df.index), windows)]
+
+    def score(settings: Dict[str, str]) -> float:
+        ctx = tiledb_lib.Ctx(config=tiledb.profiles.tiledb_config(profile, overrides=settings))
+        with temporary_array('raw', df.iloc[:1]) as name:
+            return _run_workload(ctx, tiledb.get_uri('raw', name), df.iloc[1:], workload, chunk_rows, starts)
+
+    best = tiledb.profiles.settings(profile)
+    initial_score = best_score = score(best)
+    trials = OrderedDict([('initial', {'seconds': initial_score})])
+    for key, values in _sweep(get_ncores()).items():
+        if key.startswith("vfs.s3.") and tiledb.storage.backend != 's3':
+            continue
+        for value in sorted(set(values)):
+            if str(value) == best.get(key):
+                continue
+            candidate = dict(best, **{key: str(value)})
+            seconds = score(candidate)
+            trials[f"{key}={value}"] = {'seconds': seconds}
+            if seconds < best_score:
+                best, best_score = candidate, seconds
+
+    logger.info(format_report(f"tuning of profile {profile} on a {workload} workload of {rows} rows", trials))
+    logger.info(f"best settings of {profile}: {best} ({initial_score:.3f}s -> {best_score:.3f}s)")
+    if save:
+        tiledb.profiles.save(profile, best)
+    return {'profile': profile, 'settings': best, 'initial_seconds': initial_score, 'best_seconds': best_score}
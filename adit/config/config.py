@@ -40,6 +40,57 @@ class Config:
         self.config['adit']['cluster_user'] = const.DEFAULT_CLUSTER_USER
         self.config['adit']['cluster_pass'] = const.DEFAULT_CLUSTER_PASS
         self.config['adit']['queue_size'] = const.DEFAULT_EVENT_LOOP_QUEUE_SIZE
+
+        self.config['tiledb'] = {}
+        self.config['tiledb']['storage_root'] = const.DEFAULT_STORAGE_ROOT
+        self.config['tiledb']['buffer_max_rows'] = str(const.DEFAULT_BUFFER_MAX_ROWS)
+        self.config['tiledb']['buffer_max_bytes'] = str(const.DEFAULT_BUFFER_MAX_BYTES)
+        self.config['tiledb']['buffer_max_age'] = str(const.DEFAULT_BUFFER_MAX_AGE)
+        self.config['tiledb']['buffer_flush_interval'] = str(const.DEFAULT_BUFFER_FLUSH_INTERVAL)
+        self.config['tiledb']['reader_ttl'] = str(const.DEFAULT_READER_TTL)
+        self.config['tiledb']['result_cache_bytes'] = str(const.DEFAULT_RESULT_CACHE_BYTES)
+        self.config['tiledb']['io_threads'] = str(const.DEFAULT_IO_THREADS)
+        self.config['tiledb']['io_queue_size'] = str(const.DEFAULT_IO_QUEUE_SIZE)
+        self.config['tiledb']['profile'] = const.DEFAULT_TILEDB_PROFILE
+        self.config['tiledb']['read_profile'] = const.DEFAULT_READ_PROFILE
+        self.config['tiledb']['write_profile'] = const.DEFAULT_WRITE_PROFILE
+        self.config['tiledb']['scan_profile'] = const.DEFAULT_SCAN_PROFILE
+        self.config['tiledb']['raw_filters'] = const.DEFAULT_FILTER_PROFILE
+        self.config['tiledb']['health_filters'] = const.DEFAULT_FILTER_PROFILE
+        self.config['tiledb']['raw_layout'] = const.DEFAULT_RAW_LAYOUT
+        self.config['tiledb']['raw_period'] = const.DEFAULT_RAW_PERIOD
+        self.config['tiledb']['instrument_layout'] = const.DEFAULT_INSTRUMENT_LAYOUT
+        self.config['tiledb']['rollup_base'] = const.DEFAULT_ROLLUP_BASE
+        self.config['tiledb']['rollup_levels'] = const.DEFAULT_ROLLUP_LEVELS
+        self.config['tiledb']['iter_chunk_rows'] = str(const.DEFAULT_ITER_CHUNK_ROWS)
+        self.config['tiledb']['iter_window'] = str(const.DEFAULT_ITER_WINDOW)
+        self.config['tiledb']['aggregate_window'] = str(const.DEFAULT_AGGREGATE_WINDOW)
+
+        self.config['backfill'] = {}
+        self.config['backfill']['source'] = const.DEFAULT_BACKFILL_SOURCE
+        self.config['backfill']['workers'] = str(const.DEFAULT_BACKFILL_WORKERS)
+        self.config['backfill']['chunk_bars'] = str(const.DEFAULT_BACKFILL_CHUNK_BARS)
+        self.config['backfill']['write_rows'] = str(const.DEFAULT_BACKFILL_WRITE_ROWS)
+        self.config['backfill']['retries'] = str(const.DEFAULT_BACKFILL_RETRIES)
+        self.config['backfill']['start'] = const.DEFAULT_BACKFILL_START
+
+        self.config['gaps'] = {}
+        self.config['gaps']['min_gap'] = str(const.DEFAULT_GAP_MIN)
+        self.config['gaps']['repair_workers'] = str(const.DEFAULT_GAP_REPAIR_WORKERS)
+        self.config['gaps']['repair_retries'] = str(const.DEFAULT_GAP_REPAIR_RETRIES)
+
+        self.config['ratelimit'] = {}
+        self.config['ratelimit']['fxcm_rate'] = str(const.DEFAULT_FXCM_RATE)
+        self.config['ratelimit']['fxcm_burst'] = str(const.DEFAULT_FXCM_BURST)
+        self.config['ratelimit']['retry_base'] = str(const.DEFAULT_RETRY_BASE)
+        self.config['ratelimit']['retry_max'] = str(const.DEFAULT_RETRY_MAX)
+
+        self.config['tiledb_maintenance'] = {}
+        self.config['tiledb_maintenance']['frequency'] = str(const.DEFAULT_MAINTENANCE_FREQUENCY)
+        self.config['tiledb_maintenance']['probe_window'] = str(const.DEFAULT_MAINTENANCE_PROBE_WINDOW)
+        for datatype in ['raw', 'health', 'meta']:
+            self.config['tiledb_maintenance'][f'{datatype}_min_fragments'] = str(const.DEFAULT_MAINTENANCE_MIN_FRAGMENTS)
+            self.config['tiledb_maintenance'][f'{datatype}_small_fragment_size'] = str(const.DEFAULT_MAINTENANCE_SMALL_FRAGMENT_SIZE)
         print(self.workdir)
         print(self.configfile)
         print(self.loggingconf)
@@ -92,6 +143,18 @@ class Config:
                 logging.error(f"wrong config type for {section}.{key}. Expected integer value instead.", ex)
                 raise Exception(f"wrong config type for {section}.{key}. Expected integer value instead.")
 
+    def get_float(self, section: str, key: str, default: float = None) -> Union[float, None]:
+        res = self.get_str(section=section, key=key, default=None)
+        if res is None:
+            return default
+        else:
+            try:
+                res = float(res)
+                return res
+            except Exception as ex:
+                logging.error(f"wrong config type for {section}.{key}. Expected float value instead.", ex)
+                raise Exception(f"wrong config type for {section}.{key}. Expected float value instead.")
+
     def get_bool(self, section: str, key: str, default: bool = False) -> bool:
         res = self.get_str(section=section, key=key, default=None)
         if res is None:
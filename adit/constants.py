@@ -47,6 +47,63 @@ DEFAULT_CLUSTER_PASS = "aditadmin"
 
 DEFAULT_EVENT_LOOP_QUEUE_SIZE = "50"
 
+DEFAULT_BUFFER_MAX_ROWS = 50000
+DEFAULT_BUFFER_MAX_BYTES = 32 * 1024 * 1024
+DEFAULT_BUFFER_MAX_AGE = 3600  # seconds
+DEFAULT_BUFFER_FLUSH_INTERVAL = 60  # seconds
+DEFAULT_ITER_CHUNK_ROWS = 100000
+DEFAULT_ITER_WINDOW = 86400  # seconds of the first window read by iter_ts, later ones follow the data density
+DEFAULT_AGGREGATE_WINDOW = 7 * 86400  # seconds of source rows read per aggregation step
+DEFAULT_STORAGE_ROOT = "s3://"  # a local directory or mem:// stores the arrays without SeaweedFS
+DEFAULT_TILEDB_PROFILE = "default"
+DEFAULT_READ_PROFILE = "default"
+DEFAULT_WRITE_PROFILE = "default"
+DEFAULT_SCAN_PROFILE = "scan"  # profile of the windowed reads of iter_ts and aggregate
+DEFAULT_FILTER_PROFILE = "gzip"
+DEFAULT_RAW_LAYOUT = "sparse"  # or "dense" to address fixed period bars by their index
+DEFAULT_RAW_PERIOD = "m1"
+DEFAULT_INSTRUMENT_LAYOUT = "per_array"  # or "shared" to keep all instruments of a data type in one array
+DEFAULT_ROLLUP_BASE = "1min"  # resolution of the raw bars
+DEFAULT_ROLLUP_LEVELS = "m5:5min,H1:h,D1:D,W1:W-SUN"
+DEFAULT_RESULT_CACHE_BYTES = 256 * 1024 * 1024  # memory budget of cached query results, 0 disables the cache
+DEFAULT_READER_TTL = 60  # seconds before a pooled reader is reopened to pick up writes of other processes
+DEFAULT_IO_THREADS = 4  # threads of the io executor behind AsyncTileDBController
+DEFAULT_IO_QUEUE_SIZE = 64  # tiledb calls allowed to wait for an io thread before callers are suspended
+
+DEFAULT_CRAWL_SOURCE = "fxcm"  # candle source of the crawler, "synthetic" crawls generated candles offline
+DEFAULT_CRAWL_CONCURRENCY = 4  # pairs crawled at the same time
+DEFAULT_CRAWL_PAIR_TIMEOUT = 120  # seconds before a crawl of one pair is cancelled and retried next cycle
+DEFAULT_CRAWL_LIVE_WINDOW = 300  # seconds of candles per live request, also how old they must be to be crawled
+DEFAULT_CRAWL_MAX_BARS = 10000  # candles fxcm serves per request, bounds the catch-up windows
+DEFAULT_FXCM_CONNECTIONS = 2  # fxcm sessions shared by the crawler and the backfill of one process
+DEFAULT_FXCM_HEALTH_INTERVAL = 30  # seconds between health checks of idle fxcm sessions
+DEFAULT_FXCM_RECONNECT_BACKOFF = 1  # seconds before the first reconnect attempt, doubled after every failure
+DEFAULT_FXCM_RECONNECT_BACKOFF_MAX = 300
+DEFAULT_FXCM_ACQUIRE_TIMEOUT = 60  # seconds a fetch waits for an established fxcm session
+
+DEFAULT_SOURCE_RATE = 0.0  # requests per second of a data source without a [ratelimit] entry, 0 is unlimited
+DEFAULT_INSTRUMENT_RATE = 0.0  # requests per second per instrument of a source, 0 only limits the source
+DEFAULT_FXCM_RATE = 2.0
+DEFAULT_FXCM_BURST = 5
+DEFAULT_RETRY_BASE = 0.5  # seconds, retries back off exponentially from it with full jitter
+DEFAULT_RETRY_MAX = 30.0
+
+DEFAULT_BACKFILL_SOURCE = "fxcm"  # or "synthetic" to backfill generated candles offline
+DEFAULT_BACKFILL_WORKERS = 4
+DEFAULT_BACKFILL_CHUNK_BARS = 10000  # candles per broker request, fxcm serves at most 10000
+DEFAULT_BACKFILL_WRITE_ROWS = 500000  # rows of fetched chunks written as one sorted fragment
+DEFAULT_BACKFILL_RETRIES = 3
+DEFAULT_BACKFILL_START = "2015-01-01"
+
+DEFAULT_GAP_MIN = 300  # seconds, shorter holes inside a crawled window are taken for a quiet market
+DEFAULT_GAP_REPAIR_WORKERS = 2  # gap requests in flight per repair
+DEFAULT_GAP_REPAIR_RETRIES = 3
+
+DEFAULT_MAINTENANCE_FREQUENCY = 3600  # seconds
+DEFAULT_MAINTENANCE_PROBE_WINDOW = 86400  # seconds of data read to measure read latency
+DEFAULT_MAINTENANCE_MIN_FRAGMENTS = 16
+DEFAULT_MAINTENANCE_SMALL_FRAGMENT_SIZE = 1024 * 1024
+
 DEFAULT_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
 
 WEED_VERSION = "1.82"
@@ -2,7 +2,24 @@ from .dask_controller import *
 from .dfs_controller import *
 from .evenloop_controller import *
 from .pool_controller import *
+from .tiledb_buffer import *
+from .tiledb_pool import *
+from .tiledb_kvstore import *
+from .tiledb_gaps import *
+from .tiledb_query import *
+from .tiledb_rollup import *
+from .tiledb_filters import *
+from .tiledb_dense import *
+from .tiledb_instruments import *
+from .tiledb_writer import *
+from .tiledb_profiles import *
+from .tiledb_storage import *
+from .tiledb_cache import *
+from .tiledb_results import *
 from .tiledb_controller import *
+from .tiledb_async import *
+from .tiledb_dask import *
+from .tiledb_maintenance import *
 
 
 __all__ = (
@@ -10,5 +27,22 @@ __all__ = (
         dfs_controller.__all__ +
         evenloop_controller.__all__ +
         pool_controller.__all__ +
-        tiledb_controller.__all__
+        tiledb_buffer.__all__ +
+        tiledb_pool.__all__ +
+        tiledb_kvstore.__all__ +
+        tiledb_gaps.__all__ +
+        tiledb_query.__all__ +
+        tiledb_rollup.__all__ +
+        tiledb_filters.__all__ +
+        tiledb_dense.__all__ +
+        tiledb_instruments.__all__ +
+        tiledb_writer.__all__ +
+        tiledb_profiles.__all__ +
+        tiledb_storage.__all__ +
+        tiledb_cache.__all__ +
+        tiledb_results.__all__ +
+        tiledb_controller.__all__ +
+        tiledb_async.__all__ +
+        tiledb_dask.__all__ +
+        tiledb_maintenance.__all__
 )
@@ -9,6 +9,7 @@ from typing import Dict
 from adit.config import Config
 from adit.utils import *
 from adit import constants as const
+from .tiledb_storage import storage_backend
 
 __all__ = ['DfsController']
 
@@ -42,8 +43,17 @@ class DfsController:
         self.bindir: str = os.path.join(self.workdir, 'bin')
         self.binpath: str = os.path.join(self.bindir, self.binname)
         self.dfsprocs: Dict[str, Popen] = dict()
+        self.storage_root: str = self.config.get_str(section='tiledb', key='storage_root', default=const.DEFAULT_STORAGE_ROOT)
+
+    def is_required(self) -> bool:
+        # only the s3 storage backend goes through the SeaweedFS gateway
+        return storage_backend(self.storage_root) == 's3'
 
     def start(self, mode: str = None) -> None:
+        if not self.is_required():
+            self.logger.info(f"TileDB storage root is {self.storage_root}, DFS is not started")
+            return
+
         self.logger.info(f"Starting up DFS with {self.binpath}")
         commands: Dict[str, str] = None
         cwd: str = None
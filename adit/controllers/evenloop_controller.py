@@ -32,6 +32,10 @@ class EventLoopController:
         if task is not None:
             task.cancel()
 
+    def is_running(self, name: str) -> bool:
+        task = self.taskmap.get(name)
+        return task is not None and not task.done()
+
     def get_loop(self) -> AbstractEventLoop:
         return self.loop
 
@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import time
+import asyncio
+import logging
+import threading
+import concurrent.futures
+from typing import Dict, Callable
+
+from adit.config import Config
+import adit.constants as const
+from .tiledb_controller import TileDBController
+
+__all__ = ['AsyncTileDBController']
+
+
+class AsyncTileDBController:
+    # awaitable facade of TileDBController for code running on the event loop. every call runs on a dedicated,
+    # bounded pool of io threads so tiledb never blocks the loop; at most `io_queue_size` calls wait for a thread,
+    # further callers are suspended until there is room. writes to the same array are serialized on the loop,
+    # so they wait as coroutines and do not hold an io thread while another write of that array is running.
+    _INSTANCE = None
+    _EXECUTOR_PREFIX = "tiledb-io"
+
+    def __init__(self, tiledb: TileDBController = None):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.config = Config.instance()
+        self.tiledb = TileDBController.instance() if tiledb is None else tiledb
+        self.io_threads = self.config.get_int("tiledb", "io_threads", const.DEFAULT_IO_THREADS)
+        self.io_queue_size = self.config.get_int("tiledb", "io_queue_size", const.DEFAULT_IO_QUEUE_SIZE)
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.io_threads,
+                                                              thread_name_prefix=self._EXECUTOR_PREFIX)
+        self.slots = None
+        self.write_locks: Dict[str, asyncio.Lock] = {}
+        self.lock = threading.Lock()
+        self.stats = {
+            'submitted': 0,
+            'completed': 0,
+            'errors': 0,
+            'queued': 0,
+            'running': 0,
+            'blocked': 0,
+            'max_queued': 0,
+            'queue_wait': 0.0,
+            'max_queue_wait': 0.0,
+        }
+
+    def _slots(self) -> asyncio.Semaphore:
+        # created lazily so the semaphore belongs to the loop which awaits it
+        if self.slots is None:
+            self.slots = asyncio.Semaphore(self.io_threads + self.io_queue_size)
+        return self.slots
+
+    def _write_lock(self, uri: str) -> asyncio.Lock:
+        lock = self.write_locks.get(uri)
+        if lock is None:
+            lock = asyncio.Lock()
+            self.write_locks[uri] = lock
+        return lock
+
+    def _array_uri(self, datatype: str, name: str) -> str:
+        # instruments sharing one physical array share its write lock as well
+        return self.tiledb.physical_uri(self.tiledb.get_uri(datatype, name))
+
+    def _started(self, submitted_at: float) -> None:
+        wait = time.time() - submitted_at
+        with self.lock:
+            self.stats['queued'] -= 1
+            self.stats['running'] += 1
+            self.stats['queue_wait'] += wait
+            self.stats['max_queue_wait'] = max(self.stats['max_queue_wait'], wait)
+
+    def _finished(self, failed: bool) -> None:
+        with self.lock:
+            self.stats['running'] -= 1
+            self.stats['completed'] += 1
+            if failed:
+                self.stats['errors'] += 1
+
+    def _call(self, submitted_at: float, func: Callable, args, kwargs):
+        self._started(submitted_at)
+        failed = True
+        try:
+            result = func(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            self._finished(failed)
+
+    async def run(self, func: Callable, *args, **kwargs):
+        slots = self._slots()
+        if slots.locked():
+            with self.lock:
+                self.stats['blocked'] += 1
+            self.logger.debug(f"tiledb io queue is full, waiting for a free slot to run {func.__name__}")
+
+        async with slots:
+            with self.lock:
+                self.stats['submitted'] += 1
+                self.stats['queued'] += 1
+                self.stats['max_queued'] = max(self.stats['max_queued'], self.stats['queued'])
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(self.executor, self._call, time.time(), func, args, kwargs)
+
+    async def run_write(self, uri: str, func: Callable, *args, **kwargs):
+        async with self._write_lock(uri):
+            return await self.run(func, *args, **kwargs)
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+        stats['queue_depth'] = stats['queued']
+        stats['avg_queue_wait'] = stats['queue_wait'] / stats['submitted'] if stats['submitted'] > 0 else 0.0
+        stats['io_threads'] = self.io_threads
+        stats['io_queue_size'] = self.io_queue_size
+        stats['locked_arrays'] = sum(1 for lock in list(self.write_locks.values()) if lock.locked())
+        return stats
+
+    async def get_kv(self, name, key):
+        return await self.run(self.tiledb.get_kv, name, key)
+
+    async def get_kv_many(self, name_keys):
+        return await self.run(self.tiledb.get_kv_many, name_keys)
+
+    async def list_kv(self, name):
+        return await self.run(self.tiledb.list_kv, name)
+
+    async def store_kv(self, name, key, value, after=None):
+        return await self.run_write(self.tiledb.checkpoints.uri, self.tiledb.store_kv, name, key, value, after=after)
+
+    async def store_kv_many(self, items):
+        return await self.run_write(self.tiledb.checkpoints.uri, self.tiledb.store_kv_many, items)
+
+    async def record_crawl(self, name, start, stop, missing=None):
+        return await self.run_write(self.tiledb.gaps.uri, self.tiledb.record_crawl, name, start, stop, missing=missing)
+
+    async def record_repair(self, name, repaired, unavailable=None):
+        return await self.run_write(self.tiledb.gaps.uri, self.tiledb.record_repair, name, repaired,
+                                    unavailable=unavailable)
+
+    async def get_gap_record(self, name):
+        return await self.run(self.tiledb.get_gap_record, name)
+
+    async def get_coverage(self, names=None):
+        return await self.run(self.tiledb.get_coverage, names)
+
+    async def delete_kv_many(self, name_keys):
+        return await self.run_write(self.tiledb.checkpoints.uri, self.tiledb.delete_kv_many, name_keys)
+
+    async def store_df(self, datatype, name, df, sparse=True, data_df=True):
+        return await self.run_write(self._array_uri(datatype, name), self.tiledb.store_df, datatype, name, df,
+                                    sparse=sparse, data_df=data_df)
+
+    async def flush(self, uri=None, expired_only=False):
+        if uri is None:
+            return await self.run(self.tiledb.flush, None, expired_only)
+        return await self.run_write(self.tiledb.physical_uri(uri), self.tiledb.flush, uri, expired_only)
+
+    async def array_exists(self, uri):
+        return await self.run(self.tiledb.array_exists, uri)
+
+    async def list_arrays(self, datatype):
+        return await self.run(self.tiledb.list_arrays, datatype)
+
+    async def get_data_domain(self, datatype, name, profile=None):
+        return await self.run(self.tiledb.get_data_domain, datatype, name, profile=profile)
+
+    async def get_ts_dataframe(self, datatype, name, from_ts, to_ts, attrs=None, cond=None, profile=None, cache=True):
+        return await self.run(self.tiledb.get_ts_dataframe, datatype, name, from_ts, to_ts, attrs=attrs, cond=cond,
+                              profile=profile, cache=cache)
+
+    async def get_ts_dataarray(self, datatype, name, from_ts, to_ts, attrs=None, cond=None, profile=None, cache=True):
+        return await self.run(self.tiledb.get_ts_dataarray, datatype, name, from_ts, to_ts, attrs=attrs, cond=cond,
+                              profile=profile, cache=cache)
+
+    async def get_ts_result(self, datatype, name, from_ts, to_ts, attrs=None, cond=None, profile=None, cache=True,
+                            result_format='numpy'):
+        return await self.run(self.tiledb.get_ts_result, datatype, name, from_ts, to_ts, attrs=attrs, cond=cond,
+                              profile=profile, cache=cache, result_format=result_format)
+
+    async def get_ts_multi(self, datatype, names, from_ts, to_ts, attrs=None, cond=None):
+        return await self.run(self.tiledb.get_ts_multi, datatype, names, from_ts, to_ts, attrs=attrs, cond=cond)
+
+    async def iter_ts(self, datatype, name, from_ts, to_ts, chunk_rows=None, chunk_bytes=None, attrs=None, cond=None,
+                      windows=None):
+        # the generator is advanced on the io threads, one chunk per call
+        chunks = self.tiledb.iter_ts(datatype, name, from_ts, to_ts, chunk_rows=chunk_rows, chunk_bytes=chunk_bytes,
+                                     attrs=attrs, cond=cond, windows=windows)
+        done = object()
+        while True:
+            chunk = await self.run(next, chunks, done)
+            if chunk is done:
+                break
+            yield chunk
+
+    async def aggregate(self, pair, from_ts, to_ts, freq, how='ohlc', attrs=None, datatype='raw', use_rollup=True):
+        return await self.run(self.tiledb.aggregate, pair, from_ts, to_ts, freq, how=how, attrs=attrs,
+                              datatype=datatype, use_rollup=use_rollup)
+
+    async def get_bars(self, name, from_ts, to_ts, max_points=None, attrs=None):
+        return await self.run(self.tiledb.get_bars, name, from_ts, to_ts, max_points=max_points, attrs=attrs)
+
+    async def remove_array(self, datatype, name, keep_gaps=False):
+        return await self.run_write(self._array_uri(datatype, name), self.tiledb.remove_array, datatype, name,
+                                    keep_gaps=keep_gaps)
+
+    async def migrate_layout(self, datatype, name, layout='dense', period=None):
+        return await self.run_write(self._array_uri(datatype, name), self.tiledb.migrate_layout, datatype, name,
+                                    layout=layout, period=period)
+
+    async def consolidate(self, uri, mode="fragments"):
+        return await self.run_write(self.tiledb.physical_uri(uri), self.tiledb.consolidate, uri, mode=mode)
+
+    async def vacuum(self, uri, mode="fragments"):
+        return await self.run_write(self.tiledb.physical_uri(uri), self.tiledb.vacuum, uri, mode=mode)
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+    @classmethod
+    def instance(cls):
+        if cls._INSTANCE is None:
+            cls._INSTANCE = AsyncTileDBController()
+        return cls._INSTANCE
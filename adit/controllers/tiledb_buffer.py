@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import time
+import threading
+from typing import Dict, List, Tuple, Any, Union
+
+import pandas as pd
+
+__all__ = ['WriteBehindBuffer']
+
+
+class WriteBehindBuffer:
+    def __init__(self, max_rows: int, max_bytes: int, max_age: float) -> None:
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.lock = threading.RLock()
+        self.frames: Dict[str, List[pd.DataFrame]] = {}
+        self.rows: Dict[str, int] = {}
+        self.nbytes: Dict[str, int] = {}
+        self.first_append: Dict[str, float] = {}
+        # kv writes which must only become durable after the frames of an uri are flushed
+        self.deferred_kv: Dict[str, Dict[Tuple[str, str], Any]] = {}
+        self.stats = {
+            'flushes': 0,
+            'flushed_rows': 0,
+            'flush_errors': 0,
+            'flush_latency_last': 0.0,
+            'flush_latency_max': 0.0,
+            'flush_latency_total': 0.0,
+            'rows_per_fragment_last': 0,
+            'rows_per_fragment_avg': 0.0,
+        }
+
+    def append(self, uri: str, df: pd.DataFrame) -> bool:
+        with self.lock:
+            if uri not in self.frames:
+                self.frames[uri] = []
+                self.rows[uri] = 0
+                self.nbytes[uri] = 0
+                self.first_append[uri] = time.time()
+            self.frames[uri].append(df)
+            self.rows[uri] += len(df.index)
+            self.nbytes[uri] += int(df.memory_usage(index=True, deep=False).sum())
+            return self.is_full(uri)
+
+    def is_full(self, uri: str) -> bool:
+        with self.lock:
+            if uri not in self.frames:
+                return False
+            return (self.rows[uri] >= self.max_rows or
+                    self.nbytes[uri] >= self.max_bytes or
+                    (time.time() - self.first_append[uri]) >= self.max_age)
+
+    def has_pending(self, uri: str) -> bool:
+        with self.lock:
+            return uri in self.frames or uri in self.deferred_kv
+
+    def pending_uris(self) -> List[str]:
+        with self.lock:
+            return list(set(self.frames.keys()) | set(self.deferred_kv.keys()))
+
+    def expired_uris(self) -> List[str]:
+        with self.lock:
+            now = time.time()
+            return [uri for uri, ts in self.first_append.items() if (now - ts) >= self.max_age]
+
+    def defer_kv(self, uri: str, name: str, key: str, value: Any) -> None:
+        with self.lock:
+            self.deferred_kv.setdefault(uri, {})[(name, key)] = value
+
+    def get_deferred_kv(self, name: str, key: str) -> Any:
+        with self.lock:
+            for kvs in self.deferred_kv.values():
+                if (name, key) in kvs:
+                    return kvs[(name, key)]
+            return None
+
+    def pending(self, uri: str, from_ts=None, to_ts=None) -> Union[pd.DataFrame, None]:
+        with self.lock:
+            frames = list(self.frames.get(uri, []))
+        if len(frames) == 0:
+            return None
+
+        df = self._merge(frames)
+        if from_ts is not None:
+            df = df[df.index >= from_ts]
+        if to_ts is not None:
+            df = df[df.index <= to_ts]
+        return df
+
+    def snapshot(self, uri: str) -> Tuple[int, Union[pd.DataFrame, None], Dict[Tuple[str, str], Any]]:
+        # frames stay visible to readers until the fragment is written and commit() is called
+        with self.lock:
+            frames = list(self.frames.get(uri, []))
+            kvs = dict(self.deferred_kv.get(uri, {}))
+        df = self._merge(frames) if len(frames) > 0 else None
+        return len(frames), df, kvs
+
+    def commit(self, uri: str, nframes: int, kvs: Dict[Tuple[str, str], Any]) -> None:
+        with self.lock:
+            remaining = self.frames.get(uri, [])[nframes:]
+            if len(remaining) > 0:
+                self.frames[uri] = remaining
+                self.rows[uri] = sum(len(df.index) for df in remaining)
+                self.nbytes[uri] = sum(int(df.memory_usage(index=True, deep=False).sum()) for df in remaining)
+                self.first_append[uri] = time.time()
+            else:
+                self.frames.pop(uri, None)
+                self.rows.pop(uri, None)
+                self.nbytes.pop(uri, None)
+                self.first_append.pop(uri, None)
+
+            pending_kv = self.deferred_kv.get(uri, {})
+            for k, v in kvs.items():
+                if pending_kv.get(k) is v:
+                    pending_kv.pop(k)
+            if len(pending_kv) == 0:
+                self.deferred_kv.pop(uri, None)
+
+    def discard(self, uri: str) -> int:
+        # drops the frames and the deferred kvs of an uri which will never be flushed, returns the dropped rows
+        with self.lock:
+            rows = self.rows.pop(uri, 0)
+            self.frames.pop(uri, None)
+            self.nbytes.pop(uri, None)
+            self.first_append.pop(uri, None)
+            self.deferred_kv.pop(uri, None)
+            return rows
+
+    def record_flush(self, rows: int, latency: float) -> None:
+        with self.lock:
+            self.stats['flushes'] += 1
+            self.stats['flushed_rows'] += rows
+            self.stats['flush_latency_last'] = latency
+            self.stats['flush_latency_max'] = max(self.stats['flush_latency_max'], latency)
+            self.stats['flush_latency_total'] += latency
+            self.stats['rows_per_fragment_last'] = rows
+            self.stats['rows_per_fragment_avg'] = self.stats['flushed_rows'] / self.stats['flushes']
+
+    def record_flush_error(self) -> None:
+        with self.lock:
+            self.stats['flush_errors'] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            stats = dict(self.stats)
+            stats['pending_rows'] = sum(self.rows.values())
+            stats['pending_bytes'] = sum(self.nbytes.values())
+            stats['pending_arrays'] = len(self.frames)
+            return stats
+
+    @staticmethod
+    def _merge(frames: List[pd.DataFrame]) -> pd.DataFrame:
+        df = pd.concat(frames) if len(frames) > 1 else frames[0]
+        # crawl windows overlap on their boundary bar, keep the latest copy of each timestamp
+        df = df[~df.index.duplicated(keep='last')]
+        return df.sort_index()
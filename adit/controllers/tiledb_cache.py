@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Tuple, Union
+
+import numpy as np
+
+__all__ = ['QueryResultCache']
+
+
+class QueryResultCache:
+    # LRU cache of query results within a memory budget. every entry carries the version (fragment set) of the
+    # array it was read from, a lookup with another version is a miss and drops the entry. cached columns are
+    # read-only and shared with every caller, a hit hands out the same buffers without copying them.
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries: OrderedDict = OrderedDict()
+        self.nbytes = 0
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'stale': 0,
+            'evictions': 0,
+            'rejected': 0,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def make_key(uri: str, instrument: Union[str, None], from_ts, to_ts, attrs, cond) -> Tuple:
+        return (uri, instrument, int(np.datetime64(from_ts, 'ns').astype(np.int64)),
+                int(np.datetime64(to_ts, 'ns').astype(np.int64)), None if attrs is None else tuple(attrs), cond)
+
+    @staticmethod
+    def _freeze(result: OrderedDict) -> Tuple[OrderedDict, int]:
+        frozen = OrderedDict()
+        nbytes = 0
+        for name, values in result.items():
+            values = np.asarray(values)
+            values.flags.writeable = False
+            frozen[name] = values
+            nbytes += values.nbytes
+        return frozen, nbytes
+
+    def get(self, key: Hashable, version: Any) -> Union[OrderedDict, None]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            cached_version, result, nbytes = entry
+            if cached_version != version:
+                self._drop(key)
+                self.stats['stale'] += 1
+                self.stats['misses'] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats['hits'] += 1
+        return OrderedDict(result)
+
+    def put(self, key: Hashable, version: Any, result: OrderedDict) -> OrderedDict:
+        # returns the read-only result so the caller sees the same buffers as later hits
+        frozen, nbytes = self._freeze(result)
+        with self.lock:
+            if key in self.entries:
+                self._drop(key)
+            if nbytes > self.max_bytes:
+                self.stats['rejected'] += 1
+                return OrderedDict(frozen)
+            while self.nbytes + nbytes > self.max_bytes and len(self.entries) > 0:
+                self._drop(next(iter(self.entries)))
+                self.stats['evictions'] += 1
+            self.entries[key] = (version, frozen, nbytes)
+            self.nbytes += nbytes
+        return OrderedDict(frozen)
+
+    def _drop(self, key: Hashable) -> None:
+        _, _, nbytes = self.entries.pop(key)
+        self.nbytes -= nbytes
+
+    def invalidate(self, uri: str = None) -> None:
+        with self.lock:
+            for key in [key for key in self.entries if uri is None or key[0] == uri]:
+                self._drop(key)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            stats = dict(self.stats)
+            stats['entries'] = len(self.entries)
+            stats['bytes'] = self.nbytes
+            stats['max_bytes'] = self.max_bytes
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / lookups if lookups > 0 else 0.0
+        return stats
@@ -1,5 +1,11 @@
 from __future__ import annotations
 
+import re
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+
 import tiledb
 import logging
 import logging.config
@@ -9,103 +15,333 @@ import numpy as np
 from adit.config import Config
 import adit.constants as const
 from adit.utils import *
+from .evenloop_controller import EventLoopController
+from .pool_controller import TPOOL
+from .tiledb_buffer import WriteBehindBuffer
+from .tiledb_pool import ArrayHandlePool
+from .tiledb_kvstore import CheckpointStore
+from .tiledb_gaps import GapIndex
+from .tiledb_query import query_slice, parse_condition, condition_mask
+from .tiledb_rollup import RollupPyramid, parse_rollup_levels, floor_edge
+from .tiledb_filters import FilterProfiles
+from .tiledb_dense import DenseBarLayout
+from .tiledb_instruments import SharedInstrumentLayout
+from .tiledb_writer import FastArrayWriter
+from .tiledb_profiles import ContextProfiles
+from .tiledb_storage import StorageRoot
+from .tiledb_cache import QueryResultCache
+from .tiledb_results import RESULT_FORMATS, to_result_format
 
 __all__ = ['TileDBController']
 
 
 class TileDBController:
     _INSTANCE = None
+    _FLUSH_TASK_NAME = "tiledb-buffer-flush"
+    _FRAGMENT_NAME = re.compile(r"^__\d+_\d+_[0-9a-f]+(_\d+)?$")
 
-    META_BUCKET = "s3://adit-meta"
-    RAW_BUCKET = "s3://adit-raw"
-    HEALTH_BUCKET = "s3://adit-health"
+    META_BUCKET = "adit-meta"
+    RAW_BUCKET = "adit-raw"
+    HEALTH_BUCKET = "adit-health"
 
     _RAW_DATA = "raw"
     _HEALTH_DATA = "health"
     _META_DATA = "meta"
 
-    BUCKETS = {
+    BUCKET_NAMES = {
         _RAW_DATA: RAW_BUCKET,
         _HEALTH_DATA: HEALTH_BUCKET,
         _META_DATA: META_BUCKET
     }
 
+    _RAW_ATTRS = [
+        ('bidopen', 'float64'),
+        ('bidclose', 'float64'),
+        ('bidhigh', 'float64'),
+        ('bidlow', 'float64'),
+        ('askopen', 'float64'),
+        ('askclose', 'float64'),
+        ('askhigh', 'float64'),
+        ('asklow', 'float64'),
+        ('tickqty', 'int64'),
+    ]
+    _DAILY_METRICS_ATTRS = [
+        ('midclose', 'float64'),
+        ('logret', 'float64'),
+        ('logret_ema', 'float64'),
+    ]
+
     def __init__(self):
         self.logger = logging.getLogger(self.__class__.__name__)
         self.config = Config.instance()
+        self.storage = StorageRoot(self.config.get_str("tiledb", "storage_root", const.DEFAULT_STORAGE_ROOT))
+        self.buckets = self.storage.buckets(self.BUCKET_NAMES)
         self.tiledb_conf = tiledb.Config()
         self.init_tiledb_conf()
         self.tiledb_ctx = tiledb.Ctx(config=self.tiledb_conf)
+        if self.storage.backend == 'mem':
+            # the in-memory filesystem lives inside one tiledb context, every profile and call has to share it
+            self.tiledb_ctx = tiledb.default_ctx()
+            self.profiles.shared_ctx = self.tiledb_ctx
         self.array_conn = {}
-        self.vfs = tiledb.VFS(ctx=self.tiledb_ctx, config=self.tiledb_conf)
+        self.vfs = tiledb.VFS(ctx=self.tiledb_ctx)
         self.data_bucket_ready = False
         self.check_and_create_bucket()
+        self.existing_arrays = set()
+        self.read_ctx = self.profiles.ctx(self.config.get_str("tiledb", "read_profile", const.DEFAULT_READ_PROFILE))
+        self.write_ctx = self.profiles.ctx(self.config.get_str("tiledb", "write_profile", const.DEFAULT_WRITE_PROFILE))
+        self.scan_profile = self.config.get_str("tiledb", "scan_profile", const.DEFAULT_SCAN_PROFILE)
+        self.result_cache = QueryResultCache(
+            self.config.get_int("tiledb", "result_cache_bytes", const.DEFAULT_RESULT_CACHE_BYTES))
+        self.handle_pool = ArrayHandlePool(ctx=self.read_ctx,
+                                           ttl=self.config.get_int("tiledb", "reader_ttl", const.DEFAULT_READER_TTL),
+                                           contexts=self.profiles.ctx,
+                                           versions=self._array_version if self.result_cache.enabled else None)
+        self.checkpoints = CheckpointStore(self.buckets[self._META_DATA], ctx=self.tiledb_ctx,
+                                           ttl=self.config.get_int("tiledb", "reader_ttl", const.DEFAULT_READER_TTL))
+        self.gaps = GapIndex(self.buckets[self._META_DATA], ctx=self.tiledb_ctx,
+                             ttl=self.config.get_int("tiledb", "reader_ttl", const.DEFAULT_READER_TTL))
+        self.legacy_kv_checked = set()
+        self.flush_lock = threading.Lock()
+        self.flush_interval = self.config.get_int("tiledb", "buffer_flush_interval", const.DEFAULT_BUFFER_FLUSH_INTERVAL)
+        self.write_buffer = WriteBehindBuffer(
+            max_rows=self.config.get_int("tiledb", "buffer_max_rows", const.DEFAULT_BUFFER_MAX_ROWS),
+            max_bytes=self.config.get_int("tiledb", "buffer_max_bytes", const.DEFAULT_BUFFER_MAX_BYTES),
+            max_age=self.config.get_int("tiledb", "buffer_max_age", const.DEFAULT_BUFFER_MAX_AGE))
+        self.buffered_names = {}
+        self.filters = FilterProfiles(self.config, default_profile=const.DEFAULT_FILTER_PROFILE)
+        self.dense_layouts = {}
+        self.writer = FastArrayWriter(ctx=self.write_ctx)
+        self.shared_instruments = None
+        if self.config.get_str("tiledb", "instrument_layout", const.DEFAULT_INSTRUMENT_LAYOUT) == "shared":
+            self.shared_instruments = SharedInstrumentLayout()
+        self.rollups = RollupPyramid(
+            self, parse_rollup_levels(self.config.get_str("tiledb", "rollup_levels", const.DEFAULT_ROLLUP_LEVELS)),
+            base_freq=self.config.get_str("tiledb", "rollup_base", const.DEFAULT_ROLLUP_BASE))
 
     def init_tiledb_conf(self):
         self.tiledb_conf["sm.consolidation.mode"] = "fragment_meta"
         self.tiledb_conf["sm.vacuum.mode"] = "fragment_meta"
-        self.tiledb_conf["sm.tile_cache_size"] = 100000000
-        self.tiledb_conf["sm.num_reader_threads"] = 1
-        self.tiledb_conf["sm.num_writer_threads"] = 1
-        self.tiledb_conf["vfs.num_threads"] = get_ncores()
-        self.tiledb_conf["vfs.s3.aws_access_key_id"] = "any"
-        self.tiledb_conf["vfs.s3.aws_secret_access_key"] = "any"
-        self.tiledb_conf["vfs.s3.scheme"] = "http"  # https for amazon s3
-        self.tiledb_conf["vfs.s3.region"] = "us-east-1"  # us-east-1 for anazon s3
-        self.tiledb_conf["vfs.s3.endpoint_override"] = f"localhost:{const.WEED_S3_PORT}"  # empty for amazon s3
-        self.tiledb_conf["vfs.s3.use_virtual_addressing"] = "false"  # "true for amazon s3"
+        if self.storage.backend == 's3':
+            self.tiledb_conf["vfs.s3.aws_access_key_id"] = "any"
+            self.tiledb_conf["vfs.s3.aws_secret_access_key"] = "any"
+            self.tiledb_conf["vfs.s3.scheme"] = "http"  # https for amazon s3
+            self.tiledb_conf["vfs.s3.region"] = "us-east-1"  # us-east-1 for anazon s3
+            self.tiledb_conf["vfs.s3.endpoint_override"] = f"localhost:{const.WEED_S3_PORT}"  # empty for amazon s3
+            self.tiledb_conf["vfs.s3.use_virtual_addressing"] = "false"  # "true for amazon s3"
+        # threads and caches come from the tuning profiles, the main context uses [tiledb] profile
+        self.profiles = ContextProfiles(self.config, self.tiledb_conf)
+        for key, value in self.profiles.settings(
+                self.config.get_str("tiledb", "profile", const.DEFAULT_TILEDB_PROFILE)).items():
+            self.tiledb_conf[key] = value
         tiledb.highlevel.initialize_ctx(config=self.tiledb_conf)
 
     def check_and_create_bucket(self):
         ## TODO: When it be best time to do it, for now we will check and create bucket.
         ##       Think about better solution.
         if not self.data_bucket_ready:
-            for bucket_name, bucket_uri in self.BUCKETS.items():
-                if not self.vfs.is_bucket(bucket_uri):
-                    self.vfs.create_bucket(bucket_uri)
+            for bucket_name, bucket_uri in self.buckets.items():
+                self.storage.create(self.vfs, bucket_uri)
 
     def clean_data_bucket(self):
         ## TODO: Add method to clean each data bucket separately not all.
         if self.data_bucket_ready:
-            for bucket_name, bucket_uri in self.BUCKETS.items():
-                if self.vfs.is_bucket(bucket_uri):
-                    self.vfs.remove_bucket(bucket_uri)
+            for bucket_name, bucket_uri in self.buckets.items():
+                self.storage.remove(self.vfs, bucket_uri)
+            self.existing_arrays.clear()
+            self.legacy_kv_checked.clear()
+            self.dense_layouts.clear()
+            self.writer.invalidate()
+            self.result_cache.invalidate()
+            self.checkpoints.refresh()
+            self.gaps.refresh()
+            self.handle_pool.close()
 
     def get_uri(self, datatype, name):
-        if datatype not in self.BUCKETS:
+        if datatype not in self.buckets:
             raise Exception("Bucket type does not exists")
-        return self.BUCKETS[datatype] + "/" + name
-
-    def store_kv(self, name, key, value):
-        padding_value = type(value)()  # tiledb require to have atleast 2 value for each column
-        df = pd.DataFrame(data={key: [padding_value, value]})
-        self.store_df('meta', name, df, sparse=False, data_df=False)
+        return self.buckets[datatype] + "/" + name
+
+    def _datatype_of(self, uri):
+        for datatype, bucket_uri in self.buckets.items():
+            if uri.startswith(bucket_uri + "/"):
+                return datatype
+        return self._RAW_DATA
+
+    def _resolve(self, uri):
+        # compatibility shim between the per instrument uris used by callers and the stored arrays,
+        # returns the uri of the array to open and the instrument within it (None for per instrument arrays)
+        datatype = self._datatype_of(uri)
+        if self.shared_instruments is None or datatype == self._META_DATA or not uri.startswith(self.buckets[datatype]):
+            return uri, None
+        name, instrument = self.shared_instruments.resolve(uri[len(self.buckets[datatype]) + 1:])
+        return self.get_uri(datatype, name), instrument
+
+    def physical_uri(self, uri):
+        # the uri of the array which stores `uri`, instruments sharing one array share its physical uri
+        return self._resolve(uri)[0]
+
+    def list_arrays(self, datatype):
+        # tiledb.ls walks tiledb objects on every backend, the in-memory one does not list arrays through the vfs
+        uris = []
+
+        def collect(uri, object_type):
+            if object_type == "array":
+                uris.append(uri.rstrip("/"))
+
+        tiledb.ls(self.buckets[datatype], collect, ctx=self.tiledb_ctx)
+        return sorted(uris)
+
+    def list_fragments(self, uri):
+        # newer storage formats keep fragments under __fragments, older ones directly in the array directory
+        fragments_dir = uri + "/__fragments"
+        base_uri = fragments_dir if self.vfs.is_dir(fragments_dir) else uri
+        names = [f.rstrip("/").split("/")[-1] for f in self.vfs.ls(base_uri)]
+        return sorted(name for name in names if self._FRAGMENT_NAME.match(name))
+
+    def _array_version(self, uri):
+        # the fragment set identifies what a reader of the array sees, None when it cannot be listed. the in-memory
+        # filesystem lists no fragments, it only lives in this process so the count of local changes is enough.
+        if self.storage.backend == 'mem':
+            return 'mem', self.handle_pool.generation(uri)
+        try:
+            fragments = self.list_fragments(uri)
+        except Exception as ex:
+            self.logger.debug(f"Cannot list fragments of {uri}, its reads are not cached", exc_info=ex)
+            return None
+        return tuple(fragments) if len(fragments) > 0 else None
+
+    def list_array_meta(self, uri):
+        meta_dir = uri + "/__meta"
+        if not self.vfs.is_dir(meta_dir):
+            return []
+        return [f.rstrip("/").split("/")[-1] for f in self.vfs.ls(meta_dir)]
+
+    def get_array_size(self, uri):
+        return self.vfs.dir_size(uri)
+
+    def _release_readers(self, uri):
+        # pooled handles are opened on the fragments of their time, they must not outlive a vacuum of them
+        self.handle_pool.close(uri)
+        self.result_cache.invalidate(uri)
+
+    def consolidate(self, uri, mode="fragments"):
+        self._release_readers(uri)
+        conf = tiledb.Config(self.tiledb_conf.dict())
+        conf["sm.consolidation.mode"] = mode
+        tiledb.consolidate(uri, config=conf, ctx=self.tiledb_ctx)
+
+    def vacuum(self, uri, mode="fragments"):
+        self._release_readers(uri)
+        conf = tiledb.Config(self.tiledb_conf.dict())
+        conf["sm.vacuum.mode"] = mode
+        tiledb.vacuum(uri, config=conf, ctx=self.tiledb_ctx)
+
+    def store_kv(self, name, key, value, after=None):
+        # when `after` names a (datatype, name) array with buffered rows, the value is only persisted
+        # once those rows are flushed, so a checkpoint can never get ahead of the data it refers to.
+        if after is not None:
+            uri = self.get_uri(*after)
+            if self.write_buffer.has_pending(uri):
+                self.write_buffer.defer_kv(uri, name, key, value)
+                return
+        self.store_kv_many({(name, key): value})
+
+    def store_kv_many(self, items):
+        self.checkpoints.put_many({self._kv_key(name, key): value for (name, key), value in items.items()})
 
     def get_kv(self, name, key):
+        return self.get_kv_many([(name, key)])[(name, key)]
+
+    def get_kv_many(self, name_keys):
         try:
-            array_existed = tiledb.highlevel.array_exists(self.get_uri('meta', name))
-            if not array_existed:
-                return None
+            result = {}
+            stored = self.checkpoints.get_many([self._kv_key(name, key) for name, key in name_keys])
+            for name, key in name_keys:
+                value = self.write_buffer.get_deferred_kv(name, key)
+                if value is None:
+                    value = stored[self._kv_key(name, key)]
+                if value is None:
+                    value = self._migrate_legacy_kv(name, key)
+                result[(name, key)] = value
+            return result
+        except Exception as ex:
+            self.logger.error(f"Cannot retrieve KV: {name_keys}", exc_info=ex)
+            raise ex
 
-            result = None
-            with tiledb.open(self.get_uri('meta', name), 'r') as A:
-                result = A[:]
+    def delete_kv_many(self, name_keys):
+        self.checkpoints.delete_many([self._kv_key(name, key) for name, key in name_keys])
 
-            if result is None:
-                return None
+    def list_kv(self, name):
+        # {key: value} of every stored checkpoint of `name`
+        prefix = self._kv_key(name, "")
+        stored = self.checkpoints.get_many(self.checkpoints.keys(prefix))
+        return {key[len(prefix):]: value for key, value in stored.items()}
 
-            if not key in result.keys():
-                return None
+    @staticmethod
+    def _kv_key(name, key):
+        return f"{name}/{key}"
 
-            return result[key][1]  # 0 store nothing, it is just to be compatible with tiledb domain structure
-        except Exception as ex:
-            self.logger.error(f"Cannot retrieve KV: {name} -> {key}", exc_info=ex)
-            raise ex
+    def _migrate_legacy_kv(self, name, key):
+        # checkpoints used to be stored as one dense array per key, read them once and move them to the store
+        if (name, key) in self.legacy_kv_checked:
+            return None
+        self.legacy_kv_checked.add((name, key))
+
+        uri = self.get_uri('meta', name)
+        if not self.array_exists(uri):
+            return None
+
+        with self.handle_pool.acquire(uri) as A:
+            result = A[:]
+
+        if result is None or key not in result.keys():
+            return None
+
+        value = result[key][1]  # 0 store nothing, it is just to be compatible with tiledb domain structure
+        self.checkpoints.put(self._kv_key(name, key), value)
+        return value
+
+    def record_crawl(self, name, start, stop, missing=None):
+        # [start, stop) of the raw array `name` has been crawled, `missing` are the parts of it the source had no
+        # bars for. only market hours are kept as gaps, crawling a range again replaces what was known of it.
+        start = int(np.datetime64(start, 'ns').astype(np.int64))
+        stop = int(np.datetime64(stop, 'ns').astype(np.int64))
+        missing = IntervalSet() if missing is None else missing.intersection(market_open(start, stop))
+
+        def update(record):
+            record.extend(start, stop)
+            record.gaps.remove(start, stop)
+            record.unavailable.remove(start, stop)
+            record.gaps.update(missing)
+        return self.gaps.update(name, update)
+
+    def record_repair(self, name, repaired, unavailable=None):
+        # the gaps inside `repaired` have been fetched again, `unavailable` are the parts still without bars
+        def update(record):
+            record.gaps.difference_update(repaired)
+            record.unavailable.difference_update(repaired)
+            if unavailable is not None:
+                record.unavailable.update(unavailable.intersection(repaired))
+        return self.gaps.update(name, update)
+
+    def get_gap_record(self, name):
+        return self.gaps.get(name)
+
+    def get_coverage(self, names=None):
+        # {name: coverage stats} of every pair in the gap index, nothing but the index is read
+        names = sorted(self.gaps.names()) if names is None else names
+        coverage = OrderedDict()
+        for name in names:
+            record = self.gaps.get(name)
+            if record is not None:
+                coverage[name] = record.get_coverage()
+        return coverage
 
     # TODO: support dynamic schema
     def store_df(self, datatype, name, df, sparse=True, data_df=True):
         uri = self.get_uri(datatype, name)
-        array_existed = tiledb.highlevel.array_exists(uri)
+        array_existed = self.array_exists(uri)
 
         if not array_existed and data_df:
             if datatype == self._RAW_DATA:
@@ -113,45 +349,425 @@ class TileDBController:
             elif datatype == self._HEALTH_DATA:
                 self.create_datahealtharray(uri)
 
-            array_existed=True
-
+            self.existing_arrays.add(uri)
+            array_existed = True
+
+        if datatype == self._RAW_DATA and data_df:
+            self.buffered_names[uri] = (datatype, name)
+            if self.write_buffer.append(uri, df):
+                self.flush(uri)
+            return
+
+        self._write_df(uri, df, sparse=sparse, array_existed=array_existed)
+
+    def array_exists(self, uri):
+        if uri in self.existing_arrays:
+            return True
+        array_uri, _ = self._resolve(uri)
+        if array_uri in self.existing_arrays or self._exists(array_uri):
+            self.existing_arrays.update([uri, array_uri])
+            return True
+        return False
+
+    def _exists(self, uri):
+        # always through the controller's context, the in-memory filesystem of another context is a different one
+        return tiledb.object_type(uri, ctx=self.tiledb_ctx) == "array"
+
+    def flush(self, uri=None, expired_only=False):
+        if uri is not None:
+            uris = [uri]
+        elif expired_only:
+            uris = self.write_buffer.expired_uris()
+        else:
+            uris = self.write_buffer.pending_uris()
+
+        # a failing array keeps its frames and deferred kvs for the next flush, the other arrays are still flushed
+        for pending_uri in uris:
+            try:
+                self._flush_uri(pending_uri)
+            except Exception as ex:
+                self.write_buffer.record_flush_error()
+                self.logger.error(f"Failed to flush buffered rows of {pending_uri}, they are kept for a retry",
+                                  exc_info=ex)
+                if uri is not None:
+                    raise
+
+    def _flush_uri(self, uri):
+        with self.flush_lock:
+            nframes, df, kvs = self.write_buffer.snapshot(uri)
+            if df is not None and len(df.index) > 0:
+                starttime = time.time()
+                self._write_df(uri, df, sparse=True, array_existed=True)
+                latency = time.time() - starttime
+                self.write_buffer.record_flush(len(df.index), latency)
+                self.logger.debug(f"flushed {len(df.index)} buffered rows into one fragment of {uri} in {latency}s")
+
+            self.store_kv_many(kvs)
+
+            self.write_buffer.commit(uri, nframes, kvs)
+
+        # rolled up on the thread pool once the rows are committed, no flush ever waits for a rollup
+        if df is not None and len(df.index) > 0 and uri in self.buffered_names:
+            if self.rollups.enqueue(*self.buffered_names[uri], df):
+                TPOOL.submit(self.rollups.drain)
+
+    def get_write_stats(self):
+        return self.write_buffer.get_stats()
+
+    def get_pool_stats(self):
+        return self.handle_pool.get_stats()
+
+    def get_cache_stats(self):
+        return self.result_cache.get_stats()
+
+    def start_periodic_flush(self):
+        EventLoopController.instance().shedule_task(self._FLUSH_TASK_NAME, self._run_periodic_flush)
+
+    def stop_periodic_flush(self):
+        EventLoopController.instance().stop_task(self._FLUSH_TASK_NAME)
+
+    async def _run_periodic_flush(self, queue):
+        loop = EventLoopController.instance().get_loop()
+        while True:
+            try:
+                await loop.run_in_executor(TPOOL, self.flush, None, True)
+            except Exception as ex:
+                self.logger.error("Failed to flush expired write buffers", exc_info=ex)
+            await asyncio.sleep(self.flush_interval)
+
+    def write_df(self, uri, df):
+        # writes `df` into the existing array at `uri` right away, without going through the write buffer
+        self._write_df(uri, df, sparse=True, array_existed=True)
+
+    def _write_df(self, uri, df, sparse=True, array_existed=True):
+        array_uri, instrument = self._resolve(uri)
+        if instrument is not None:
+            self.writer.columns(array_uri, df)
+            self.shared_instruments.write(array_uri, instrument, df, ctx=self.write_ctx)
+            self.existing_arrays.update([uri, array_uri])
+            self.handle_pool.invalidate(array_uri)
+            return
+
+        layout = self._layout_of(uri) if array_existed else None
+        if layout is not None:
+            self.writer.columns(uri, df)
+            layout.write(uri, df, ctx=self.write_ctx)
+            self.existing_arrays.add(uri)
+            self.handle_pool.invalidate(uri)
+            return
+
+        if array_existed and sparse:
+            self.writer.write(uri, df)
+            self.existing_arrays.add(uri)
+            self.handle_pool.invalidate(uri)
+            return
+
+        profile = self.filters.profile_of(self._datatype_of(uri))
         tiledb.from_pandas(uri, df,
                            sparse=sparse,
                            mode='append' if array_existed else 'ingest',
                            tile_order='row_major',
                            cell_order='row_major',
-                           attrs_filters=tiledb.FilterList([tiledb.GzipFilter(level=-1)], chunksize=512000),
-                           coords_filters=tiledb.FilterList([tiledb.GzipFilter(level=-1)], chunksize=512000))
-
-    def get_ts_dataframe(self, datatype, name, from_ts, to_ts):
+                           attrs_filters=self.filters.attr_filters(profile, None, 'float64'),
+                           coords_filters=self.filters.coords_filters(profile),
+                           ctx=self.write_ctx)
+        self.existing_arrays.add(uri)
+        self.handle_pool.invalidate(uri)
+
+    def get_ts_dataframe(self, datatype, name, from_ts, to_ts, attrs=None, cond=None, profile=None, cache=True):
+        return self.get_ts_result(datatype, name, from_ts, to_ts, attrs=attrs, cond=cond, profile=profile,
+                                  cache=cache, result_format='pandas')
+
+    def get_ts_result(self, datatype, name, from_ts, to_ts, attrs=None, cond=None, profile=None, cache=True,
+                      result_format='numpy'):
+        # same read as get_ts_dataarray, handed out in one of RESULT_FORMATS. 'numpy' and 'arrow' share the
+        # buffers of the query (and of the result cache), only 'pandas' copies the columns.
+        if result_format not in RESULT_FORMATS:
+            raise ValueError(f"Unknown result format '{result_format}', expected one of {RESULT_FORMATS}")
         try:
-            with tiledb.open(self.get_uri(datatype, name)) as A:
-                df = pd.DataFrame.from_dict(A[from_ts:to_ts])
-                return df
+            result = self.get_ts_dataarray(datatype, name, from_ts, to_ts, attrs=attrs, cond=cond, profile=profile,
+                                           cache=cache)
         except Exception as ex:
-            self.logger.error(f"Failed to get raw data {datatype} {name} from tiledb")
+            self.logger.error(f"Failed to get raw data {datatype} {name} from tiledb", exc_info=ex)
             return None
-
-    def get_ts_dataarray(self, datatype, name, from_ts, to_ts):
+        return to_result_format(result, result_format)
+
+    def get_ts_dataarray(self, datatype, name, from_ts, to_ts, attrs=None, cond=None, profile=None, cache=True):
+        # `attrs` projects the read to the given attributes and `cond` (e.g. "tickqty > 0") filters rows,
+        # both are pushed down to tiledb so unused columns are never fetched nor decompressed.
+        # `profile` reads with the context of that tiledb tuning profile instead of the read profile.
+        # results of the stored rows go through the result cache unless `cache` is False, cached columns
+        # are read-only.
+        uri = self.get_uri(datatype, name)
+        array_uri, instrument = self._resolve(uri)
+        result = None
         try:
-            result = None
-            with tiledb.open(self.get_uri(datatype, name)) as A:
-                result = A[from_ts:to_ts]
-            return result
+            if self.array_exists(uri):
+                with self.handle_pool.acquire(array_uri, profile=profile) as A:
+                    version = None
+                    if cache and self.result_cache.enabled:
+                        version = self.handle_pool.version(array_uri, profile=profile)
+                    key = QueryResultCache.make_key(array_uri, instrument, from_ts, to_ts, attrs, cond)
+                    if version is not None:
+                        result = self.result_cache.get(key, version)
+                    if result is None:
+                        layout = self._layout_of(uri, A)
+                        if instrument is not None:
+                            result = self.shared_instruments.read(A, [instrument], from_ts, to_ts, attrs=attrs,
+                                                                  cond=cond)[instrument]
+                        elif layout is not None:
+                            result = layout.read(A, from_ts, to_ts, attrs=attrs, cond=cond)
+                        else:
+                            result = query_slice(A, from_ts, to_ts, attrs=attrs, cond=cond)
+                        if version is not None:
+                            result = self.result_cache.put(key, version, result)
         except Exception as ex:
             self.logger.error(f"Failed to get raw data {datatype} {name} from tiledb", exc_info=ex)
-            return None
+            if not self.write_buffer.has_pending(uri):
+                return None
+        return self._merge_pending(uri, result, from_ts, to_ts, attrs=attrs, cond=cond)
+
+    def get_ts_multi(self, datatype, names, from_ts, to_ts, attrs=None, cond=None):
+        # {name: columns} of several instruments, with shared instrument arrays this is one query per array
+        results = OrderedDict()
+        shared = OrderedDict()
+        for name in names:
+            array_uri, instrument = self._resolve(self.get_uri(datatype, name))
+            if instrument is None:
+                results[name] = self.get_ts_dataarray(datatype, name, from_ts, to_ts, attrs=attrs, cond=cond)
+            else:
+                shared.setdefault(array_uri, []).append((name, instrument))
+
+        for array_uri, members in shared.items():
+            stored = {}
+            try:
+                if self.array_exists(array_uri):
+                    with self.handle_pool.acquire(array_uri) as A:
+                        stored = self.shared_instruments.read(A, [instrument for _, instrument in members],
+                                                              from_ts, to_ts, attrs=attrs, cond=cond)
+            except Exception as ex:
+                self.logger.error(f"Failed to get {datatype} data of {[n for n, _ in members]} from tiledb",
+                                  exc_info=ex)
+            for name, instrument in members:
+                results[name] = self._merge_pending(self.get_uri(datatype, name), stored.get(instrument),
+                                                    from_ts, to_ts, attrs=attrs, cond=cond)
+        return OrderedDict([(name, results[name]) for name in names])
+
+    def _merge_pending(self, uri, result, from_ts, to_ts, attrs=None, cond=None):
+        # rows still sitting in the write buffer must be visible to readers
+        pending = self.write_buffer.pending(uri, from_ts, to_ts)
+        if pending is None or len(pending.index) == 0:
+            return result
+
+        clauses = parse_condition(cond)
+        if len(clauses) > 0:
+            mask = condition_mask({col: pending[col].values for col in pending.columns}, clauses)
+            pending = pending[mask]
+
+        pending_result = OrderedDict([('date', pending.index.values)])
+        for col in pending.columns:
+            if attrs is None or col in attrs:
+                pending_result[col] = pending[col].values
 
-    def get_data_domain(self, datatype, name):
+        if result is None or len(result['date']) == 0:
+            return pending_result
+
+        keep = ~np.isin(result['date'], pending_result['date'])
+        merged = OrderedDict([(k, np.concatenate([v[keep], pending_result[k]])) for k, v in result.items()])
+        order = np.argsort(merged['date'], kind='stable')
+        return OrderedDict([(k, v[order]) for k, v in merged.items()])
+
+    def get_data_domain(self, datatype, name, profile=None):
+        uri = self.get_uri(datatype, name)
+        array_uri, instrument = self._resolve(uri)
+        domain = None
         try:
-            domain = (None, None)
-            with tiledb.open(self.get_uri(datatype, name)) as A:
-                domain = A.nonempty_domain()[0]
-                domain = [i.flat[0] for i in domain]
-            return domain
+            if self.array_exists(uri):
+                with self.handle_pool.acquire(array_uri, profile=profile) as A:
+                    layout = self._layout_of(uri, A)
+                    if instrument is not None:
+                        domain = self.shared_instruments.domain(A, instrument)
+                    elif layout is not None:
+                        domain = layout.nonempty_dates(A)
+                    else:
+                        # an array without any fragment yet has no nonempty domain
+                        nonempty = A.nonempty_domain()
+                        domain = None if nonempty is None else [i.flat[0] for i in nonempty[0]]
         except Exception as ex:
-            self.logger.error(f"failed to get domain of data {datatype} {name} from tiledb")
-            return None
+            if not self.write_buffer.has_pending(uri):
+                self.logger.error(f"failed to get domain of data {datatype} {name} from tiledb", exc_info=ex)
+                return None
+            self.logger.debug(f"failed to get domain of data {datatype} {name} from tiledb, using the buffered rows",
+                              exc_info=ex)
+
+        pending = self.write_buffer.pending(uri)
+        if pending is not None and len(pending.index) > 0:
+            pending_domain = [pending.index.values[0], pending.index.values[-1]]
+            if domain is None:
+                domain = pending_domain
+            else:
+                domain = [min(domain[0], pending_domain[0]), max(domain[1], pending_domain[1])]
+        return domain
+
+    def iter_ts(self, datatype, name, from_ts, to_ts, chunk_rows=None, chunk_bytes=None, attrs=None, cond=None,
+                windows=None):
+        # yields the rows of [from_ts, to_ts] as batches of numpy columns holding at most `chunk_rows` rows
+        # (or `chunk_bytes` bytes). tiledb 0.6 has no incomplete queries, so the range is read in time windows
+        # which are resized after every read to follow the density of the data.
+        uri = self.get_uri(datatype, name)
+        if chunk_rows is None and chunk_bytes is not None:
+            chunk_rows = max(1, chunk_bytes // self._row_nbytes(uri, attrs))
+        if windows is not None:
+            for window_from, window_to in windows:
+                yield from self._iter_window(datatype, name, window_from, window_to, chunk_rows, attrs, cond)
+            return
+
+        if chunk_rows is None:
+            chunk_rows = self.config.get_int("tiledb", "iter_chunk_rows", const.DEFAULT_ITER_CHUNK_ROWS)
+        domain = self.get_data_domain(datatype, name)
+        if domain is None:
+            return
+        start = int(max(np.datetime64(from_ts, 'ns'), np.datetime64(domain[0], 'ns')).astype(np.int64))
+        end = int(min(np.datetime64(to_ts, 'ns'), np.datetime64(domain[1], 'ns')).astype(np.int64))
+        span = self.config.get_int("tiledb", "iter_window", const.DEFAULT_ITER_WINDOW) * 10 ** 9
+        while start <= end:
+            stop = min(start + span - 1, end)
+            nrows = 0
+            for chunk in self._iter_window(datatype, name, np.datetime64(start, 'ns'), np.datetime64(stop, 'ns'),
+                                           chunk_rows, attrs, cond):
+                nrows += len(chunk['date'])
+                yield chunk
+            # aim the next window at `chunk_rows` rows, but never grow it by more than 4 times at once
+            span = span * 4 if nrows == 0 else max(1, min(span * 4, span * chunk_rows // nrows))
+            span = min(span, end - stop)
+            start = stop + 1
+
+    def _iter_window(self, datatype, name, window_from, window_to, chunk_rows, attrs, cond):
+        # scans stream through the data once, they would only push hot slices out of the result cache. they read
+        # with the scan profile, so a window only allocates buffers in proportion to its rows
+        result = self.get_ts_dataarray(datatype, name, window_from, window_to, attrs=attrs, cond=cond, cache=False,
+                                       profile=self.scan_profile)
+        if result is None or len(result['date']) == 0:
+            return
+        nrows = len(result['date'])
+        step = nrows if chunk_rows is None else chunk_rows
+        for offset in range(0, nrows, step):
+            yield OrderedDict([(k, v[offset:offset + step]) for k, v in result.items()])
+
+    def _row_nbytes(self, uri, attrs=None):
+        array_uri, _ = self._resolve(uri)
+        with self.handle_pool.acquire(array_uri) as A:
+            domain = A.schema.domain
+            nbytes = sum([domain.dim(i).dtype.itemsize for i in range(domain.ndim)])
+            for i in range(A.schema.nattr):
+                attr = A.schema.attr(i)
+                if attrs is None or attr.name in attrs:
+                    nbytes += attr.dtype.itemsize
+        return nbytes
+
+    def aggregate(self, pair, from_ts, to_ts, freq, how='ohlc', attrs=None, datatype='raw', use_rollup=True):
+        # streams [from_ts, to_ts) in windows aligned on `freq` bins, so every window yields complete bars and
+        # at most one window of source rows is held in memory at a time.
+        offset = pd.tseries.frequencies.to_offset(freq)
+        windows, edges = self._aggregate_windows(from_ts, to_ts, offset)
+        if use_rollup and how == 'ohlc' and datatype == self._RAW_DATA:
+            label = self.rollups.source_level(pair, offset)
+            if label is not None:
+                bars = self.rollups.read_level(pair, label, from_ts, to_ts, attrs=attrs)
+                if len(bars.index) == 0:
+                    return pd.DataFrame()
+                return self._resample(bars, edges, how)
+
+        frames = []
+        for chunk in self.iter_ts(datatype, pair, from_ts, to_ts, attrs=attrs, windows=windows):
+            df = pd.DataFrame.from_dict(chunk).set_index('date')
+            frames.append(self._resample(df, edges, how))
+
+        if len(frames) == 0:
+            return pd.DataFrame()
+        return pd.concat(frames)
+
+    def _aggregate_windows(self, from_ts, to_ts, offset):
+        from_ts = pd.Timestamp(from_ts)
+        to_ts = pd.Timestamp(to_ts)
+        edges = pd.date_range(start=floor_edge(offset, from_ts), end=to_ts + offset, freq=offset)
+        windows = []
+        if len(edges) < 2:
+            return windows, edges.values
+
+        window_seconds = self.config.get_int("tiledb", "aggregate_window", const.DEFAULT_AGGREGATE_WINDOW)
+        bin_seconds = max(1.0, (edges[1] - edges[0]).total_seconds())
+        bins_per_window = max(1, int(window_seconds // bin_seconds))
+        for i in range(0, len(edges) - 1, bins_per_window):
+            window_from = max(edges[i], from_ts)
+            window_to = min(edges[min(i + bins_per_window, len(edges) - 1)], to_ts)
+            if window_from < window_to:
+                # tiledb slices include their upper bound, stop right before the next window starts
+                windows.append((window_from.to_datetime64(), window_to.to_datetime64() - np.timedelta64(1, 'ns')))
+        return windows, edges.values
+
+    def get_bars(self, name, from_ts, to_ts, max_points=None, attrs=None):
+        # OHLC bars of [from_ts, to_ts) at the finest resolution which keeps the result within `max_points`,
+        # returns the chosen rollup level (None for the raw bars) together with the bars
+        label = None
+        if max_points is not None and self.rollups.enabled and self.rollups.is_built(name):
+            label = self.rollups.choose_level(from_ts, to_ts, max_points)
+        if label is None:
+            df = self.get_ts_dataframe(self._RAW_DATA, name, from_ts, np.datetime64(to_ts, 'ns') - np.timedelta64(1, 'ns'),
+                                       attrs=attrs)
+            if df is None or len(df.index) == 0:
+                return label, pd.DataFrame()
+            return label, df.set_index('date')
+        return label, self.rollups.read_level(name, label, from_ts, to_ts, attrs=attrs)
+
+    @staticmethod
+    def ohlc_rules(columns):
+        rules = {}
+        for col in columns:
+            if col.endswith('open'):
+                rules[col] = 'first'
+            elif col.endswith('high'):
+                rules[col] = 'max'
+            elif col.endswith('low'):
+                rules[col] = 'min'
+            elif col.endswith('qty'):
+                rules[col] = 'sum'
+            else:
+                rules[col] = 'last'
+        return rules
+
+    @classmethod
+    def _resample(cls, df, edges, how):
+        # bins are closed on the left and labelled with their left edge, empty bins are dropped
+        labels = edges[np.searchsorted(edges, df.index.values, side='right') - 1]
+        grouped = df.groupby(pd.DatetimeIndex(labels, name='date'), sort=True)
+        if how == 'ohlc':
+            return grouped.agg(cls.ohlc_rules(df.columns))
+        if how in ('first', 'last', 'mean', 'sum', 'min', 'max'):
+            return getattr(grouped, how)()
+        raise ValueError(f"Unsupported aggregation '{how}'")
+
+    def remove_array(self, datatype, name, keep_gaps=False):
+        # `keep_gaps` keeps the gap index record of a raw array which is replaced by a copy of the same data
+        uri = self.get_uri(datatype, name)
+        if self._resolve(uri)[1] is not None:
+            raise ValueError(f"{name} is stored in a shared instrument array and cannot be removed on its own")
+        # buffered rows and their checkpoints would be flushed into an array which does not exist anymore
+        with self.flush_lock:
+            dropped = self.write_buffer.discard(uri)
+        if dropped > 0:
+            self.logger.warning(f"dropped {dropped} buffered rows of removed array {uri}")
+        self.buffered_names.pop(uri, None)
+        self.handle_pool.close(uri)
+        self.existing_arrays.discard(uri)
+        self.dense_layouts.pop(uri, None)
+        self.writer.invalidate(uri)
+        self.result_cache.invalidate(uri)
+        if datatype == self._RAW_DATA and not keep_gaps:
+            self.gaps.remove(name)
+        # object calls instead of the vfs, the in-memory filesystem has no directories to list
+        if self._exists(uri):
+            tiledb.remove(uri, ctx=self.tiledb_ctx)
 
     def get_raw_data(self, name, from_ts, to_ts):
         return self.get_ts_dataarray('raw', name, from_ts, to_ts)
@@ -162,73 +778,127 @@ class TileDBController:
     def get_policy_data(self, name, from_ts, to_ts):
         return self.get_ts_dataarray('policy', name, from_ts, to_ts)
 
-    def create_dataarray(self, uri):
-        dimension = tiledb.Dim(name='date', domain=(np.datetime64('1900-01-01'), np.datetime64('2262-01-01')),
-                               tile=np.timedelta64(365, 'ns'),
-                               dtype=np.datetime64('', 'ns').dtype)
-
-        domain = tiledb.Domain(dimension)
-
-        attrs = [
-            tiledb.Attr(name='bidopen', dtype='float64',
-                        filters=tiledb.FilterList([tiledb.GzipFilter(level=-1)], chunksize=512000)),
-            tiledb.Attr(name='bidclose', dtype='float64',
-                        filters=tiledb.FilterList([tiledb.GzipFilter(level=-1)], chunksize=512000)),
-            tiledb.Attr(name='bidhigh', dtype='float64',
-                        filters=tiledb.FilterList([tiledb.GzipFilter(level=-1)], chunksize=512000)),
-            tiledb.Attr(name='bidlow', dtype='float64',
-                        filters=tiledb.FilterList([tiledb.GzipFilter(level=-1)], chunksize=512000)),
-            tiledb.Attr(name='askopen', dtype='float64',
-                        filters=tiledb.FilterList([tiledb.GzipFilter(level=-1)], chunksize=512000)),
-            tiledb.Attr(name='askclose', dtype='float64',
-                        filters=tiledb.FilterList([tiledb.GzipFilter(level=-1)], chunksize=512000)),
-            tiledb.Attr(name='askhigh', dtype='float64',
-                        filters=tiledb.FilterList([tiledb.GzipFilter(level=-1)], chunksize=512000)),
-            tiledb.Attr(name='asklow', dtype='float64',
-                        filters=tiledb.FilterList([tiledb.GzipFilter(level=-1)], chunksize=512000)),
-            tiledb.Attr(name='tickqty', dtype='int64',
-                        filters=tiledb.FilterList([tiledb.GzipFilter(level=-1)], chunksize=512000)),
-        ]
+    def _layout_of(self, uri, A=None):
+        # None for the sparse datetime layout, the DenseBarLayout of the array otherwise
+        if uri not in self.dense_layouts:
+            if A is None:
+                with self.handle_pool.acquire(self._resolve(uri)[0]) as A:
+                    self.dense_layouts[uri] = DenseBarLayout.of(A)
+            else:
+                self.dense_layouts[uri] = DenseBarLayout.of(A)
+        return self.dense_layouts[uri]
+
+    def migrate_layout(self, datatype, name, layout='dense', period=None):
+        # copies the array into a new one with the wanted layout and swaps it in place of the old one
+        uri = self.get_uri(datatype, name)
+        if self._resolve(uri)[1] is not None:
+            raise ValueError("shared instrument arrays always use the sparse layout")
+        self.flush(uri)
+        target = f"{name}__{layout}"
+        target_uri = self.get_uri(datatype, target)
+        if self._exists(target_uri):
+            tiledb.remove(target_uri, ctx=self.tiledb_ctx)
+        self.create_dataarray(target_uri, layout=layout, period=period)
+
+        nrows = 0
+        domain = self.get_data_domain(datatype, name)
+        if domain is not None:
+            for chunk in self.iter_ts(datatype, name, domain[0], domain[1]):
+                self._write_df(target_uri, pd.DataFrame.from_dict(chunk).set_index('date'), array_existed=True)
+                nrows += len(chunk['date'])
+
+        self.remove_array(datatype, name, keep_gaps=True)
+        self.handle_pool.close(target_uri)
+        self.dense_layouts.pop(target_uri, None)
+        self.writer.invalidate(target_uri)
+        self.existing_arrays.discard(target_uri)
+        tiledb.move(target_uri, uri, ctx=self.tiledb_ctx)
+        self.logger.info(f"migrated {nrows} rows of {uri} to the {layout} layout")
+        return nrows
+
+    def create_dataarray(self, uri, filters=None, layout=None, period=None):
+        array_uri, instrument = self._resolve(uri)
+        if instrument is not None:
+            self._create_shared_array(array_uri, self._RAW_ATTRS, filters)
+            return
+
+        layout = layout or self.config.get_str("tiledb", "raw_layout", const.DEFAULT_RAW_LAYOUT)
+        if layout == "dense":
+            period = period or self.config.get_str("tiledb", "raw_period", const.DEFAULT_RAW_PERIOD)
+            dense_layout = DenseBarLayout(period)
+        elif layout == "sparse":
+            dense_layout = None
+        else:
+            raise ValueError(f"Unsupported array layout '{layout}', expected 'sparse' or 'dense'")
+        self._create_ts_array(uri, self._RAW_ATTRS, filters or self.filters.profile_of(self._datatype_of(uri)),
+                              dense_layout=dense_layout)
+
+    def create_datahealtharray(self, uri, filters=None):
+        array_uri, instrument = self._resolve(uri)
+        if instrument is not None and array_uri.endswith("DAILY_METRICS"):
+            self._create_shared_array(array_uri, self._DAILY_METRICS_ATTRS, filters)
+        elif uri.endswith("DAILY_METRICS"):
+            self._create_ts_array(uri, self._DAILY_METRICS_ATTRS,
+                                  filters or self.filters.profile_of(self._datatype_of(uri)))
+
+    def _create_shared_array(self, uri, columns, filters=None):
+        # several instruments may ask for the shared array, only the first one creates it
+        if uri in self.existing_arrays or self._exists(uri):
+            return
+        self._create_ts_array(uri, columns, filters or self.filters.profile_of(self._datatype_of(uri)),
+                              shared=True)
+        self.existing_arrays.add(uri)
+
+    def _create_ts_array(self, uri, columns, profile, dense_layout=None, shared=False):
+        if dense_layout is not None:
+            self._create_dense_array(uri, columns, profile, dense_layout)
+            return
+
+        ctx = self.tiledb_ctx
+        dim_args = dict(name='date', domain=(np.datetime64('1900-01-01'), np.datetime64('2262-01-01')),
+                        tile=np.timedelta64(365, 'ns'), dtype=np.datetime64('', 'ns').dtype, ctx=ctx)
+        try:
+            # newer tiledb filters each dimension on its own and ignores the schema wide coords filters
+            dimension = tiledb.Dim(filters=self.filters.coords_filters(profile), **dim_args)
+        except TypeError:
+            dimension = tiledb.Dim(**dim_args)
+
+        attrs = [tiledb.Attr(name=name, dtype=dtype, filters=self.filters.attr_filters(profile, name, dtype), ctx=ctx)
+                 for name, dtype in columns]
+        dimensions = [self.shared_instruments.dimension(ctx=ctx), dimension] if shared else [dimension]
 
         arraySchema = tiledb.ArraySchema(
-            domain=domain,
+            domain=tiledb.Domain(*dimensions, ctx=ctx),
             attrs=attrs,
             cell_order='row-major',
             tile_order='row-major',
             capacity=10000,
             sparse=True,
             allows_duplicates=False,
-            coords_filters=tiledb.FilterList([tiledb.GzipFilter(level=-1)], chunksize=512000),
-            offsets_filters=tiledb.FilterList([tiledb.GzipFilter(level=-1)], chunksize=512000))
-
-        tiledb.SparseArray.create(uri, arraySchema)
-
-    def create_datahealtharray(self, uri):
-        if uri.endswith("DAILY_METRICS"):
-            dimension = tiledb.Dim(name='date', domain=(np.datetime64('1900-01-01'), np.datetime64('2262-01-01')),
-                                   tile=np.timedelta64(365, 'ns'),
-                                   dtype=np.datetime64('', 'ns').dtype)
-
-            arraySchema = tiledb.ArraySchema(
-                domain=tiledb.Domain(dimension),
-                attrs=[
-                    tiledb.Attr(name='midclose', dtype='float64',
-                            filters=tiledb.FilterList([tiledb.GzipFilter(level=-1)], chunksize=512000)),
-                    tiledb.Attr(name='logret', dtype='float64',
-                                filters=tiledb.FilterList([tiledb.GzipFilter(level=-1)], chunksize=512000)),
-                    tiledb.Attr(name='logret_ema', dtype='float64',
-                                filters=tiledb.FilterList([tiledb.GzipFilter(level=-1)], chunksize=512000)),
-                ],
-                cell_order='row-major',
-                tile_order='row-major',
-                capacity=10000,
-                sparse=True,
-                allows_duplicates=False,
-                coords_filters=tiledb.FilterList([tiledb.GzipFilter(level=-1)], chunksize=512000),
-                offsets_filters=tiledb.FilterList([tiledb.GzipFilter(level=-1)], chunksize=512000))
-
-            tiledb.SparseArray.create(uri, arraySchema)
+            coords_filters=self.filters.coords_filters(profile),
+            offsets_filters=self.filters.offsets_filters(profile),
+            ctx=ctx)
+
+        tiledb.SparseArray.create(uri, arraySchema, ctx=ctx)
+        self.dense_layouts[uri] = None
+
+    def _create_dense_array(self, uri, columns, profile, dense_layout):
+        ctx = self.tiledb_ctx
+        attrs = [tiledb.Attr(name=name, dtype=dtype, filters=self.filters.attr_filters(profile, name, dtype), ctx=ctx)
+                 for name, dtype in columns]
+
+        arraySchema = tiledb.ArraySchema(
+            domain=tiledb.Domain(dense_layout.dimension(self.filters.coords_filters(profile), ctx=ctx), ctx=ctx),
+            attrs=attrs,
+            cell_order='row-major',
+            tile_order='row-major',
+            sparse=False,
+            ctx=ctx)
 
+        tiledb.DenseArray.create(uri, arraySchema, ctx=ctx)
+        with tiledb.open(uri, 'w', ctx=self.tiledb_ctx) as A:
+            A.meta[DenseBarLayout.META_PERIOD] = dense_layout.period
+        self.dense_layouts[uri] = dense_layout
 
     @classmethod
     def instance(cls):
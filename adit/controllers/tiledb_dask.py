@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import logging
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+import dask
+import dask.dataframe as dd
+
+from .tiledb_controller import TileDBController
+
+__all__ = ['read_dask', 'read_partition', 'partition_bounds']
+
+
+def partition_bounds(from_ts, to_ts, partition_freq: str = 'D') -> List[Tuple[np.datetime64, np.datetime64]]:
+    # inclusive [start, stop] windows on the `partition_freq` grid anchored at midnight of `from_ts`,
+    # the first and the last window are cut at `from_ts` and `to_ts`
+    from_ts = pd.Timestamp(from_ts)
+    to_ts = pd.Timestamp(to_ts)
+    edges = [edge for edge in pd.date_range(from_ts.normalize(), to_ts, freq=partition_freq) if from_ts < edge < to_ts]
+    starts = [from_ts] + edges
+    stops = [edge - pd.Timedelta(1, 'ns') for edge in edges] + [to_ts]
+    return [(start.to_datetime64(), stop.to_datetime64()) for start, stop in zip(starts, stops)]
+
+
+def read_partition(datatype: str, name: str, from_ts, to_ts, attrs=None, cond=None, profile=None,
+                   meta: pd.DataFrame = None) -> pd.DataFrame:
+    # runs on the dask worker: the controller of the worker process reads with its own tiledb context,
+    # nothing but the names and the bounds of the window travel with the task
+    df = TileDBController.instance().get_ts_dataframe(datatype, name, from_ts, to_ts, attrs=attrs, cond=cond,
+                                                      profile=profile, cache=False)
+    if df is None or len(df.index) == 0:
+        return meta.copy() if meta is not None else pd.DataFrame()
+    df = df.set_index('date')
+    return df if meta is None else df[meta.columns].astype(meta.dtypes.to_dict(), copy=False)
+
+
+def read_dask(datatype: str, name: str, from_ts, to_ts, partition_freq: str = 'D', attrs=None, cond=None,
+              profile=None) -> dd.DataFrame:
+    # dask dataframe indexed by date with one partition per `partition_freq` window of [from_ts, to_ts],
+    # partitions are only read when the graph is computed, each on the worker that runs its task
+    logger = logging.getLogger("DaskReader")
+    tiledb = TileDBController.instance()
+    uri = tiledb.get_uri(datatype, name)
+    if not tiledb.array_exists(uri):
+        raise ValueError(f"Array {uri} does not exist")
+    # rows still buffered in this process would be invisible to the workers
+    tiledb.flush(uri)
+
+    sample = tiledb.get_ts_dataframe(datatype, name, from_ts, from_ts, attrs=attrs, cond=cond, profile=profile,
+                                     cache=False)
+    if sample is None:
+        raise ValueError(f"Failed to read the schema of {uri}")
+    meta = sample.set_index('date').iloc[:0]
+
+    bounds = partition_bounds(from_ts, to_ts, partition_freq)
+    parts = [dask.delayed(read_partition)(datatype, name, start, stop, attrs=attrs, cond=cond, profile=profile,
+                                          meta=meta)
+             for start, stop in bounds]
+    divisions = [pd.Timestamp(start) for start, _ in bounds] + [pd.Timestamp(bounds[-1][1])]
+    logger.debug(f"reading {uri} from {from_ts} to {to_ts} in {len(parts)} partitions of {partition_freq}")
+    return dd.from_delayed(parts, meta=meta, divisions=divisions)
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+import tiledb
+
+from .tiledb_query import parse_condition, condition_mask
+
+__all__ = ['DenseBarLayout', 'DENSE_PERIODS']
+
+# period names follow the fxcm candle periods, each one is (bar length in seconds, bars per tile).
+# tiles hold a day of m1/m5/m15/m30 bars, a week of H1/H4 bars and a year of D1 bars.
+DENSE_PERIODS = {
+    'm1': (60, 1440),
+    'm5': (300, 288),
+    'm15': (900, 96),
+    'm30': (1800, 48),
+    'H1': (3600, 168),
+    'H4': (14400, 42),
+    'D1': (86400, 364),
+}
+
+
+class DenseBarLayout:
+    # bars of a fixed period are addressed by their index since the unix epoch, missing bars keep the
+    # tiledb fill values (NaN for prices, INT64_MIN for tick counts) and are dropped on read
+    DIM_NAME = 'bar'
+    VALIDITY_ATTR = 'tickqty'
+    META_PERIOD = 'period'
+    _FIRST_DATE = np.datetime64('1900-01-01', 'ns')
+    _LAST_DATE = np.datetime64('2262-01-01', 'ns')
+
+    def __init__(self, period: str) -> None:
+        if period not in DENSE_PERIODS:
+            raise ValueError(f"Unsupported dense period '{period}', expected one of {sorted(DENSE_PERIODS)}")
+        self.period = period
+        seconds, self.tile = DENSE_PERIODS[period]
+        self.bar_nanos = seconds * 10 ** 9
+
+    @classmethod
+    def of(cls, A) -> DenseBarLayout:
+        if A.schema.sparse or cls.META_PERIOD not in A.meta:
+            return None
+        return cls(A.meta[cls.META_PERIOD])
+
+    def to_index(self, dates) -> np.ndarray:
+        return np.asarray(dates, dtype='datetime64[ns]').astype(np.int64) // self.bar_nanos
+
+    def to_dates(self, index) -> np.ndarray:
+        return (np.asarray(index, dtype=np.int64) * self.bar_nanos).astype('datetime64[ns]')
+
+    def dimension(self, filters: tiledb.FilterList = None, ctx: tiledb.Ctx = None) -> tiledb.Dim:
+        low, high = self.to_index([self._FIRST_DATE, self._LAST_DATE])
+        dim_args = dict(name=self.DIM_NAME, domain=(int(low), int(high)), tile=self.tile, dtype=np.int64, ctx=ctx)
+        try:
+            return tiledb.Dim(filters=filters, **dim_args)
+        except TypeError:
+            return tiledb.Dim(**dim_args)
+
+    def index_range(self, from_ts, to_ts) -> Tuple[int, int]:
+        # the inclusive bar range of [from_ts, to_ts], bars are labelled by the time they start
+        low = -(-int(np.datetime64(from_ts, 'ns').astype(np.int64)) // self.bar_nanos)
+        high = int(np.datetime64(to_ts, 'ns').astype(np.int64)) // self.bar_nanos
+        return low, high
+
+    def nonempty_dates(self, A) -> List[np.datetime64]:
+        domain = A.nonempty_domain()
+        if domain is None:
+            return None
+        low, high = domain[0]
+        return list(self.to_dates([low, high]))
+
+    def read(self, A, from_ts, to_ts, attrs: List[str] = None, cond: str = None) -> OrderedDict:
+        clauses = parse_condition(cond)
+        names = [A.schema.attr(i).name for i in range(A.schema.nattr)]
+        wanted = names if attrs is None else [name for name in names if name in attrs]
+        query_attrs = list(wanted)
+        for name in [self.VALIDITY_ATTR] + [attr for attr, _, _ in clauses]:
+            if name not in query_attrs:
+                query_attrs.append(name)
+
+        low, high = self.index_range(from_ts, to_ts)
+        domain = A.nonempty_domain()
+        if domain is not None:
+            low, high = max(low, int(domain[0][0])), min(high, int(domain[0][1]))
+        if domain is None or low > high:
+            return OrderedDict([('date', np.array([], dtype='datetime64[ns]'))] +
+                               [(name, np.array([], dtype=A.attr(name).dtype)) for name in wanted])
+
+        data = A.query(attrs=query_attrs)[low:high + 1]
+        mask = data[self.VALIDITY_ATTR] != np.iinfo(np.int64).min
+        if len(clauses) > 0:
+            mask &= condition_mask(data, clauses)
+        result = OrderedDict([('date', self.to_dates(np.arange(low, high + 1)[mask]))])
+        for name in wanted:
+            result[name] = data[name][mask]
+        return result
+
+    def write(self, uri: str, df: pd.DataFrame, ctx: tiledb.Ctx = None) -> None:
+        # a dense write covers a contiguous range of bars, existing bars within the range are read back first
+        # so the gaps of `df` do not overwrite them with fill values
+        nanos = np.asarray(df.index.values, dtype='datetime64[ns]').astype(np.int64)
+        if np.any(nanos % self.bar_nanos != 0):
+            raise ValueError(f"Dates of {uri} are not aligned on {self.period} bars")
+        index = nanos // self.bar_nanos
+        low, high = int(index.min()), int(index.max())
+        with tiledb.open(uri, 'r', ctx=ctx) as A:
+            names = [A.schema.attr(i).name for i in range(A.schema.nattr)]
+            existing = A[low:high + 1]
+
+        columns = OrderedDict()
+        for name in names:
+            values = np.array(existing[name], copy=True)
+            values[index - low] = df[name].values
+            columns[name] = values
+        with tiledb.open(uri, 'w', ctx=ctx) as A:
+            A[low:high + 1] = columns
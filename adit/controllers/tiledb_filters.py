@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import re
+from collections import OrderedDict
+from typing import Dict, List
+
+import numpy as np
+import tiledb
+
+__all__ = ['FilterProfiles', 'parse_filter_pipeline', 'BUILTIN_FILTER_PROFILES']
+
+_FILTERS = {
+    'gzip': 'GzipFilter',
+    'zstd': 'ZstdFilter',
+    'lz4': 'LZ4Filter',
+    'bzip2': 'Bzip2Filter',
+    'rle': 'RleFilter',
+    'doubledelta': 'DoubleDeltaFilter',
+    'bitwidthreduction': 'BitWidthReductionFilter',
+    'byteshuffle': 'ByteShuffleFilter',
+    'bitshuffle': 'BitShuffleFilter',
+    'positivedelta': 'PositiveDeltaFilter',
+    'noop': 'NoOpFilter',
+}
+_FILTER_SPEC = re.compile(r"^\s*([a-z0-9]+)\s*(?:\(\s*([^)]*)\))?\s*$")
+_CHUNKSIZE = 512000
+
+# a profile maps a column to a pipeline, looked up by attribute name, then by dtype, then `default`.
+# `coords` is the pipeline of the date dimension and `offsets` the one of var-sized attributes.
+BUILTIN_FILTER_PROFILES = OrderedDict([
+    ('gzip', {
+        'default': 'gzip(level=-1)',
+        'coords': 'gzip(level=-1)',
+        'offsets': 'gzip(level=-1)',
+    }),
+    ('zstd', {
+        'default': 'byteshuffle,zstd(level=3)',
+        'int64': 'bitwidthreduction,zstd(level=3)',
+        'coords': 'doubledelta,zstd(level=3)',
+        'offsets': 'doubledelta,zstd(level=3)',
+    }),
+    ('lz4', {
+        'default': 'byteshuffle,lz4',
+        'int64': 'bitwidthreduction,lz4',
+        'coords': 'doubledelta,lz4',
+        'offsets': 'doubledelta,lz4',
+    }),
+])
+
+
+def parse_filter_pipeline(spec: str) -> tiledb.FilterList:
+    # "byteshuffle,zstd(level=5)" -> FilterList([ByteShuffleFilter(), ZstdFilter(level=5)])
+    filters = []
+    for item in [item for item in re.split(r",(?![^(]*\))", spec or "") if item.strip() != ""]:
+        matched = _FILTER_SPEC.match(item.lower())
+        if matched is None or matched.group(1) not in _FILTERS:
+            raise ValueError(f"Unsupported filter '{item.strip()}', expected one of {sorted(_FILTERS)}")
+        name, args = matched.groups()
+        filter_cls = getattr(tiledb, _FILTERS[name], None)
+        if filter_cls is None:
+            raise ValueError(f"Filter '{name}' is not available in tiledb {tiledb.__version__}")
+
+        kwargs = {}
+        for arg in [arg for arg in (args or "").split(",") if arg.strip() != ""]:
+            key, value = [part.strip() for part in arg.split("=", 1)]
+            kwargs[key] = int(value)
+        filters.append(filter_cls(**kwargs))
+    return tiledb.FilterList(filters, chunksize=_CHUNKSIZE)
+
+
+class FilterProfiles:
+    # profiles come from the builtin ones and from [filters:<profile>] sections of the config,
+    # the profile of each array type is chosen with `<datatype>_filters` under [tiledb]
+    _SECTION_PREFIX = "filters:"
+
+    def __init__(self, config, default_profile: str = 'gzip') -> None:
+        self.config = config
+        self.default_profile = default_profile
+        self.profiles: Dict[str, Dict[str, str]] = OrderedDict(
+            [(name, dict(profile)) for name, profile in BUILTIN_FILTER_PROFILES.items()])
+        for section in config.config.sections():
+            if section.startswith(self._SECTION_PREFIX):
+                name = section[len(self._SECTION_PREFIX):]
+                self.profiles[name] = dict(self.profiles.get(name, {}), **dict(config.config[section]))
+
+    def names(self) -> List[str]:
+        return list(self.profiles.keys())
+
+    def profile_of(self, datatype: str) -> str:
+        return self.config.get_str("tiledb", f"{datatype}_filters", self.default_profile)
+
+    def _spec(self, profile: str, keys: List[str]) -> str:
+        if profile not in self.profiles:
+            raise ValueError(f"Unknown filter profile '{profile}', expected one of {self.names()}")
+        for key in keys:
+            if key in self.profiles[profile]:
+                return self.profiles[profile][key]
+        return self.profiles[profile].get('default', "")
+
+    def attr_filters(self, profile: str, name: str, dtype) -> tiledb.FilterList:
+        return parse_filter_pipeline(self._spec(profile, [name, np.dtype(dtype).name]))
+
+    def coords_filters(self, profile: str) -> tiledb.FilterList:
+        return parse_filter_pipeline(self._spec(profile, ['coords']))
+
+    def offsets_filters(self, profile: str) -> tiledb.FilterList:
+        return parse_filter_pipeline(self._spec(profile, ['offsets']))
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+from typing import Callable, Dict, List, Union
+
+import numpy as np
+
+from adit.utils import IntervalSet, market_open
+from .tiledb_kvstore import MetadataStore
+
+__all__ = ['GapIndex', 'GapRecord']
+
+
+class GapRecord:
+    # what is known of the raw data of one pair: the crawled extent, the market hours of it which the source had
+    # no bars for (gaps), and the gaps a repair fetched again without getting bars (unavailable)
+    def __init__(self, start: int = None, end: int = None, gaps: IntervalSet = None,
+                 unavailable: IntervalSet = None) -> None:
+        self.start = start
+        self.end = end
+        self.gaps = IntervalSet() if gaps is None else gaps
+        self.unavailable = IntervalSet() if unavailable is None else unavailable
+
+    @classmethod
+    def from_flat(cls, values) -> GapRecord:
+        # (start, end, number of gap bounds, gap bounds..., unavailable bounds...)
+        values = [int(value) for value in values]
+        ngaps = values[2]
+        return cls(values[0], values[1], IntervalSet.from_flat(values[3:3 + ngaps]),
+                   IntervalSet.from_flat(values[3 + ngaps:]))
+
+    def to_flat(self) -> tuple:
+        if self.start is None:
+            raise ValueError("a gap record without a crawled extent cannot be stored")
+        gaps = self.gaps.to_flat()
+        return tuple([self.start, self.end, len(gaps)] + gaps + self.unavailable.to_flat())
+
+    def extend(self, start: int, end: int) -> None:
+        self.start = start if self.start is None else min(self.start, start)
+        self.end = end if self.end is None else max(self.end, end)
+
+    def copy(self) -> GapRecord:
+        return GapRecord(self.start, self.end, self.gaps.copy(), self.unavailable.copy())
+
+    def get_coverage(self) -> Dict:
+        # share of the market hours of the extent which has bars, computed from the intervals alone
+        if self.start is None:
+            return {'start': None, 'end': None, 'open_seconds': 0.0, 'missing_seconds': 0.0, 'gaps': 0,
+                    'unavailable': 0, 'coverage': 100.0}
+        open_ns = market_open(self.start, self.end).total()
+        missing_ns = self.gaps.total() + self.unavailable.total()
+        return {
+            'start': np.datetime64(self.start, 'ns'),
+            'end': np.datetime64(self.end, 'ns'),
+            'open_seconds': open_ns / 1e9,
+            'missing_seconds': missing_ns / 1e9,
+            'gaps': len(self.gaps),
+            'unavailable': len(self.unavailable),
+            'coverage': 100.0 * (1 - missing_ns / open_ns) if open_ns > 0 else 100.0,
+        }
+
+
+class GapIndex(MetadataStore):
+    # one GapRecord per pair, kept as metadata of a single tiny array like the checkpoints. a record is a few
+    # hundred integers at most, every update rewrites the whole record of its pair.
+    _ARRAY_NAME = "gap-index"
+
+    def _encode(self, record: GapRecord) -> tuple:
+        return record.to_flat()
+
+    def _decode(self, value) -> GapRecord:
+        return GapRecord.from_flat(value)
+
+    def get(self, name: str) -> Union[GapRecord, None]:
+        with self.lock:
+            record = super().get(name)
+            return None if record is None else record.copy()
+
+    def names(self) -> List[str]:
+        return self.keys()
+
+    def update(self, name: str, func: Callable[[GapRecord], None]) -> GapRecord:
+        # `func` changes the record of `name` in place, the record is read again first so an update of another
+        # process within the ttl is not overwritten. a record without a crawled extent knows nothing of its pair
+        # and is not stored.
+        with self.lock:
+            self.refresh()
+            record = super().get(name)
+            record = GapRecord() if record is None else record.copy()
+            func(record)
+            if record.start is not None:
+                self.put(name, record)
+            return record.copy()
+
+    def remove(self, name: str) -> None:
+        self.delete_many([name])
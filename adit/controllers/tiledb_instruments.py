@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import tiledb
+
+from .tiledb_query import parse_condition, condition_mask
+
+__all__ = ['SharedInstrumentLayout']
+
+
+class SharedInstrumentLayout:
+    # all instruments of a data type share one sparse array keyed on (instrument, date). the per instrument
+    # names used by callers are split at their first '_': EURUSD -> INSTRUMENTS, EURUSD_m5 -> INSTRUMENTS_m5 and
+    # EURUSD_DAILY_METRICS -> INSTRUMENTS_DAILY_METRICS, each time with EURUSD as instrument.
+    # names starting with '__' are private arrays and are never shared.
+    ARRAY_NAME = "INSTRUMENTS"
+    DIM_NAME = 'instrument'
+    _META_MIN = "min/{instrument}"
+    _META_MAX = "max/{instrument}"
+
+    def resolve(self, name: str) -> Tuple[str, Union[str, None]]:
+        if name.startswith("__"):
+            return name, None
+        instrument, _, table = name.partition("_")
+        return (self.ARRAY_NAME if table == "" else f"{self.ARRAY_NAME}_{table}"), instrument
+
+    def dimension(self, ctx: tiledb.Ctx = None) -> tiledb.Dim:
+        return tiledb.Dim(name=self.DIM_NAME, domain=(None, None), tile=None, dtype='ascii', ctx=ctx)
+
+    def domain(self, A, instrument: str) -> Union[List[np.datetime64], None]:
+        low = self._META_MIN.format(instrument=instrument)
+        high = self._META_MAX.format(instrument=instrument)
+        if low not in A.meta or high not in A.meta:
+            return None
+        return [np.datetime64(int(A.meta[low]), 'ns'), np.datetime64(int(A.meta[high]), 'ns')]
+
+    def read(self, A, instruments: List[str], from_ts, to_ts, attrs: List[str] = None,
+             cond: str = None) -> Dict[str, OrderedDict]:
+        # one query for all instruments, split per instrument afterwards
+        clauses = parse_condition(cond)
+        names = [A.schema.attr(i).name for i in range(A.schema.nattr)]
+        wanted = names if attrs is None else [name for name in names if name in attrs]
+        query_attrs = list(wanted) + [attr for attr, _, _ in clauses if attr not in wanted]
+
+        data = A.query(attrs=query_attrs, coords=True).multi_index[list(instruments), from_ts:to_ts]
+        column = np.asarray([x.decode() if isinstance(x, bytes) else x for x in data[self.DIM_NAME]], dtype=object)
+        mask = condition_mask(data, clauses) if len(clauses) > 0 else None
+
+        results = OrderedDict()
+        for instrument in instruments:
+            selected = column == instrument
+            if mask is not None:
+                selected &= mask
+            result = OrderedDict([('date', data['date'][selected])])
+            for name in wanted:
+                result[name] = data[name][selected]
+            results[instrument] = result
+        return results
+
+    def write(self, uri: str, instrument: str, df: pd.DataFrame, ctx: tiledb.Ctx = None) -> None:
+        dates = np.asarray(df.index.values, dtype='datetime64[ns]')
+        low_key = self._META_MIN.format(instrument=instrument)
+        high_key = self._META_MAX.format(instrument=instrument)
+        with tiledb.open(uri, 'r', ctx=ctx) as A:
+            names = [A.schema.attr(i).name for i in range(A.schema.nattr)]
+            low = int(dates.min().astype(np.int64))
+            high = int(dates.max().astype(np.int64))
+            if low_key in A.meta and high_key in A.meta:
+                low, high = min(low, int(A.meta[low_key])), max(high, int(A.meta[high_key]))
+
+        with tiledb.open(uri, 'w', ctx=ctx) as A:
+            A[np.array([instrument] * len(dates)), dates] = {name: df[name].values for name in names}
+            A.meta[low_key] = low
+            A.meta[high_key] = high
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import time
+import threading
+from typing import Any, Dict, List, Iterable
+
+import numpy as np
+import tiledb
+
+__all__ = ['MetadataStore', 'CheckpointStore']
+
+
+class MetadataStore:
+    # values kept as metadata of a single tiny array, so a lookup never needs a data query. the metadata is
+    # cached for `ttl` seconds, subclasses convert their values from and to what tiledb metadata can hold.
+    _ARRAY_NAME = None
+
+    def __init__(self, bucket_uri: str, ctx: tiledb.Ctx = None, ttl: int = 60) -> None:
+        self.uri = bucket_uri + "/" + self._ARRAY_NAME
+        self.ctx = ctx
+        self.ttl = ttl
+        self.lock = threading.RLock()
+        self.cache: Dict[str, Any] = {}
+        self.loaded_at = None
+
+    def _encode(self, value: Any) -> Any:
+        raise NotImplementedError()
+
+    def _decode(self, value: Any) -> Any:
+        raise NotImplementedError()
+
+    def _create(self) -> None:
+        dimension = tiledb.Dim(name='idx', domain=(0, 0), tile=1, dtype=np.int64, ctx=self.ctx)
+        schema = tiledb.ArraySchema(domain=tiledb.Domain(dimension, ctx=self.ctx),
+                                    attrs=[tiledb.Attr(name='unused', dtype=np.int8, ctx=self.ctx)],
+                                    sparse=False, ctx=self.ctx)
+        tiledb.DenseArray.create(self.uri, schema, ctx=self.ctx)
+
+    def _load(self) -> None:
+        if self.loaded_at is not None and (time.time() - self.loaded_at) < self.ttl:
+            return
+
+        cache = {}
+        if tiledb.object_type(self.uri, ctx=self.ctx) == "array":
+            with tiledb.open(self.uri, 'r', ctx=self.ctx) as A:
+                for key, value in A.meta.items():
+                    cache[key] = self._decode(value)
+        else:
+            self._create()
+        self.cache = cache
+        self.loaded_at = time.time()
+
+    def get(self, key: str) -> Any:
+        with self.lock:
+            self._load()
+            return self.cache.get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        with self.lock:
+            self._load()
+            return {key: self.cache.get(key) for key in keys}
+
+    def keys(self, prefix: str = "") -> List[str]:
+        with self.lock:
+            self._load()
+            return [key for key in self.cache if key.startswith(prefix)]
+
+    def put(self, key: str, value: Any) -> None:
+        self.put_many({key: value})
+
+    def put_many(self, items: Dict[str, Any]) -> None:
+        if len(items) == 0:
+            return
+
+        with self.lock:
+            self._load()
+            encoded = {key: self._encode(value) for key, value in items.items()}
+            with tiledb.open(self.uri, 'w', ctx=self.ctx) as A:
+                for key, value in encoded.items():
+                    A.meta[key] = value
+            for key, value in encoded.items():
+                self.cache[key] = self._decode(value)
+
+    def delete_many(self, keys: Iterable[str]) -> None:
+        with self.lock:
+            self._load()
+            keys = [key for key in keys if key in self.cache]
+            if len(keys) == 0:
+                return
+            with tiledb.open(self.uri, 'w', ctx=self.ctx) as A:
+                for key in keys:
+                    del A.meta[key]
+            for key in keys:
+                del self.cache[key]
+
+    def refresh(self) -> None:
+        with self.lock:
+            self.loaded_at = None
+
+
+class CheckpointStore(MetadataStore):
+    # checkpoints are dates, kept as nanoseconds since the epoch
+    _ARRAY_NAME = "checkpoints"
+
+    def _encode(self, value: np.datetime64) -> int:
+        return int(np.datetime64(value, 'ns').astype(np.int64))
+
+    def _decode(self, value: int) -> np.datetime64:
+        return np.datetime64(int(value), 'ns')
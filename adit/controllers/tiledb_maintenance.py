@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import time
+import asyncio
+import logging
+from typing import Dict, List, Any
+
+import numpy as np
+import tiledb
+
+from adit.config import Config
+import adit.constants as const
+from .evenloop_controller import EventLoopController
+from .pool_controller import TPOOL
+from .tiledb_controller import TileDBController
+from .tiledb_dense import DenseBarLayout
+
+__all__ = ['TileDBMaintenance']
+
+
+class TileDBMaintenance:
+    _INSTANCE = None
+    TASK_NAME = "tiledb-maintenance"
+
+    def __init__(self):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.config = Config.instance()
+        self.tiledb = TileDBController.instance()
+        self.evl = EventLoopController.instance()
+        self.evl_loop = self.evl.get_loop()
+        self.frequency = self.config.get_int("tiledb_maintenance", "frequency", const.DEFAULT_MAINTENANCE_FREQUENCY)
+        self.probe_window = self.config.get_int("tiledb_maintenance", "probe_window", const.DEFAULT_MAINTENANCE_PROBE_WINDOW)
+        self.policies = {}
+        for datatype in self.tiledb.buckets:
+            self.policies[datatype] = {
+                'min_fragments': self.config.get_int("tiledb_maintenance", f"{datatype}_min_fragments",
+                                                     const.DEFAULT_MAINTENANCE_MIN_FRAGMENTS),
+                'small_fragment_size': self.config.get_int("tiledb_maintenance", f"{datatype}_small_fragment_size",
+                                                           const.DEFAULT_MAINTENANCE_SMALL_FRAGMENT_SIZE),
+            }
+        self.reports: Dict[str, Dict[str, Any]] = {}
+
+    def needs_maintenance(self, datatype: str, nfragments: int, size: int) -> bool:
+        policy = self.policies[datatype]
+        if nfragments < 2:
+            return False
+        if nfragments >= policy['min_fragments']:
+            return True
+        return (size / nfragments) < policy['small_fragment_size']
+
+    def probe_read_latency(self, uri: str) -> float:
+        starttime = time.time()
+        with tiledb.open(uri, 'r', ctx=self.tiledb.tiledb_ctx) as A:
+            domain = A.nonempty_domain()
+            if domain is not None:
+                # the time dimension is the last one, shared instrument arrays are keyed on (instrument, date)
+                low, high = domain[-1]
+                layout = DenseBarLayout.of(A)
+                if layout is not None:
+                    low = max(low, high - (self.probe_window * 10 ** 9) // layout.bar_nanos)
+                elif np.issubdtype(A.schema.domain.dim(A.schema.domain.ndim - 1).dtype, np.datetime64):
+                    low = max(low, high - np.timedelta64(self.probe_window, 's'))
+                if A.schema.domain.ndim > 1:
+                    A.multi_index[:, low:high]
+                else:
+                    A.multi_index[low:high]
+        return time.time() - starttime
+
+    def maintain_array(self, datatype: str, uri: str) -> Dict[str, Any]:
+        fragments_before = len(self.tiledb.list_fragments(uri))
+        meta_before = len(self.tiledb.list_array_meta(uri))
+        size_before = self.tiledb.get_array_size(uri)
+        fragments_due = self.needs_maintenance(datatype, fragments_before, size_before)
+        # checkpoints are written as array metadata, every put leaves one more small metadata file behind
+        meta_due = meta_before >= self.policies[datatype]['min_fragments']
+        if not fragments_due and not meta_due:
+            return None
+
+        self.logger.info(f"consolidating {fragments_before} fragments and {meta_before} metadata files "
+                         f"({size_before} bytes) of {uri}")
+        starttime = time.time()
+        latency_before = self.probe_read_latency(uri)
+        if fragments_due:
+            self.tiledb.consolidate(uri, mode="fragments")
+            self.tiledb.consolidate(uri, mode="fragment_meta")
+            self.tiledb.vacuum(uri, mode="fragments")
+        if meta_due:
+            self.tiledb.consolidate(uri, mode="array_meta")
+            self.tiledb.vacuum(uri, mode="array_meta")
+        latency_after = self.probe_read_latency(uri)
+
+        report = {
+            'datatype': datatype,
+            'fragments_before': fragments_before,
+            'fragments_after': len(self.tiledb.list_fragments(uri)),
+            'array_meta_before': meta_before,
+            'array_meta_after': len(self.tiledb.list_array_meta(uri)),
+            'size_before': size_before,
+            'size_after': self.tiledb.get_array_size(uri),
+            'read_latency_before': latency_before,
+            'read_latency_after': latency_after,
+            'read_latency_delta': latency_after - latency_before,
+            'duration': time.time() - starttime,
+            'finished_at': time.time(),
+        }
+        self.logger.info(f"maintenance of {uri} finished: {report}")
+        return report
+
+    def run_once(self) -> List[Dict[str, Any]]:
+        reports = []
+        for datatype in self.tiledb.buckets:
+            try:
+                uris = self.tiledb.list_arrays(datatype)
+            except Exception as ex:
+                self.logger.error(f"Failed to list arrays of {datatype} bucket", exc_info=ex)
+                continue
+
+            for uri in uris:
+                try:
+                    report = self.maintain_array(datatype, uri)
+                    if report is not None:
+                        self.reports[uri] = report
+                        reports.append(report)
+                except Exception as ex:
+                    self.logger.error(f"Failed to consolidate and vacuum {uri}", exc_info=ex)
+        return reports
+
+    def get_reports(self) -> Dict[str, Dict[str, Any]]:
+        return dict(self.reports)
+
+    def start(self) -> None:
+        self.evl.shedule_task(self.TASK_NAME, self._run)
+
+    def stop(self) -> None:
+        self.evl.stop_task(self.TASK_NAME)
+
+    async def _run(self, queue):
+        self.logger.info("starting tiledb maintenance job")
+        while True:
+            try:
+                reports = await self.evl_loop.run_in_executor(TPOOL, self.run_once)
+                self.logger.debug(f"tiledb maintenance maintained {len(reports)} arrays")
+            except Exception as ex:
+                self.logger.error("tiledb maintenance has exception", exc_info=ex)
+            await asyncio.sleep(self.frequency)
+
+    @classmethod
+    def instance(cls):
+        if cls._INSTANCE is None:
+            cls._INSTANCE = TileDBMaintenance()
+        return cls._INSTANCE
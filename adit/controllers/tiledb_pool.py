@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Tuple, Any, Callable
+
+import tiledb
+
+__all__ = ['ArrayHandlePool']
+
+
+class _PooledHandle:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.array = None
+        self.opened_at = 0.0
+        self.stale = False
+        self.version = None
+
+
+class ArrayHandlePool:
+    def __init__(self, ctx: tiledb.Ctx = None, ttl: int = 60, contexts: Callable[[str], tiledb.Ctx] = None,
+                 versions: Callable[[str], Any] = None) -> None:
+        self.ctx = ctx
+        self.ttl = ttl
+        self.contexts = contexts
+        self.versions = versions
+        self.lock = threading.Lock()
+        self.handles: Dict[Tuple[str, str, str], _PooledHandle] = {}
+        # bumped whenever the handles of a uri are invalidated or closed, i.e. on every change made in this process
+        self.generations: Dict[str, int] = {}
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'reopens': 0,
+            'errors': 0,
+        }
+
+    def _get_handle(self, uri: str, mode: str, profile: str) -> _PooledHandle:
+        with self.lock:
+            handle = self.handles.get((uri, mode, profile))
+            if handle is None:
+                handle = _PooledHandle()
+                self.handles[(uri, mode, profile)] = handle
+            return handle
+
+    def _count(self, stat: str) -> None:
+        with self.lock:
+            self.stats[stat] += 1
+
+    @contextmanager
+    def acquire(self, uri: str, mode: str = 'r', profile: str = None):
+        # one handle per (uri, mode, profile); queries on the same handle are serialized, other arrays proceed
+        # in parallel. `profile` opens the array with the tiledb context of that tuning profile.
+        handle = self._get_handle(uri, mode, profile)
+        with handle.lock:
+            if handle.array is None:
+                ctx = self.ctx if profile is None or self.contexts is None else self.contexts(profile)
+                handle.version = self._version(uri, mode)
+                handle.array = tiledb.open(uri, mode, ctx=ctx)
+                handle.opened_at = time.time()
+                handle.stale = False
+                self._count('misses')
+            elif handle.stale or (time.time() - handle.opened_at) >= self.ttl:
+                handle.version = self._version(uri, mode)
+                handle.array.reopen()
+                handle.opened_at = time.time()
+                handle.stale = False
+                self._count('reopens')
+            else:
+                self._count('hits')
+
+            try:
+                yield handle.array
+            except Exception:
+                # never keep a handle around which may be left in a bad state
+                self._count('errors')
+                self._close_handle(handle)
+                raise
+
+    def _version(self, uri: str, mode: str) -> Any:
+        # listed before the array is opened, so the handle sees at least the fragments of its version
+        if self.versions is None or mode != 'r':
+            return None
+        return self.versions(uri)
+
+    def version(self, uri: str, mode: str = 'r', profile: str = None) -> Any:
+        # the version of the handle acquired by the caller, only meaningful within `acquire`
+        return self._get_handle(uri, mode, profile).version
+
+    def generation(self, uri: str) -> int:
+        with self.lock:
+            return self.generations.get(uri, 0)
+
+    def _bump(self, uri: str = None) -> None:
+        for key in ([uri] if uri is not None else list(self.generations)):
+            self.generations[key] = self.generations.get(key, 0) + 1
+
+    def invalidate(self, uri: str) -> None:
+        with self.lock:
+            self._bump(uri)
+            handles = [handle for key, handle in self.handles.items() if key[0] == uri]
+        for handle in handles:
+            handle.stale = True
+
+    def close(self, uri: str = None) -> None:
+        with self.lock:
+            self._bump(uri)
+            keys = [key for key in self.handles if uri is None or key[0] == uri]
+            handles = [self.handles.pop(key) for key in keys]
+        for handle in handles:
+            with handle.lock:
+                self._close_handle(handle)
+
+    @staticmethod
+    def _close_handle(handle: _PooledHandle) -> None:
+        try:
+            if handle.array is not None:
+                handle.array.close()
+        except Exception:
+            pass
+        handle.array = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            stats = dict(self.stats)
+            stats['open_handles'] = len([h for h in self.handles.values() if h.array is not None])
+            return stats
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Dict, List
+
+import tiledb
+
+from adit.utils import get_ncores
+
+__all__ = ['ContextProfiles', 'builtin_context_profiles']
+
+
+def builtin_context_profiles(ncores: int) -> OrderedDict:
+    # `default` keeps the settings adit always used, the others are starting points for `adit tune-storage`
+    return OrderedDict([
+        ('default', {
+            'sm.tile_cache_size': str(100 * 1000 * 1000),
+            'sm.num_reader_threads': '1',
+            'sm.num_writer_threads': '1',
+            'vfs.num_threads': str(ncores),
+        }),
+        ('ingest', {
+            'sm.tile_cache_size': str(10 * 1000 * 1000),
+            'sm.num_reader_threads': '1',
+            'sm.num_writer_threads': str(min(4, ncores)),
+            'vfs.num_threads': str(ncores),
+            'vfs.s3.max_parallel_ops': str(ncores),
+            'vfs.s3.multipart_part_size': str(16 * 1024 * 1024),
+        }),
+        ('analytics', {
+            'sm.tile_cache_size': str(500 * 1000 * 1000),
+            'sm.num_reader_threads': str(ncores),
+            'sm.num_writer_threads': '1',
+            'vfs.num_threads': str(ncores),
+            'vfs.s3.max_parallel_ops': str(2 * ncores),
+            'vfs.min_parallel_size': str(1024 * 1024),
+        }),
+        ('dashboard', {
+            'sm.tile_cache_size': str(200 * 1000 * 1000),
+            'sm.num_reader_threads': str(min(2, ncores)),
+            'sm.num_writer_threads': '1',
+            'vfs.num_threads': str(min(4, ncores)),
+        }),
+        ('scan', {
+            # tiledb-py allocates its query buffers up front, a small start keeps a windowed scan within a
+            # few MB per window, larger windows grow the buffers as the query comes back incomplete
+            'sm.tile_cache_size': str(10 * 1000 * 1000),
+            'sm.num_reader_threads': str(ncores),
+            'sm.num_writer_threads': '1',
+            'vfs.num_threads': str(ncores),
+            'py.init_buffer_bytes': str(1024 * 1024),
+        }),
+    ])
+
+
+class ContextProfiles:
+    # named tiledb settings layered over the base connection settings, [tiledb_profile:<name>] config
+    # sections add profiles or override the builtin ones. every profile gets its own cached tiledb.Ctx.
+    SECTION_PREFIX = "tiledb_profile:"
+
+    def __init__(self, config, base: tiledb.Config) -> None:
+        self.config = config
+        self.base = base.dict()
+        self.lock = threading.Lock()
+        self.contexts: Dict[str, tiledb.Ctx] = {}
+        self.shared_ctx = None
+        self.profiles = builtin_context_profiles(get_ncores())
+        for section in config.config.sections():
+            if section.startswith(self.SECTION_PREFIX):
+                name = section[len(self.SECTION_PREFIX):]
+                self.profiles[name] = dict(self.profiles.get(name, {}), **dict(config.config[section]))
+
+    def names(self) -> List[str]:
+        return list(self.profiles.keys())
+
+    def settings(self, name: str) -> Dict[str, str]:
+        if name not in self.profiles:
+            raise ValueError(f"Unknown tiledb profile '{name}', expected one of {self.names()}")
+        return dict(self.profiles[name])
+
+    def tiledb_config(self, name: str, overrides: Dict[str, str] = None) -> tiledb.Config:
+        conf = tiledb.Config(self.base)
+        for key, value in dict(self.settings(name), **(overrides or {})).items():
+            conf[key] = str(value)
+        return conf
+
+    def ctx(self, name: str) -> tiledb.Ctx:
+        if self.shared_ctx is not None:
+            return self.shared_ctx
+        with self.lock:
+            if name not in self.contexts:
+                self.contexts[name] = tiledb.Ctx(config=self.tiledb_config(name))
+            return self.contexts[name]
+
+    def save(self, name: str, settings: Dict[str, str]) -> None:
+        with self.lock:
+            self.profiles[name] = dict(settings)
+            self.contexts.pop(name, None)
+        self.config.config[self.SECTION_PREFIX + name] = {key: str(value) for key, value in settings.items()}
+        self.config.dump_config()
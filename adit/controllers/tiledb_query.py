@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import re
+import operator
+from collections import OrderedDict
+from typing import List, Tuple, Dict, Union
+
+import numpy as np
+import tiledb
+
+__all__ = ['parse_condition', 'condition_mask', 'query_slice']
+
+# tiledb started to evaluate query conditions natively in newer releases, older ones filter after the read
+HAS_QUERY_CONDITION = hasattr(tiledb, "QueryCondition")
+
+_OPERATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+_CLAUSE = re.compile(r"^\s*([A-Za-z_]\w*)\s*(<=|>=|==|!=|<|>)\s*(-?[0-9.eE+-]+)\s*$")
+
+
+def parse_condition(cond: str) -> List[Tuple[str, str, float]]:
+    if cond is None:
+        return []
+
+    clauses = []
+    for clause in re.split(r"\s+and\s+", cond.strip()):
+        matched = _CLAUSE.match(clause)
+        if matched is None:
+            raise ValueError(f"Unsupported query condition '{clause}', expected '<attr> <op> <number>' joined by 'and'")
+        attr, op, value = matched.groups()
+        clauses.append((attr, op, float(value)))
+    return clauses
+
+
+def condition_mask(columns: Dict[str, np.ndarray], clauses: List[Tuple[str, str, float]]) -> Union[np.ndarray, None]:
+    mask = None
+    for attr, op, value in clauses:
+        clause_mask = _OPERATORS[op](columns[attr], value)
+        mask = clause_mask if mask is None else (mask & clause_mask)
+    return mask
+
+
+def query_slice(A, from_ts, to_ts, attrs: List[str] = None, cond: str = None) -> OrderedDict:
+    clauses = parse_condition(cond)
+    if attrs is None and cond is None:
+        return A[from_ts:to_ts]
+
+    if cond is not None and HAS_QUERY_CONDITION:
+        return A.query(attrs=attrs, coords=True, cond=cond)[from_ts:to_ts]
+
+    query_attrs = None
+    if attrs is not None:
+        query_attrs = list(attrs) + [attr for attr, _, _ in clauses if attr not in attrs]
+    result = A.query(attrs=query_attrs, coords=True)[from_ts:to_ts]
+    if len(clauses) == 0:
+        return result
+
+    dims = [A.schema.domain.dim(i).name for i in range(A.schema.domain.ndim)]
+    mask = condition_mask(result, clauses)
+    return OrderedDict([(k, v[mask]) for k, v in result.items() if attrs is None or k in attrs or k in dims])
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Any, Dict, Union
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+__all__ = ['RESULT_FORMATS', 'arrow_available', 'to_result_format', 'to_arrow_table', 'column_buffers', 'backfill_nan']
+
+# 'numpy' hands out the {column: ndarray} of the query as is, 'arrow' wraps the same buffers in a pyarrow Table
+# (primitive and datetime64[ns] columns are not copied), 'pandas' builds a DataFrame which copies every column
+# into its blocks.
+RESULT_FORMATS = ['numpy', 'arrow', 'pandas']
+
+
+def arrow_available() -> bool:
+    return pa is not None
+
+
+def to_arrow_table(result: Dict[str, np.ndarray]):
+    if pa is None:
+        raise ValueError("The 'arrow' result format requires pyarrow, install it with `pip install pyarrow`")
+    columns = OrderedDict()
+    for name, values in result.items():
+        values = np.asarray(values)
+        # only contiguous buffers are wrapped as they are, anything else is copied once by pyarrow
+        columns[name] = pa.array(values if values.flags.c_contiguous else np.ascontiguousarray(values))
+    return pa.Table.from_arrays(list(columns.values()), names=list(columns.keys()))
+
+
+def to_result_format(result: Union[Dict[str, np.ndarray], None], result_format: str = 'numpy') -> Any:
+    if result_format not in RESULT_FORMATS:
+        raise ValueError(f"Unknown result format '{result_format}', expected one of {RESULT_FORMATS}")
+    if result is None:
+        return None
+    if result_format == 'numpy':
+        return result
+    if result_format == 'arrow':
+        return to_arrow_table(result)
+    return pd.DataFrame.from_dict(result)
+
+
+def _arrow_column(column) -> np.ndarray:
+    # a single chunk without nulls is viewed in place, combining chunks always allocates a new buffer
+    if column.num_chunks == 1:
+        return column.chunk(0).to_numpy(zero_copy_only=False)
+    return column.to_numpy()
+
+
+def column_buffers(result: Any) -> Dict[str, np.ndarray]:
+    # numpy views of the columns of a result of any format, without copying where the format allows it
+    if isinstance(result, pd.DataFrame):
+        return OrderedDict((name, result[name].to_numpy()) for name in result.columns)
+    if pa is not None and isinstance(result, pa.Table):
+        return OrderedDict((name, _arrow_column(result.column(name))) for name in result.column_names)
+    return OrderedDict((name, np.asarray(values)) for name, values in result.items())
+
+
+def backfill_nan(values: np.ndarray) -> np.ndarray:
+    # fillna(method='bfill') of one column, a column without NaN is returned as is instead of copied
+    if values.dtype.kind != 'f':
+        return values
+    missing = np.isnan(values)
+    if not missing.any():
+        return values
+    positions = np.where(missing, len(values), np.arange(len(values)))
+    positions = np.minimum.accumulate(positions[::-1])[::-1]
+    return np.append(values, np.nan)[positions]
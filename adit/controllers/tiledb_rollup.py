@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Union
+
+import numpy as np
+import pandas as pd
+
+__all__ = ['RollupPyramid', 'parse_rollup_levels', 'floor_edge', 'ceil_edge']
+
+_DAY_NANOS = 86400 * 10 ** 9
+
+
+def parse_rollup_levels(spec: str) -> OrderedDict:
+    # "m5:5min,H1:h" -> {'m5': <5 * Minutes>, 'H1': <Hour>}, levels are kept from the finest to the coarsest
+    levels = OrderedDict()
+    for item in [item.strip() for item in (spec or "").split(",") if item.strip() != ""]:
+        label, freq = [part.strip() for part in item.split(":", 1)]
+        levels[label] = pd.tseries.frequencies.to_offset(freq)
+    return levels
+
+
+def floor_edge(offset, ts) -> pd.Timestamp:
+    ts = pd.Timestamp(ts)
+    if isinstance(offset, pd.tseries.offsets.Tick):
+        return ts.floor(offset)
+    return offset.rollback(ts.normalize())
+
+
+def ceil_edge(offset, ts) -> pd.Timestamp:
+    ts = pd.Timestamp(ts)
+    edge = floor_edge(offset, ts)
+    return edge if edge == ts else edge + offset
+
+
+class RollupPyramid:
+    # every raw pair gets one derived OHLC array per level (e.g. EURUSD_m5, EURUSD_H1, ...) in the raw bucket.
+    # each level is computed from the level below it, so a flush only rewrites the bins it touched. flushes only
+    # queue the range they wrote, `drain` rolls the queue up outside of the flush. the full history of a pair is
+    # only rolled up by `rebuild` (adit build-rollups), a pair without a built pyramid is read from the raw array.
+    _MARKER_NAME = "rollup"
+
+    def __init__(self, controller, levels: OrderedDict, base_freq: str = "1min") -> None:
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.controller = controller
+        self.levels = levels
+        self.base_offset = pd.tseries.frequencies.to_offset(base_freq)
+        self.lock = threading.RLock()
+        self.queue_lock = threading.Lock()
+        # name -> [from, to] of flushed rows not rolled up yet, either queued or being rolled up
+        self.queued: OrderedDict = OrderedDict()
+        self.updating: Dict[str, List[pd.Timestamp]] = {}
+        self.building = set()
+        self.draining = False
+        self.unbuilt_logged = set()
+
+    @property
+    def enabled(self) -> bool:
+        return len(self.levels) > 0
+
+    def is_rollup(self, name: str) -> bool:
+        return "_" in name and name.rsplit("_", 1)[1] in self.levels
+
+    def level_name(self, name: str, label: str) -> str:
+        return f"{name}_{label}"
+
+    def is_built(self, name: str) -> bool:
+        marker = self.controller.get_kv(self._MARKER_NAME, name)
+        return marker is not None and not np.isnat(marker)
+
+    def _mark(self, name: str, built: bool) -> None:
+        value = np.datetime64(pd.Timestamp.utcnow().tz_localize(None), 'ns') if built else np.datetime64('NaT', 'ns')
+        self.controller.store_kv(self._MARKER_NAME, name, value)
+
+    def enqueue(self, datatype: str, name: str, df: pd.DataFrame) -> bool:
+        # queues the range of flushed rows, True when the caller has to start a `drain` for it
+        if not self.enabled or datatype != 'raw' or self.is_rollup(name) or df is None or len(df.index) == 0:
+            return False
+        if name not in self.building and not self.is_built(name):
+            if name not in self.unbuilt_logged:
+                self.unbuilt_logged.add(name)
+                self.logger.info(f"rollups of {name} are not built, it is read from the raw array until "
+                                 f"`adit build-rollups` builds them")
+            return False
+
+        with self.queue_lock:
+            low, high = df.index.min(), df.index.max()
+            if name in self.queued:
+                low, high = min(low, self.queued[name][0]), max(high, self.queued[name][1])
+            self.queued[name] = [low, high]
+            if self.draining:
+                return False
+            self.draining = True
+            return True
+
+    def drain(self) -> None:
+        # rolls up the queued ranges until the queue is empty, only one drain runs at a time
+        while True:
+            with self.queue_lock:
+                if len(self.queued) == 0:
+                    self.draining = False
+                    return
+                name, (low, high) = self.queued.popitem(last=False)
+                self.updating[name] = [low, high]
+
+            with self.lock:
+                try:
+                    # the pyramid may have been removed or failed since the range was queued
+                    if self.is_built(name):
+                        self._update_range(name, low, high)
+                except Exception as ex:
+                    # readers fall back to the raw array until the pyramid is built again
+                    self.logger.error(f"Failed to update rollups of {name}, run `adit build-rollups` to build "
+                                      f"them again", exc_info=ex)
+                    self._mark(name, False)
+                finally:
+                    with self.queue_lock:
+                        self.updating.pop(name, None)
+
+    def stale_from(self, name: str) -> Union[pd.Timestamp, None]:
+        # the first date of the flushed rows of `name` which are not rolled up yet
+        with self.queue_lock:
+            ranges = [item for item in (self.queued.get(name), self.updating.get(name)) if item is not None]
+        return min([low for low, _ in ranges]) if len(ranges) > 0 else None
+
+    def rebuild(self, name: str) -> None:
+        # rows flushed while the history is rolled up are queued and rolled up once the pyramid is built
+        with self.lock:
+            self.building.add(name)
+            try:
+                domain = self.controller.get_data_domain('raw', name)
+                if domain is None:
+                    return
+                self.logger.info(f"rebuilding rollups of {name} from {domain[0]} to {domain[1]}")
+                self._update_range(name, domain[0], domain[1])
+                self._mark(name, True)
+                self.unbuilt_logged.discard(name)
+            finally:
+                self.building.discard(name)
+
+    def remove(self, name: str) -> None:
+        # drops every level of `name`, its marker and its queued ranges
+        with self.queue_lock:
+            self.queued.pop(name, None)
+        with self.lock:
+            for label in self.levels:
+                level = self.level_name(name, label)
+                if self.controller.array_exists(self.controller.get_uri('raw', level)):
+                    self.controller.remove_array('raw', level)
+            self.controller.delete_kv_many([(self._MARKER_NAME, name)])
+
+    def _update_range(self, name: str, from_ts, to_ts) -> None:
+        source = name
+        from_ts = pd.Timestamp(from_ts)
+        to_ts = pd.Timestamp(to_ts)
+        for label, offset in self.levels.items():
+            from_ts = floor_edge(offset, from_ts)
+            to_ts = floor_edge(offset, to_ts) + offset
+            bars = self.controller.aggregate(source, from_ts.to_datetime64(), to_ts.to_datetime64(), offset,
+                                             how='ohlc', use_rollup=False)
+            if len(bars.index) == 0:
+                return
+
+            uri = self.controller.get_uri('raw', self.level_name(name, label))
+            array_existed = self.controller.array_exists(uri)
+            if not array_existed:
+                self.controller.create_dataarray(uri, layout='sparse')
+            self.controller.write_df(uri, bars)
+            self.logger.debug(f"rolled up {len(bars.index)} {label} bars of {name} from {from_ts} to {to_ts}")
+            source = self.level_name(name, label)
+
+    def source_level(self, name: str, offset) -> Union[str, None]:
+        # the coarsest level whose bins add up exactly to bins of `offset`
+        if not self.enabled or self.is_rollup(name) or not self.is_built(name):
+            return None
+
+        found = None
+        for label, level_offset in self.levels.items():
+            if isinstance(level_offset, pd.tseries.offsets.Tick):
+                if isinstance(offset, pd.tseries.offsets.Tick):
+                    usable = offset.nanos % level_offset.nanos == 0
+                else:
+                    usable = _DAY_NANOS % level_offset.nanos == 0
+            else:
+                usable = level_offset == offset
+            if usable:
+                found = label
+        return found
+
+    def choose_level(self, from_ts, to_ts, max_points: int) -> Union[str, None]:
+        # the finest resolution (None for the raw bars) which still fits the point budget
+        span = (pd.Timestamp(to_ts) - pd.Timestamp(from_ts)).total_seconds()
+        candidates = [(None, self.base_offset)] + list(self.levels.items())
+        for label, offset in candidates:
+            if span / self._bin_seconds(offset) <= max_points:
+                return label
+        return candidates[-1][0]
+
+    @staticmethod
+    def _bin_seconds(offset) -> float:
+        if isinstance(offset, pd.tseries.offsets.Tick):
+            return offset.nanos / 10 ** 9
+        return ((pd.Timestamp("2000-01-01") + offset) - pd.Timestamp("2000-01-01")).total_seconds() or 1.0
+
+    def read_level(self, name: str, label: str, from_ts, to_ts, attrs: List[str] = None) -> pd.DataFrame:
+        # bars of [from_ts, to_ts) at the resolution of `label`, identical to aggregating the raw rows.
+        # partial bins at both ends and bins which still have rows in the write buffer come from the raw array.
+        offset = self.levels[label]
+        from_ts = pd.Timestamp(from_ts)
+        to_ts = pd.Timestamp(to_ts)
+        low = ceil_edge(offset, from_ts)
+        high = floor_edge(offset, to_ts)
+        pending = self.controller.write_buffer.pending(self.controller.get_uri('raw', name))
+        if pending is not None and len(pending.index) > 0:
+            high = min(high, floor_edge(offset, pending.index[0]))
+        stale_from = self.stale_from(name)
+        if stale_from is not None:
+            high = min(high, floor_edge(offset, stale_from))
+
+        if low >= high:
+            return self._raw_bars(name, from_ts, to_ts, offset, attrs)
+
+        parts = []
+        if from_ts < low:
+            parts.append(self._raw_bars(name, from_ts, low, offset, attrs))
+        stored = self.controller.get_ts_dataframe('raw', self.level_name(name, label), low.to_datetime64(),
+                                                  (high - pd.Timedelta(1, 'ns')).to_datetime64(), attrs=attrs)
+        if stored is not None and len(stored.index) > 0:
+            parts.append(stored.set_index('date'))
+        if high < to_ts:
+            parts.append(self._raw_bars(name, high, to_ts, offset, attrs))
+
+        parts = [part for part in parts if len(part.index) > 0]
+        if len(parts) == 0:
+            return pd.DataFrame()
+        return pd.concat(parts)
+
+    def _raw_bars(self, name: str, from_ts, to_ts, offset, attrs: List[str] = None) -> pd.DataFrame:
+        return self.controller.aggregate(name, pd.Timestamp(from_ts).to_datetime64(),
+                                         pd.Timestamp(to_ts).to_datetime64(), offset, how='ohlc', attrs=attrs,
+                                         use_rollup=False)
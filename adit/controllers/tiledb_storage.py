@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import os
+import pathlib
+from typing import Dict
+
+__all__ = ['StorageRoot', 'storage_backend', 'STORAGE_BACKENDS']
+
+STORAGE_BACKENDS = ['s3', 'local', 'mem']
+
+
+def storage_backend(root: str) -> str:
+    if root.startswith("s3://"):
+        return 's3'
+    if root.startswith("mem://"):
+        return 'mem'
+    if "://" in root and not root.startswith("file://"):
+        raise ValueError(f"Unsupported storage root '{root}', expected one of s3://, mem://, file:// or a local path")
+    return 'local'
+
+
+class StorageRoot:
+    # every data type keeps its arrays under <root>/<bucket name>. `s3://` alone gives one s3 bucket per data type
+    # (the SeaweedFS layout), `s3://bucket/prefix` puts them under a prefix of one bucket, a local directory or
+    # `file://` uri keeps them on the local filesystem and `mem://` keeps them in the memory of this process.
+    def __init__(self, root: str) -> None:
+        self.backend = storage_backend(root)
+        if self.backend == 'local':
+            path = root[len("file://"):] if root.startswith("file://") else root
+            root = pathlib.Path(os.path.abspath(os.path.expanduser(path))).as_uri()
+        self.root = root if root.endswith("://") else root.rstrip("/")
+
+    def uri(self, name: str) -> str:
+        return self.root + name if self.root.endswith("://") else self.root + "/" + name
+
+    def buckets(self, names: Dict[str, str]) -> Dict[str, str]:
+        return {datatype: self.uri(name) for datatype, name in names.items()}
+
+    def _s3_bucket(self, uri: str) -> str:
+        return "s3://" + uri[len("s3://"):].split("/")[0]
+
+    def create(self, vfs, uri: str) -> None:
+        if self.backend == 's3':
+            bucket = self._s3_bucket(uri)
+            if not vfs.is_bucket(bucket):
+                vfs.create_bucket(bucket)
+        elif not vfs.is_dir(uri):
+            vfs.create_dir(uri)
+
+    def remove(self, vfs, uri: str) -> None:
+        if self.backend == 's3' and self._s3_bucket(uri) == uri:
+            if vfs.is_bucket(uri):
+                vfs.remove_bucket(uri)
+        elif vfs.is_dir(uri):
+            vfs.remove_dir(uri)
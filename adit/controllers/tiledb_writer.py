@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+import tiledb
+
+__all__ = ['FastArrayWriter']
+
+
+class _CachedSchema:
+    def __init__(self, A) -> None:
+        domain = A.schema.domain
+        self.sparse = A.schema.sparse
+        self.dims: List[Tuple[str, np.dtype]] = [(domain.dim(i).name, domain.dim(i).dtype) for i in range(domain.ndim)]
+        self.attrs: List[Tuple[str, np.dtype]] = [(A.schema.attr(i).name, A.schema.attr(i).dtype)
+                                                  for i in range(A.schema.nattr)]
+
+
+class FastArrayWriter:
+    # appends frames with a direct sparse write of numpy buffers. the schema of every array is read once,
+    # frames which do not match it are rejected before anything reaches tiledb.
+    def __init__(self, ctx: tiledb.Ctx = None) -> None:
+        self.ctx = ctx
+        self.lock = threading.Lock()
+        self.schemas: Dict[str, _CachedSchema] = {}
+
+    def schema(self, uri: str) -> _CachedSchema:
+        with self.lock:
+            cached = self.schemas.get(uri)
+        if cached is None:
+            with tiledb.open(uri, 'r', ctx=self.ctx) as A:
+                cached = _CachedSchema(A)
+            with self.lock:
+                self.schemas[uri] = cached
+        return cached
+
+    def invalidate(self, uri: str = None) -> None:
+        with self.lock:
+            if uri is None:
+                self.schemas.clear()
+            else:
+                self.schemas.pop(uri, None)
+
+    def columns(self, uri: str, df: pd.DataFrame) -> OrderedDict:
+        schema = self.schema(uri)
+        expected = [name for name, _ in schema.attrs]
+        missing = [name for name in expected if name not in df.columns]
+        unknown = [name for name in df.columns if name not in expected]
+        if len(missing) > 0 or len(unknown) > 0:
+            raise ValueError(f"Columns of the frame do not match {uri}: missing {missing}, unknown {unknown}")
+
+        columns = OrderedDict()
+        for name, dtype in schema.attrs:
+            values = df[name].values
+            if values.dtype != dtype:
+                if not np.can_cast(values.dtype, dtype, casting='same_kind'):
+                    raise ValueError(f"Column {name} of type {values.dtype} cannot be written as {dtype} into {uri}")
+                values = values.astype(dtype)
+            columns[name] = np.ascontiguousarray(values)
+        return columns
+
+    def write(self, uri: str, df: pd.DataFrame) -> None:
+        schema = self.schema(uri)
+        if not schema.sparse or len(schema.dims) != 1:
+            raise ValueError(f"{uri} is not a one dimensional sparse array")
+        columns = self.columns(uri, df)
+        coords = np.ascontiguousarray(df.index.values.astype(schema.dims[0][1]))
+        with tiledb.open(uri, 'w', ctx=self.ctx) as A:
+            A[coords] = columns
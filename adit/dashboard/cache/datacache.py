@@ -5,7 +5,7 @@ import numpy as np
 from collections import deque
 import asyncio
 
-from adit.controllers import TileDBController, EventLoopController, TPOOL
+from adit.controllers import AsyncTileDBController, EventLoopController
 
 __all__ = ['DataMonitorCache']
 
@@ -25,7 +25,7 @@ class DataMonitorCache:
         else:
             self.pairs = pairs
         self.update_delta = update_delta
-        self.tiledb = TileDBController.instance()
+        self.tiledb = AsyncTileDBController.instance()
         self.evl = EventLoopController.instance()
         self.evl_loop = self.evl.get_loop()
 
@@ -47,20 +47,21 @@ class DataMonitorCache:
             self.data['bidclose'][pair] = deque(maxlen=maxlen)
             self.data['askclose'][pair] = deque(maxlen=maxlen)
 
-    def get_checkpoint(self, pair):
-        return self.tiledb.get_kv(f"crawler-checkpoint-{pair}", pair)
+    async def get_checkpoints(self):
+        checkpoints = await self.tiledb.get_kv_many([(f"crawler-checkpoint-{pair}", pair) for pair in self.pairs])
+        return {pair: checkpoints[(f"crawler-checkpoint-{pair}", pair)] for pair in self.pairs}
 
-    def get_ts_data(self, pair, from_ts, to_ts):
-        return self.tiledb.get_ts_dataarray("raw", pair, from_ts=from_ts, to_ts=to_ts)
+    async def get_ts_data(self, pair, from_ts, to_ts):
+        return await self.tiledb.get_ts_dataarray("raw", pair, from_ts=from_ts, to_ts=to_ts,
+                                                  attrs=['bidclose', 'askclose'], profile='dashboard')
 
-    async def _update_pair(self, pair):
+    async def _update_pair(self, pair, latest_timestamp):
         self.logger.debug(f"update cache of ccy pair {pair}")
-        latest_timestamp = await self.evl_loop.run_in_executor(TPOOL, self.get_checkpoint, pair)
-        if latest_timestamp != self.metadata['latest_timestamp'][pair]:
+        if latest_timestamp is not None and latest_timestamp != self.metadata['latest_timestamp'][pair]:
             self.metadata['latest_timestamp'][pair] = latest_timestamp
             to_ts = latest_timestamp
             from_ts = latest_timestamp - np.timedelta64(self.update_delta, 's')
-            data = await self.evl_loop.run_in_executor(TPOOL, self.get_ts_data, pair, from_ts, to_ts)
+            data = await self.get_ts_data(pair, from_ts, to_ts)
             self.metadata['count'][pair] += len(data['date'])
             self.logger.debug(f"current data cache for pair {pair} is updated with data from={from_ts} to={to_ts} with length={len(data['date'])}")
         else:
@@ -77,8 +78,9 @@ class DataMonitorCache:
         DELAY = 1 # 1 seconds
         while True:
             try:
+                checkpoints = await self.get_checkpoints()
                 for pair in self.pairs:
-                    await self._update_pair(pair)
+                    await self._update_pair(pair, checkpoints[pair])
                 await asyncio.sleep(DELAY)
             except Exception as ex:
                 logging.info("An error occured while updateing data cache", exc_info=ex)
@@ -1,6 +1,7 @@
 from __future__ import absolute_import
 
 import os
+import asyncio
 import logging
 import math
 from math import pi
@@ -19,7 +20,7 @@ from scipy import stats #ttest_1samp, ks_1samp, jarque_bera, shapiro, describe
 
 
 from adit.processor import MetricsCalculator
-from adit.controllers import EventLoopController, TPOOL, TileDBController
+from adit.controllers import EventLoopController, TPOOL, AsyncTileDBController, backfill_nan
 from adit.dashboard.cache import DataHealthCache
 
 env = Environment(
@@ -48,13 +49,13 @@ class DataHealthDashboard(DashboardComponent):
         self.metric_calulator = MetricsCalculator.instante()
         self.evl = EventLoopController.instance()
         self.evl_loop = self.evl.get_loop()
-        self.tiledb = TileDBController.instance()
+        self.tiledb = AsyncTileDBController.instance()
 
         self.datametric_cal_btn = Button(label="Calculate Data Metrics", button_type="success", height=50)
         self.datametric_cal_btn.on_click(self._datametric_cal_btn_on_click)
 
         self.refresh_btn = Button(label="Refresh Charts/Table", button_type="success", height=50)
-        self.refresh_btn.on_click(self._update_data_source)
+        self.refresh_btn.on_click(self._refresh_btn_on_click)
 
         self.from_datepk = DatePicker(title="From Date", min_date=date(2000, 1, 1),
                                       max_date=(datetime.now() + timedelta(days=7)).date(),
@@ -140,9 +141,13 @@ class DataHealthDashboard(DashboardComponent):
         self.logger.debug(f"Trigger data metrics calculation from {self.from_datepk.value} to {self.to_datepk.value}")
         from_ts = np.datetime64(self.from_datepk.value)
         to_ts = np.datetime64(self.to_datepk.value)
-        self.metric_calulator.cal(from_ts, to_ts)
+        asyncio.ensure_future(self.metric_calulator.cal_range_async(from_ts, to_ts))
 
-    def _update_data_source(self):
+    def _refresh_btn_on_click(self):
+        # tiledb is read on the io executor, the data sources are updated once the reads are done
+        self.root.document.add_next_tick_callback(self._update_data_source)
+
+    async def _update_data_source(self):
         self.logger.info(f"update data source with data from {self.from_datepk.value} to {self.to_datepk.value}")
         try:
             from_ts = np.datetime64(self.from_datepk.value)
@@ -159,20 +164,21 @@ class DataHealthDashboard(DashboardComponent):
                 'hurst': [],
             }
 
-            for pair in self.pairs:
+            # columns come as numpy arrays sharing the query buffers, only columns with gaps are copied by the bfill
+            results = await asyncio.gather(*[self.tiledb.get_ts_result("health", f"{pair}_DAILY_METRICS", from_ts,
+                                                                       to_ts, result_format='numpy')
+                                             for pair in self.pairs])
+            for pair, data in zip(self.pairs, results):
                 self.logger.debug(f"Calculate data health metrics for pair{pair}")
-
-                data = self.tiledb.get_ts_dataframe("health", f"{pair}_DAILY_METRICS", from_ts, to_ts)
-                data.fillna(method='bfill', axis=0, inplace=True)
-                if data is not None and len(data.index) > 0:
-                    new_data = {col: data[col].tolist() for col in data.columns}
+                if data is not None and len(data['date']) > 0:
+                    new_data = {col: backfill_nan(values) for col, values in data.items()}
                     update(self.ts_source[pair], new_data)
-                    logret_ema = data['logret_ema'].to_numpy()
+                    logret_ema = new_data['logret_ema']
                     stats_metrics = stats.describe(logret_ema, nan_policy='omit')
                     min, max = stats_metrics.minmax
                     t_test = stats.ttest_1samp(logret_ema, popmean=0.0, nan_policy='omit')
-                    if len(data.index) > 100:
-                        logret_ema += (0 if min > 0 else ((-min)+1.0))
+                    if len(logret_ema) > 100:
+                        logret_ema = logret_ema + (0 if min > 0 else ((-min)+1.0))
                         H, c, data = compute_Hc(logret_ema, kind='price', simplified=True)
                         stats_data['hurst'].append(f"H={H}, c={c}")
                     else:
@@ -194,7 +200,7 @@ class DataHealthDashboard(DashboardComponent):
     def update(self):
         with log_errors():
             self.logger.info("update datahealth dashboard data source")
-            self._update_data_source()
+            self._refresh_btn_on_click()
 
 
 def datahealth_doc(worker, extra, doc):
@@ -3,7 +3,7 @@ from __future__ import absolute_import
 import os
 import logging
 from bokeh.layouts import layout
-from bokeh.models import (ColumnDataSource, DataRange1d, DatetimeTickFormatter, Button)
+from bokeh.models import (ColumnDataSource, DataRange1d, DatetimeTickFormatter, Button, Div)
 from bokeh.plotting import figure
 from bokeh.themes import Theme
 from jinja2 import Environment, FileSystemLoader
@@ -12,7 +12,9 @@ from distributed.dashboard.components.shared import (DashboardComponent)
 from distributed.dashboard.utils import (without_property_validation, update)
 from distributed.utils import log_errors
 
+from adit.controllers import AsyncTileDBController, TileDBMaintenance
 from adit.ingestors import FXCMCrawler
+from adit.processor import DataPopulator, GapRepairer
 
 env = Environment(
     loader=FileSystemLoader(
@@ -39,18 +41,125 @@ class StatusDashboard(DashboardComponent):
         self.toggle_datacrawler_btn = Button(label="Toggle Data Crawler", button_type="primary")
         self.toggle_datacrawler_btn.on_click(self._toggle_datacrawler_btn_on_click)
 
+        self.repair_gaps_btn = Button(label="Repair Gaps", button_type="primary")
+        self.repair_gaps_btn.on_click(self._repair_gaps_btn_on_click)
+
+        self.io_stats_div = Div(text=self._io_stats_text())
+        self.backfill_div = Div(text=self._backfill_text())
+        self.crawler_div = Div(text=self._crawler_text())
+        self.coverage_div = Div(text="Coverage: loading")
+        self.coverage_updating = False
+        self.maintenance_div = Div(text=self._maintenance_text())
+
         if "sizing_mode" in kwargs:
             kw = {"sizing_mode": kwargs["sizing_mode"]}
         else:
             kw = {}
 
         self.layout = layout([
-            [self.repopulate_data_btn, self.toggle_datacrawler_btn],
+            [self.repopulate_data_btn, self.toggle_datacrawler_btn, self.repair_gaps_btn],
+            [self.io_stats_div],
+            [self.backfill_div],
+            [self.crawler_div],
+            [self.coverage_div],
+            [self.maintenance_div],
         ])
         self.root = self.layout
 
+    def _io_stats_text(self):
+        stats = AsyncTileDBController.instance().get_stats()
+        return (f"TileDB IO: queue depth {stats['queue_depth']} (max {stats['max_queued']}), "
+                f"running {stats['running']}/{stats['io_threads']}, blocked callers {stats['blocked']}, "
+                f"avg queue wait {stats['avg_queue_wait'] * 1000:.1f}ms, errors {stats['errors']}")
+
+    def _backfill_text(self):
+        progress = DataPopulator.instance().get_progress()
+        if len(progress) == 0:
+            return "Backfill: not started"
+        lines = [f"{pair}: {state['state']} {state['percent']:.1f}% ({state['done']}/{state['chunks']} chunks, "
+                 f"{state['failed']} failed), {state['rows']} rows at {state['rows_per_s']:.0f} rows/s"
+                 for pair, state in progress.items()]
+        return "Backfill:<br/>" + "<br/>".join(lines)
+
+    def _crawler_text(self):
+        if len(FXCMCrawler.CRAWLERS_REGISTER) == 0:
+            return "Crawler: not started"
+        stats = FXCMCrawler.CRAWLERS_REGISTER[0].get_stats()
+        cycles = stats['cycle_durations']
+        lines = [f"{pair}: {'catching up' if state['catching_up'] else 'live'}, {state['lag'] or 0:.0f}s behind, "
+                 f"{state['last_status']} in {state['last_duration']:.2f}s, p50 {state['durations']['p50']:.2f}s, "
+                 f"p95 {state['durations']['p95']:.2f}s, {state['timeouts']} timeouts, {state['errors']} errors"
+                 for pair, state in stats['pairs'].items()]
+        connections = stats['connections']
+        if connections is not None:
+            lines.append(f"{stats['source']} source: " + ", ".join([f"{key} {value}" for key, value in connections.items()]))
+        for name, bucket in stats['ratelimit'].items():
+            lines.append(f"rate limit {name}: {bucket['rate']:g}/s, {bucket['acquired']} requests, "
+                         f"{bucket['throttled']} throttled, {bucket['wait_time']:.1f}s waited (max {bucket['max_wait']:.2f}s)")
+        writes, lag = stats['write_durations'], stats['ingest_lag']
+        lines.append(f"writes: p50 {writes['p50'] * 1000:.0f}ms, p95 {writes['p95'] * 1000:.0f}ms, "
+                     f"ingest lag p50 {lag['p50']:.0f}s, p95 {lag['p95']:.0f}s")
+        retries = stats['retries']
+        lines.append(f"retries: {retries['retries']} after {retries['backoff_time']:.1f}s of backoff, "
+                     f"{retries['giveups']} given up")
+        return (f"Crawler: {cycles['count']} crawls, {stats['concurrency']} pairs at a time, "
+                f"p50 {cycles['p50']:.2f}s, p95 {cycles['p95']:.2f}s, max {cycles['max']:.2f}s<br/>" + "<br/>".join(lines))
+
+    @staticmethod
+    def _coverage_text(coverage):
+        if len(coverage) == 0:
+            return "Coverage: nothing crawled yet"
+        lines = [f"{name}: {stats['coverage']:.2f}% of market hours since {str(stats['start'])[:16]}, "
+                 f"{stats['gaps']} gaps, {stats['unavailable']} unavailable, "
+                 f"{stats['missing_seconds'] / 60:.0f} minutes missing"
+                 for name, stats in coverage.items()]
+        for pair, state in GapRepairer.instance().get_progress().items():
+            lines.append(f"repair of {pair}: {state['state']} {state['percent']:.1f}% ({state['done']}/"
+                         f"{state['requests']} requests, {state['failed']} failed), {state['rows']} rows, "
+                         f"{state['unavailable_seconds'] / 60:.0f} minutes unavailable")
+        return "Coverage:<br/>" + "<br/>".join(lines)
+
+    @staticmethod
+    def _maintenance_text():
+        # the reports of the last maintenance of each array, kept in memory by the maintenance job
+        reports = TileDBMaintenance.instance().get_reports()
+        if len(reports) == 0:
+            return "Maintenance: nothing consolidated yet"
+        lines = [f"{uri.rstrip('/').split('/')[-1]} ({report['datatype']}): {report['fragments_before']} -> "
+                 f"{report['fragments_after']} fragments, {report['array_meta_before']} -> "
+                 f"{report['array_meta_after']} metadata files, {report['size_before']} -> {report['size_after']} "
+                 f"bytes, read latency {report['read_latency_before'] * 1000:.1f}ms -> "
+                 f"{report['read_latency_after'] * 1000:.1f}ms in {report['duration']:.1f}s"
+                 for uri, report in sorted(reports.items(), key=lambda item: -item[1]['finished_at'])]
+        return "Maintenance:<br/>" + "<br/>".join(lines)
+
+    def _schedule_coverage_update(self):
+        # the gap index is read on the io executor, a refresh is skipped while the previous one is still running
+        if not self.coverage_updating and self.root.document is not None:
+            self.coverage_updating = True
+            self.root.document.add_next_tick_callback(self._update_coverage)
+
+    async def _update_coverage(self):
+        try:
+            # read from the gap index only, the raw arrays are never scanned
+            coverage = await AsyncTileDBController.instance().get_coverage()
+            self.coverage_div.text = self._coverage_text(coverage)
+        except Exception as ex:
+            self.logger.error("Failed to update coverage", exc_info=ex)
+        finally:
+            self.coverage_updating = False
+
+    def _repair_gaps_btn_on_click(self):
+        self.logger.debug("Repair the gaps of the gap index")
+        if not GapRepairer.instance().start():
+            self.logger.info("Gaps are already being repaired")
+        self._schedule_coverage_update()
+
     def _repopulate_data_btn_on_click(self):
         self.logger.debug("Repopulate data from data server")
+        if not DataPopulator.instance().start():
+            self.logger.info("Data is already being repopulated")
+        self.backfill_div.text = self._backfill_text()
 
     def _toggle_datacrawler_btn_on_click(self):
         self.logger.debug("Toggle state of data crawler")
@@ -66,6 +175,11 @@ class StatusDashboard(DashboardComponent):
             crawler = FXCMCrawler.CRAWLERS_REGISTER[0]
             self.toggle_datacrawler_btn.label = "PAUSE" if not crawler.paused else "UN-PAUSE"
             self.toggle_datacrawler_btn.button_type = "dander" if not crawler.paused else "primary"
+            self.io_stats_div.text = self._io_stats_text()
+            self.backfill_div.text = self._backfill_text()
+            self.crawler_div.text = self._crawler_text()
+            self.maintenance_div.text = self._maintenance_text()
+            self._schedule_coverage_update()
 
 
 def status_doc(worker, extra, doc):
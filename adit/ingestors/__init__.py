@@ -1,7 +1,9 @@
 from .crawlers import *
 from .receivers import *
+from .sources import *
 
 __all__ = (
         crawlers.__all__ +
-        receivers.__all__
+        receivers.__all__ +
+        sources.__all__
 )
@@ -3,14 +3,16 @@ from __future__ import annotations
 import asyncio
 import logging
 import time
+from typing import List
+
 import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
-
-import fxcmpy
 
 from adit.config import Config
-from adit.controllers import EventLoopController, TileDBController, TPOOL
+import adit.constants as const
+from adit.controllers import EventLoopController, AsyncTileDBController, TPOOL, DENSE_PERIODS
+from adit.utils import Histogram, RateLimiter, RetryPolicy, market_open, missing_bars
+from adit.ingestors.sources import CandleSource, make_candle_source
 
 __all__ = ['FXCMCrawler']
 
@@ -24,16 +26,36 @@ class FXCMCrawler:
 
     CRAWLERS_REGISTER = []
 
-    def __init__(self):
+    def __init__(self, source: CandleSource = None, pairs: List[str] = None):
+        # candles come from the [crawlers] source, `fxcm` by default, or from the given `source`
         self.logger = logging.getLogger(self.__class__.__name__)
 
         self.evl = EventLoopController.instance()
         self.config = Config.instance()
-        self.tiledb = TileDBController.instance()
+        self.tiledb = AsyncTileDBController.instance()
         self.enabled = self.config.get_bool("crawlers", "fxcm")
+        self.source_name = self.config.get_str("crawlers", "source", const.DEFAULT_CRAWL_SOURCE)
+        self.source = source
         self.runing_task = None
-        self.fxcm_conn = None
+        self.limiter = RateLimiter.instance()
+        self.retry = RetryPolicy(retries=self.__RETRY_LIMIT,
+                                 base=self.config.get_float("ratelimit", "retry_base", const.DEFAULT_RETRY_BASE),
+                                 max_delay=self.config.get_float("ratelimit", "retry_max", const.DEFAULT_RETRY_MAX))
         self.paused = True
+        self.slots = None
+        self.frequency = 60
+        self.period = "m1"
+        self.ccypairs = []
+        self.concurrency = const.DEFAULT_CRAWL_CONCURRENCY
+        self.pair_timeout = const.DEFAULT_CRAWL_PAIR_TIMEOUT
+        self.live_window = const.DEFAULT_CRAWL_LIVE_WINDOW
+        self.max_bars = const.DEFAULT_CRAWL_MAX_BARS
+        self.min_gap = self.config.get_int("gaps", "min_gap", const.DEFAULT_GAP_MIN)
+        self.bar_span = np.timedelta64(DENSE_PERIODS['m1'][0], 's')
+        self.cycle_durations = Histogram()
+        self.write_durations = Histogram()
+        self.ingest_lag = Histogram()
+        self.pair_stats = {}
         if self.enabled:
             self.config_available = self.config.get_config("fxcm") is not None
             if self.config_available is not None:
@@ -42,21 +64,34 @@ class FXCMCrawler:
                 self.access_token = self.config.get_str("fxcm", "token")
                 self.frequency = self.config.get_int("fxcm", "frequency", 60)  # default 5 mins
                 self.period = self.config.get_str("fxcm", "period", "m1")  # default 1 min
-                self.ccypairs = self.config.get_str("fxcm", "ccypairs", "").strip().split("\n")
+                self.ccypairs = [pair.strip() for pair in self.config.get_str("fxcm", "ccypairs", "").strip().split("\n")
+                                 if pair.strip() != ""]
+                self.concurrency = self.config.get_int("fxcm", "concurrency", const.DEFAULT_CRAWL_CONCURRENCY)
+                self.pair_timeout = self.config.get_int("fxcm", "pair_timeout", const.DEFAULT_CRAWL_PAIR_TIMEOUT)
+                self.live_window = self.config.get_int("fxcm", "live_window", const.DEFAULT_CRAWL_LIVE_WINDOW)
+                self.max_bars = self.config.get_int("fxcm", "max_bars", const.DEFAULT_CRAWL_MAX_BARS)
+                self.bar_span = np.timedelta64(DENSE_PERIODS.get(self.period, DENSE_PERIODS['m1'])[0], 's')
+        if pairs is not None:
+            self.ccypairs = list(pairs)
+        if source is not None:
+            self.period = source.period
+            self.bar_span = source.bar_span
 
         self.CRAWLERS_REGISTER.append(self)
 
-    def get_conn(self):
-        if self.fxcm_conn is None:
-            self.fxcm_conn = fxcmpy.fxcmpy(access_token=self.access_token, log_level='debug')
-        elif self.fxcm_conn.connection_status != 'established' or not self.fxcm_conn.is_connected():
-            self.fxcm_conn.connect()
-        return self.fxcm_conn
+    @classmethod
+    def checkpoint_key(cls, pair):
+        pairname = pair.replace("/", "")
+        return cls.__CRAWLER_CHECKPOINT + "-" + pairname, pairname
+
+    def get_source(self) -> CandleSource:
+        if self.source is None:
+            self.source = make_candle_source(self.source_name, period=self.period, max_bars=self.max_bars)
+        return self.source
 
-    def get_candle(self, fxcm_conn, pair, start, stop):
+    def get_candle(self, pair, start, stop):
         try:
-            df = fxcm_conn.get_candles(instrument=pair, period=self.period, start=start, stop=stop)
-            return df
+            return self.get_source().get_candles(pair, start, stop)
         except Exception as ex:
             self.logger.fatal(f"Failed to retrieve data for {pair} from {start} to {stop}", exc_info=ex)
             return None
@@ -70,68 +105,178 @@ class FXCMCrawler:
             self.logger.error("Config for fxcm is not available")
             raise Exception("Config for fxcm is not available, please check config file again.")
 
+        self.check_windows()
+        self.get_source()
         self.evl.shedule_task(self.TASK_NAME, self._run)
 
     def stop(self) -> None:
         self.evl.stop_task(self.TASK_NAME)
 
+    def check_windows(self) -> None:
+        # one request has to cover at least one live window, otherwise _crawl_window never gets past `start`.
+        # the window is not clamped up to a live window since the broker would cut such a request at max_bars
+        request_span = self.bar_span * self.max_bars
+        if request_span < np.timedelta64(self.live_window, 's'):
+            raise ValueError(f"fxcm live_window of {self.live_window}s is longer than the "
+                             f"{request_span.astype('timedelta64[s]').astype(int)}s of {self.max_bars} {self.period} "
+                             f"bars one request may return, lower live_window or raise max_bars")
+
+    def _crawl_window(self, start, now):
+        # stop of the next request from `start`: nothing until a whole live window is `live_window` old, then as
+        # many live windows as one request may return. a pair far behind catches up with a few large requests
+        # and goes back to one live window per cycle once it is caught up.
+        live_window = np.timedelta64(self.live_window, 's')
+        available = (now - live_window) - start
+        if available < live_window:
+            return None
+        span = min(available, self.bar_span * self.max_bars)
+        return start + (span // live_window) * live_window
+
     async def _crawl_pair(self, pair, queue):
         pairname = pair.replace("/", "")
-        last_timestamp = self.tiledb.get_kv(self.__CRAWLER_CHECKPOINT+"-"+pairname, pairname)
+        state = self._pair_state(pair)
+        last_timestamp = await self.tiledb.get_kv(self.__CRAWLER_CHECKPOINT+"-"+pairname, pairname)
         if last_timestamp is None:
-            data_domain = self.tiledb.get_data_domain('raw', pairname)
+            data_domain = await self.tiledb.get_data_domain('raw', pairname)
             last_timestamp = data_domain[1]
 
-        delta_second = 300
-        # start = datetime.fromtimestamp(last_timestamp.astype('O')/1e9)
-        start = datetime.utcfromtimestamp(last_timestamp.astype('O')/1e9)
-        stop = start + timedelta(seconds=delta_second)
-        if stop <= (datetime.now() - timedelta(seconds=delta_second)): # only crawl data lag 300 from now
-            self.logger.info(f"crawling {pair} from {start} to {stop}")
-            fxcm_conn = await self.evl.get_loop().run_in_executor(TPOOL, self.get_conn)
-            for retried in range(0, self.__RETRY_LIMIT):  # retried until we get data or reach the retry limit
-                df = await self.evl.get_loop().run_in_executor(TPOOL, self.get_candle, fxcm_conn, pair, start, stop)
-                if df is not None and not df.empty and len(df.index) > 0:
-                    df.index = pd.to_datetime(df.index)
-                    self.tiledb.store_kv(self.__CRAWLER_CHECKPOINT+"-"+pairname, pairname, last_timestamp + np.timedelta64(delta_second, 's'))
-                    self.tiledb.store_df(datatype="raw", name=pairname, df=df, sparse=True, data_df=True)
-                    break
-                elif retried >= (self.__RETRY_LIMIT - 1):
-                    self.logger.error(f"Crawled data of {pair} from {start} to {stop} is empty. Skiping this time range")
-                    self.tiledb.store_kv(self.__CRAWLER_CHECKPOINT + "-" + pairname, pairname, last_timestamp + np.timedelta64(delta_second, 's'))
-                else:
-                    self.logger.info(f"crawled data of {pair} from {start} to {stop} is empty. Will retry.")
-
-    async def _crawl(self, queue):
-        for pair in self.ccypairs:
-            pair = pair.strip()
-            await self._crawl_pair(pair=pair, queue=queue)
+        now = np.datetime64('now', 'ns')
+        state['lag'] = (now - last_timestamp) / np.timedelta64(1, 's')
+        next_timestamp = self._crawl_window(last_timestamp, now)
+        if next_timestamp is None:
+            state['catching_up'] = False
+            return
+
+        start = pd.Timestamp(last_timestamp).to_pydatetime()
+        stop = pd.Timestamp(next_timestamp).to_pydatetime()
+        state['window'] = (next_timestamp - last_timestamp) / np.timedelta64(1, 's')
+        self.logger.info(f"crawling {pair} from {start} to {stop}, {state['lag']:.0f}s behind")
+        try:
+            # retried until we get data or reach the retry limit
+            df = await self.retry.call_async(self._fetch_window, pair, start, stop)
+        except Exception:
+            self.logger.error(f"Crawled data of {pair} from {start} to {stop} is empty. Skiping this time range")
+            await self.tiledb.store_kv(self.__CRAWLER_CHECKPOINT + "-" + pairname, pairname,
+                                       next_timestamp, after=("raw", pairname))
+            # the market hours of the skipped window are remembered as a gap, GapRepairer fetches them later
+            missing = market_open(last_timestamp, next_timestamp)
+            state['gaps'] += len(missing)
+            await self.tiledb.record_crawl(pairname, last_timestamp, next_timestamp, missing)
+        else:
+            writestart = time.time()
+            await self.tiledb.store_df(datatype="raw", name=pairname, df=df, sparse=True, data_df=True)
+            await self.tiledb.store_kv(self.__CRAWLER_CHECKPOINT+"-"+pairname, pairname,
+                                       next_timestamp, after=("raw", pairname))
+            # ingest lag: from the close of the newest candle to its write
+            written = time.time()
+            self.write_durations.observe(written - writestart)
+            self.ingest_lag.observe(written - (df.index[-1] + pd.Timedelta(self.bar_span)).timestamp())
+            state['rows'] += len(df.index)
+            # holes of at least `min_gap` inside the window go to the gap index, shorter ones are quiet markets
+            missing = missing_bars(df.index, self.bar_span, last_timestamp, next_timestamp)
+            missing = missing.drop_shorter(self.min_gap * 10 ** 9)
+            state['gaps'] += len(missing)
+            await self.tiledb.record_crawl(pairname, last_timestamp, next_timestamp, missing)
+
+        state['lag'] = (now - next_timestamp) / np.timedelta64(1, 's')
+        state['catching_up'] = self._crawl_window(next_timestamp, now) is not None
+
+    async def _fetch_window(self, pair, start, stop):
+        # every request takes a token of the fxcm budget, an empty window raises so that it is retried as well
+        await self.limiter.acquire_async(self.get_source().NAME, pair)
+        df = await self.evl.get_loop().run_in_executor(TPOOL, self.get_candle, pair, start, stop)
+        if df is not None:
+            df.index = pd.to_datetime(df.index)
+            # fxcm includes the candle at `stop`, it is the first candle of the next window
+            df = df[df.index < stop]
+        if df is None or df.empty:
+            self.logger.info(f"crawled data of {pair} from {start} to {stop} is empty.")
+            raise ValueError(f"No candles of {pair} from {start} to {stop}")
+        return df
+
+    def _pair_state(self, pair):
+        state = self.pair_stats.get(pair)
+        if state is None:
+            state = {'cycles': 0, 'timeouts': 0, 'errors': 0, 'last_duration': 0.0, 'last_status': None,
+                     'last_crawled_at': None, 'durations': Histogram(), 'lag': None, 'window': 0.0,
+                     'catching_up': False, 'rows': 0, 'gaps': 0}
+            self.pair_stats[pair] = state
+        return state
+
+    def get_stats(self):
+        stats = {'concurrency': self.concurrency, 'pair_timeout': self.pair_timeout,
+                 'cycle_durations': self.cycle_durations.get_stats(), 'pairs': {},
+                 'write_durations': self.write_durations.get_stats(), 'ingest_lag': self.ingest_lag.get_stats(),
+                 'source': self.source_name if self.source is None else self.source.NAME,
+                 'connections': self.source.connection_stats() if self.source is not None else None,
+                 'ratelimit': self.limiter.get_stats(), 'retries': self.retry.get_stats()}
+        for pair, state in list(self.pair_stats.items()):
+            state = dict(state)
+            state['durations'] = state['durations'].get_stats()
+            stats['pairs'][pair] = state
+        return stats
+
+    def _slots(self):
+        # created lazily so the semaphore belongs to the loop running the crawler
+        if self.slots is None:
+            self.slots = asyncio.Semaphore(self.concurrency)
+        return self.slots
+
+    async def _crawl_timed(self, pair, queue):
+        # at most `concurrency` pairs are crawled at once and a pair taking longer than `pair_timeout` is
+        # cancelled, whatever range it did not checkpoint yet is crawled again in its next cycle
+        state = self._pair_state(pair)
+        async with self._slots():
+            starttime = time.time()
+            status = 'ok'
+            try:
+                await asyncio.wait_for(self._crawl_pair(pair=pair, queue=queue), timeout=self.pair_timeout)
+            except asyncio.TimeoutError:
+                status = 'timeout'
+                state['timeouts'] += 1
+                self.logger.warning(f"crawling {pair} timed out after {self.pair_timeout}s")
+            except Exception as ex:
+                status = 'error'
+                state['errors'] += 1
+                self.logger.error(f"Failed to crawl {pair}", exc_info=ex)
+            duration = time.time() - starttime
+
+        state['cycles'] += 1
+        state['last_duration'] = duration
+        state['last_status'] = status
+        state['last_crawled_at'] = starttime
+        state['durations'].observe(duration)
+        self.cycle_durations.observe(duration)
+        return duration
+
+    async def _run_pair(self, pair, queue):
+        # every pair keeps its own period, a slow pair only delays its own next cycle
+        while True:
+            if self.paused:
+                await asyncio.sleep(self.frequency)
+                continue
+
+            starttime = time.time()
+            await self._crawl_timed(pair, queue)
+            duration = time.time() - starttime
+            if (self.frequency - duration) < 0:
+                self.logger.warning(f"fxcm crawler of {pair} is taking longer time than the configured period.")
+            else:
+                self.logger.debug(f"fxcm crawler takes {duration}s to crawl {pair}")
+            # a pair behind its live window crawls its next window right away
+            await asyncio.sleep(0 if self._pair_state(pair)['catching_up'] else max(0.0, self.frequency - duration))
 
     def toggle_crawler(self):
         self.paused = not self.paused
         self.logger.info(f"FXCM crawler has been toggle {'to paused' if self.paused else 'back to normal'} state")
 
     async def _run(self, queue):
-        self.logger.info("starting fxcm data crawler")
-        while True:
-            starttime = time.time()
+        self.logger.info(f"starting fxcm data crawler for {len(self.ccypairs)} pairs, {self.concurrency} at a time")
+        try:
+            await asyncio.gather(*[self._run_pair(pair, queue) for pair in self.ccypairs])
+        except Exception as ex:
+            self.logger.error("fxcm crawler has exception", exc_info=ex)
             try:
-                if self.paused:
-                    self.logger.info(f"FXCM data crawler is currently in paused state.")
-                    await asyncio.sleep(self.frequency)
-                    continue
-
-                await self._crawl(queue=queue)
-                duration = time.time() - starttime
-                if (self.frequency - duration) < 0:
-                    self.logger.warning("fxcm crawler is taking longer time than the configured period.")
-                else:
-                    self.logger.info(f"fxcm crawler takes {duration}s to finished")
-                await asyncio.sleep(self.frequency)
-            except Exception as ex:
-                self.logger.error("fxcm crawler has exception", exc_info=ex)
-                try:
-                    self.stop()
-                except:
-                    pass
-                break
+                self.stop()
+            except:
+                pass
@@ -0,0 +1,11 @@
+from .base import *
+from .fxcm_connections import *
+from .fxcm import *
+from .synthetic import *
+
+__all__ = (
+    base.__all__ +
+    fxcm_connections.__all__ +
+    fxcm.__all__ +
+    synthetic.__all__
+)
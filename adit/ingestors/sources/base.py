@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import logging
+from typing import List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from adit.controllers import DENSE_PERIODS
+from adit.utils import RateLimiter
+
+__all__ = ['CandleSource', 'CANDLE_SOURCES', 'make_candle_source']
+
+# name -> source class, filled by the source modules of this package
+CANDLE_SOURCES = {}
+
+
+class CandleSource:
+    # a broker (or a stand-in for one) which serves candles of one period. `max_bars` is the largest number of
+    # candles one request may return, callers split longer ranges with `chunks`.
+    NAME = None
+    DEFAULT_MAX_BARS = 10000
+
+    def __init__(self, period: str = 'm1', max_bars: int = None) -> None:
+        self.logger = logging.getLogger(self.__class__.__name__)
+        if period not in DENSE_PERIODS:
+            raise ValueError(f"Unsupported candle period '{period}', expected one of {sorted(DENSE_PERIODS)}")
+        self.period = period
+        self.max_bars = self.DEFAULT_MAX_BARS if max_bars is None else max_bars
+        self.bar_span = np.timedelta64(DENSE_PERIODS[period][0], 's')
+        self.limiter = RateLimiter.instance()
+
+    def chunks(self, start, end) -> List[Tuple[np.datetime64, np.datetime64]]:
+        # [start, end) split into request sized [chunk_start, chunk_stop) ranges on a grid anchored at the epoch,
+        # so overlapping ranges share their chunks whatever their start, only the first and last chunk are cut
+        start = np.datetime64(start, 'ns')
+        end = np.datetime64(end, 'ns')
+        span = (self.bar_span * self.max_bars).astype('timedelta64[ns]')
+        epoch = np.datetime64(0, 'ns')
+        first_edge = epoch + ((start - epoch) // span) * span + span
+        edges = [start] + list(np.arange(first_edge, end, span)) + [end]
+        return [(chunk_start, chunk_stop) for chunk_start, chunk_stop in zip(edges[:-1], edges[1:])
+                if chunk_start < chunk_stop]
+
+    def fetch(self, pair: str, start, stop) -> Union[pd.DataFrame, None]:
+        # get_candles within the request budget of this source, blocks while the source is throttled
+        self.limiter.acquire(self.NAME, pair)
+        return self.get_candles(pair, start, stop)
+
+    def get_candles(self, pair: str, start, stop) -> Union[pd.DataFrame, None]:
+        # candles of [start, stop) indexed by date with the raw array columns, None or empty when there are none.
+        # failures are raised so callers can retry.
+        raise NotImplementedError()
+
+    def get_ticks(self, pair: str, start, stop) -> Union[pd.DataFrame, None]:
+        # ticks of [start, stop) indexed by date with bid and ask columns, for sources which serve them
+        raise NotImplementedError()
+
+    def connection_stats(self) -> Union[dict, None]:
+        return None
+
+    def close(self) -> None:
+        pass
+
+
+def make_candle_source(name: str, **kwargs) -> CandleSource:
+    if name not in CANDLE_SOURCES:
+        raise ValueError(f"Unknown candle source '{name}', expected one of {sorted(CANDLE_SOURCES)}")
+    return CANDLE_SOURCES[name](**kwargs)
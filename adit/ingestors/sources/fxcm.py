@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from typing import Union
+
+import pandas as pd
+
+from adit.config import Config
+from .base import CandleSource, CANDLE_SOURCES
+from .fxcm_connections import FXCMConnectionPool
+
+__all__ = ['FXCMCandleSource']
+
+
+class FXCMCandleSource(CandleSource):
+    # fxcm serves at most 10000 candles per request. requests run on the sessions of the shared connection pool.
+    NAME = "fxcm"
+
+    def __init__(self, period: str = None, max_bars: int = None) -> None:
+        config = Config.instance()
+        super().__init__(period=period or config.get_str("fxcm", "period", "m1"), max_bars=max_bars)
+        self.connections = FXCMConnectionPool.instance()
+        self.connections.start()
+
+    def get_candles(self, pair: str, start, stop) -> Union[pd.DataFrame, None]:
+        start = pd.Timestamp(start)
+        stop = pd.Timestamp(stop)
+        with self.connections.acquire() as conn:
+            df = conn.get_candles(instrument=pair, period=self.period, start=start.to_pydatetime(),
+                                  stop=stop.to_pydatetime())
+        if df is None or len(df.index) == 0:
+            return None
+        df.index = pd.to_datetime(df.index)
+        df.index.name = 'date'
+        # fxcm includes the candle at `stop`, it belongs to the next request
+        return df[(df.index >= start) & (df.index < stop)]
+
+    def connection_stats(self) -> Union[dict, None]:
+        return self.connections.get_stats()
+
+
+CANDLE_SOURCES[FXCMCandleSource.NAME] = FXCMCandleSource
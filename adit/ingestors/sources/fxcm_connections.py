@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import time
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+
+import fxcmpy
+
+from adit.config import Config
+import adit.constants as const
+from adit.controllers import EventLoopController, TPOOL
+
+__all__ = ['FXCMConnectionPool']
+
+
+class FXCMSession:
+    def __init__(self, index: int) -> None:
+        self.index = index
+        self.conn = None
+        self.state = 'broken'
+        self.failures = 0
+        self.next_attempt = 0.0
+
+
+class FXCMConnectionPool:
+    # a few fxcm sessions shared by every fetch of this process. `acquire` only hands out established sessions,
+    # connecting and reconnecting happen in the background task which also checks idle sessions every
+    # `health_interval` seconds. a session failing to connect is retried after an exponential backoff.
+    TASK_NAME = "fxcm-connections"
+    _INSTANCE = None
+
+    def __init__(self):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.config = Config.instance()
+        self.evl = EventLoopController.instance()
+        self.access_token = self.config.get_str("fxcm", "token")
+        self.size = self.config.get_int("fxcm", "connections", const.DEFAULT_FXCM_CONNECTIONS)
+        self.health_interval = self.config.get_int("fxcm", "health_interval", const.DEFAULT_FXCM_HEALTH_INTERVAL)
+        self.backoff = self.config.get_int("fxcm", "reconnect_backoff", const.DEFAULT_FXCM_RECONNECT_BACKOFF)
+        self.max_backoff = self.config.get_int("fxcm", "reconnect_backoff_max", const.DEFAULT_FXCM_RECONNECT_BACKOFF_MAX)
+        self.acquire_timeout = self.config.get_int("fxcm", "acquire_timeout", const.DEFAULT_FXCM_ACQUIRE_TIMEOUT)
+        self.sessions = [FXCMSession(index) for index in range(self.size)]
+        self.condition = threading.Condition()
+        self.wakeup = None
+        self.stats = {
+            'connects': 0,
+            'reconnects': 0,
+            'connect_failures': 0,
+            'health_checks': 0,
+            'unhealthy': 0,
+            'acquires': 0,
+            'acquire_waits': 0,
+            'acquire_timeouts': 0,
+        }
+
+    def start(self) -> None:
+        if not self.evl.is_running(self.TASK_NAME):
+            if self.TASK_NAME in self.evl.taskmap:
+                self.evl.stop_task(self.TASK_NAME)
+            self.evl.shedule_task(self.TASK_NAME, self._run)
+
+    def stop(self) -> None:
+        if self.TASK_NAME in self.evl.taskmap:
+            self.evl.stop_task(self.TASK_NAME)
+
+    async def _run(self, queue):
+        loop = self.evl.get_loop()
+        self.wakeup = asyncio.Event()
+        while True:
+            try:
+                await loop.run_in_executor(TPOOL, self.check)
+            except Exception as ex:
+                self.logger.error("Failed to check fxcm connections", exc_info=ex)
+            # a broken session wakes the task up before the next health check
+            delay = min([self.health_interval] + [max(0.0, session.next_attempt - time.time())
+                                                  for session in self.sessions if session.state == 'broken'])
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+
+    def _notify_broken(self) -> None:
+        if self.wakeup is not None:
+            self.evl.get_loop().call_soon_threadsafe(self.wakeup.set)
+
+    @staticmethod
+    def _is_healthy(conn) -> bool:
+        try:
+            return conn is not None and conn.connection_status == 'established' and conn.is_connected()
+        except Exception:
+            return False
+
+    def check(self) -> None:
+        now = time.time()
+        with self.condition:
+            idle = [session for session in self.sessions if session.state == 'idle']
+            for session in idle:
+                session.state = 'checking'
+            due = [session for session in self.sessions if session.state == 'broken' and session.next_attempt <= now]
+            for session in due:
+                session.state = 'connecting'
+
+        for session in idle:
+            self.stats['health_checks'] += 1
+            healthy = self._is_healthy(session.conn)
+            if not healthy:
+                self.stats['unhealthy'] += 1
+                self.logger.warning(f"fxcm session {session.index} is not connected anymore, reconnecting")
+            with self.condition:
+                session.state = 'idle' if healthy else 'connecting'
+                self.condition.notify_all()
+            if not healthy:
+                due.append(session)
+
+        for session in due:
+            self._connect(session)
+
+    def _connect(self, session: FXCMSession) -> None:
+        reconnect = session.conn is not None
+        try:
+            if session.conn is None:
+                session.conn = fxcmpy.fxcmpy(access_token=self.access_token, log_level='error')
+            elif not self._is_healthy(session.conn):
+                session.conn.connect()
+            if not self._is_healthy(session.conn):
+                raise ConnectionError(f"fxcm session {session.index} is {session.conn.connection_status}")
+            self.stats['reconnects' if reconnect else 'connects'] += 1
+            with self.condition:
+                session.state = 'idle'
+                session.failures = 0
+                self.condition.notify_all()
+        except Exception as ex:
+            self.stats['connect_failures'] += 1
+            session.failures += 1
+            backoff = min(self.max_backoff, self.backoff * 2 ** (session.failures - 1))
+            self.logger.warning(f"Failed to connect fxcm session {session.index} ({session.failures} in a row), "
+                                f"retrying in {backoff}s", exc_info=ex)
+            with self.condition:
+                session.state = 'broken'
+                session.next_attempt = time.time() + backoff
+
+    @contextmanager
+    def acquire(self, timeout: float = None):
+        # blocks until an established session is idle, raises ConnectionError after `timeout` seconds
+        timeout = self.acquire_timeout if timeout is None else timeout
+        deadline = time.time() + timeout
+        with self.condition:
+            self.stats['acquires'] += 1
+            session = self._idle_session()
+            if session is None:
+                self.stats['acquire_waits'] += 1
+            while session is None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    self.stats['acquire_timeouts'] += 1
+                    raise ConnectionError(f"No fxcm session was available within {timeout}s")
+                self.condition.wait(remaining)
+                session = self._idle_session()
+            session.state = 'busy'
+
+        healthy = False
+        try:
+            yield session.conn
+            healthy = True
+        finally:
+            # a failed call only gives the session back when it is still connected
+            healthy = healthy or self._is_healthy(session.conn)
+            with self.condition:
+                session.state = 'idle' if healthy else 'broken'
+                if not healthy:
+                    session.next_attempt = time.time()
+                    self.stats['unhealthy'] += 1
+                self.condition.notify_all()
+            if not healthy:
+                self._notify_broken()
+
+    def _idle_session(self):
+        for session in self.sessions:
+            if session.state == 'idle':
+                return session
+        return None
+
+    def get_stats(self):
+        with self.condition:
+            stats = dict(self.stats)
+            for state in ['idle', 'busy', 'broken', 'connecting', 'checking']:
+                stats[state] = sum(1 for session in self.sessions if session.state == state)
+        stats['size'] = self.size
+        return stats
+
+    def close(self) -> None:
+        self.stop()
+        with self.condition:
+            for session in self.sessions:
+                if session.conn is not None:
+                    try:
+                        session.conn.close()
+                    except Exception as ex:
+                        self.logger.warning(f"Failed to close fxcm session {session.index}", exc_info=ex)
+                session.conn = None
+                session.state = 'broken'
+                session.failures = 0
+                session.next_attempt = 0.0
+
+    @classmethod
+    def instance(cls):
+        if cls._INSTANCE is None:
+            cls._INSTANCE = FXCMConnectionPool()
+        return cls._INSTANCE
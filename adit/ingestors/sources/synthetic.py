@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import time
+import zlib
+import random
+import threading
+from typing import List, Union
+
+import numpy as np
+import pandas as pd
+
+from adit.config import Config
+from adit.utils import make_fx_bars, is_market_open
+from .base import CandleSource, CANDLE_SOURCES
+
+__all__ = ['SyntheticCandleSource']
+
+
+class SyntheticCandleSource(CandleSource):
+    # offline stand-in for a broker. candles are generated per bar-aligned request from a seed derived from the
+    # pair and the request start, so fetching the same range twice gives the same candles. the market is closed
+    # from friday 22:00 to sunday 22:00 utc like the fx market unless `open_weekends` is set. `latency` seconds
+    # are spent on every request to mimic a broker round trip and a share `error_rate` of the requests fails with
+    # a ConnectionError, drawn from a generator seeded with `seed`.
+    NAME = "synthetic"
+    TICKS_PER_BAR = 20
+
+    def __init__(self, period: str = 'm1', max_bars: int = None, latency: float = None, error_rate: float = None,
+                 instruments: int = None, seed: int = None, open_weekends: bool = False) -> None:
+        super().__init__(period=period, max_bars=max_bars)
+        config = Config.instance()
+        self.latency = config.get_float("synthetic", "latency", 0.0) if latency is None else latency
+        self.error_rate = config.get_float("synthetic", "error_rate", 0.0) if error_rate is None else error_rate
+        self.instruments = config.get_int("synthetic", "instruments", 3) if instruments is None else instruments
+        self.seed = config.get_int("synthetic", "seed", 13) if seed is None else seed
+        self.open_weekends = open_weekends
+        self.errors = random.Random(self.seed)
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'errors': 0}
+
+    def get_instruments(self, prefix: str = "SYN") -> List[str]:
+        return [f"{prefix}{i:03d}/USD" for i in range(self.instruments)]
+
+    def _request(self, pair: str, start, stop) -> None:
+        if self.latency > 0:
+            time.sleep(self.latency)
+        with self.lock:
+            self.stats['requests'] += 1
+            failed = self.errors.random() < self.error_rate
+            if failed:
+                self.stats['errors'] += 1
+        if failed:
+            raise ConnectionError(f"synthetic failure of {pair} from {start} to {stop}")
+
+    def _bars(self, start, stop):
+        # first bar at or after `start` and the number of bars before `stop`
+        bar_nanos = self.bar_span.astype('timedelta64[ns]').astype(np.int64)
+        first = -(-np.datetime64(start, 'ns').astype(np.int64) // bar_nanos) * bar_nanos
+        stop = np.datetime64(stop, 'ns').astype(np.int64)
+        return bar_nanos, first, int(max(0, -(-(stop - first) // bar_nanos)))
+
+    def get_candles(self, pair: str, start, stop) -> Union[pd.DataFrame, None]:
+        self._request(pair, start, stop)
+        bar_nanos, first, rows = self._bars(start, stop)
+        if rows == 0:
+            return None
+
+        seed = zlib.crc32(f"{pair.replace('/', '')}:{first}".encode())
+        base = 1.0 + (zlib.crc32(pair.replace('/', '').encode()) % 1000) / 1000.0
+        df = make_fx_bars(rows, start=pd.Timestamp(first), freq=pd.Timedelta(bar_nanos, 'ns'), seed=seed, base=base)
+        return df if self.open_weekends else df[is_market_open(df.index)]
+
+    def get_ticks(self, pair: str, start, stop) -> Union[pd.DataFrame, None]:
+        self._request(pair, start, stop)
+        bar_nanos, first, rows = self._bars(start, stop)
+        if rows == 0:
+            return None
+
+        rng = np.random.RandomState(zlib.crc32(f"{pair.replace('/', '')}:{first}:ticks".encode()))
+        count = rows * self.TICKS_PER_BAR
+        base = 1.0 + (zlib.crc32(pair.replace('/', '').encode()) % 1000) / 1000.0
+        offsets = np.sort(rng.randint(0, rows * bar_nanos, count))
+        mid = base * np.exp(np.cumsum(rng.normal(0.0, 0.00005, count)))
+        df = pd.DataFrame({'bid': mid - 0.0001, 'ask': mid + 0.0001},
+                          index=pd.DatetimeIndex(first + offsets, name='date'))
+        return df if self.open_weekends else df[is_market_open(df.index)]
+
+    def connection_stats(self) -> Union[dict, None]:
+        with self.lock:
+            return dict(self.stats)
+
+
+CANDLE_SOURCES[SyntheticCandleSource.NAME] = SyntheticCandleSource
@@ -1,10 +1,14 @@
 # all of these processor are one-shot processor which can be triggered by dashboard button.
 from .metrics import *
+from .candle_job import *
 from .populator import *
+from .repair import *
 from .models import *
 
 __all__ = (
     metrics.__all__ +
+    candle_job.__all__ +
     populator.__all__ +
+    repair.__all__ +
     models.__all__
 )
\ No newline at end of file
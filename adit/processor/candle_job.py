@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import time
+import asyncio
+import logging
+import concurrent.futures
+from collections import OrderedDict
+
+import pandas as pd
+
+from adit.config import Config
+import adit.constants as const
+from adit.controllers import AsyncTileDBController, EventLoopController
+from adit.utils import RetryPolicy
+
+__all__ = ['CandleJob']
+
+
+class CandleJob:
+    # skeleton of the one-shot jobs fetching candles of several pairs (backfill, gap repair). a job runs as one
+    # task of the event loop, keeps a progress state per pair and shares `workers` request slots between its
+    # pairs, every request is retried by `retry` before it is given up.
+    TASK_NAME = None
+    JOB_NAME = None
+    # the progress key counting the requests of a pair, `done` of them are finished
+    PROGRESS_UNIT = None
+
+    def __init__(self, source_name: str, workers: int, retries: int):
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.config = Config.instance()
+        self.tiledb = AsyncTileDBController.instance()
+        self.evl = EventLoopController.instance()
+        self.source_name = source_name
+        self.workers = workers
+        self.retries = retries
+        self.period = self.config.get_str("fxcm", "period", "m1")
+        self.pairs = [pair.strip() for pair in self.config.get_str("fxcm", "ccypairs", "").strip().split("\n")
+                      if pair.strip() != ""]
+        self.progress = OrderedDict()
+        self.retry = RetryPolicy(retries=self.retries,
+                                 base=self.config.get_float("ratelimit", "retry_base", const.DEFAULT_RETRY_BASE),
+                                 max_delay=self.config.get_float("ratelimit", "retry_max", const.DEFAULT_RETRY_MAX))
+
+    def get_progress(self):
+        progress = OrderedDict()
+        for pair, state in list(self.progress.items()):
+            state = dict(state)
+            elapsed = (state['finished_at'] or time.time()) - state['started_at']
+            total = state[self.PROGRESS_UNIT]
+            state['elapsed'] = elapsed
+            state['rows_per_s'] = state['rows'] / elapsed if elapsed > 0 else 0.0
+            state['percent'] = 100.0 * state['done'] / total if total > 0 else 100.0
+            progress[pair] = state
+        return progress
+
+    def is_running(self):
+        return self.evl.is_running(self.TASK_NAME)
+
+    def start(self, **kwargs) -> bool:
+        # `kwargs` are the arguments of `run`
+        if self.is_running():
+            self.logger.warning(f"A {self.JOB_NAME} is already running")
+            return False
+        if self.TASK_NAME in self.evl.taskmap:
+            self.evl.stop_task(self.TASK_NAME)
+        self.evl.shedule_task(self.TASK_NAME, self._run, **kwargs)
+        return True
+
+    def stop(self) -> None:
+        self.evl.stop_task(self.TASK_NAME)
+
+    async def _run(self, queue, **kwargs):
+        try:
+            await self.run(**kwargs)
+        except Exception as ex:
+            self.logger.error(f"{self.JOB_NAME} has exception", exc_info=ex)
+
+    async def run(self, **kwargs):
+        raise NotImplementedError()
+
+    async def _run_pairs(self, candles, pairs, run_pair):
+        # `run_pair(candles, executor, slots, pair)` of every pair at once, the candle source is closed afterwards
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.TASK_NAME)
+        slots = asyncio.Semaphore(self.workers)
+        self.progress.clear()
+        try:
+            await asyncio.gather(*[run_pair(candles, executor, slots, pair) for pair in pairs])
+        finally:
+            executor.shutdown(wait=False)
+            candles.close()
+        return self.get_progress()
+
+    async def _fetch(self, candles, executor, slots, pair, start, stop, tag=None):
+        # (`tag`, candles of [start, stop)), the candles are None once every retry failed
+        loop = asyncio.get_event_loop()
+
+        async def fetch():
+            try:
+                return await loop.run_in_executor(executor, candles.fetch, pair, start, stop)
+            except Exception as ex:
+                self.logger.warning(f"Failed to fetch {pair} from {start} to {stop}", exc_info=ex)
+                raise
+
+        async with slots:
+            try:
+                df = await self.retry.call_async(fetch)
+            except Exception:
+                self.logger.error(f"Giving up on {pair} from {start} to {stop} after {self.retries} retries")
+                return tag, None
+        return tag, (pd.DataFrame() if df is None else df)
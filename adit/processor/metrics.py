@@ -4,7 +4,7 @@ import logging
 import pandas as pd
 import asyncio
 
-from adit.controllers import TileDBController, EventLoopController, TPOOL
+from adit.controllers import TileDBController, AsyncTileDBController, EventLoopController, TPOOL
 
 __all__ = ['MetricsCalculator']
 
@@ -17,24 +17,21 @@ class MetricsCalculator:
     def __init__(self):
         self.logger = logging.getLogger(self.__class__.__name__)
         self.tiledb = TileDBController.instance()
+        self.atiledb = AsyncTileDBController.instance()
         self.evl = EventLoopController.instance()
         self.evl_loop = self.evl.get_loop()
         self.frequency = 86400 # 1 day
 
-    def _cal_metrics(self, pair, from_ts, to_ts):
-        self.logger.debug(f"getting data of pair {pair} to calculate midclose rate")
-        df = self.tiledb.get_ts_dataframe('raw', pair, from_ts, to_ts)
-
-        self.logger.debug(f"resample data of pair {pair} to daily and drop NaN data row")
-        df = df.set_index('date').resample('D').last().dropna(axis=0, how='all')
+    def _metrics_df(self, pair, df):
+        df = df.dropna(axis=0, how='all')
 
         if len(df.index) < 2:
             self.logger.debug(f"data is not enough to perform metrics calculation, at least 2 day worth of data")
-            return
+            return None
 
         self.logger.debug(f"calculate midclose rate data of pair {pair} and drop unnecessary data")
         df['midclose'] = (df['bidclose'].abs() + df['askclose'].abs()) / 2
-        df = df.drop(columns=['bidopen', 'bidclose', 'bidhigh', 'bidlow', 'askopen', 'askclose', 'askhigh', 'asklow', 'tickqty'])
+        df = df.drop(columns=['bidclose', 'askclose'])
 
         self.logger.debug(f"calculate log return of midclose of pair {pair}")
         logret_df = df.pct_change().rename(columns={"midclose": "logret"})
@@ -44,8 +41,24 @@ class MetricsCalculator:
 
         df = pd.merge(df, logret_df, how='inner', left_index=True, right_index=True)
         df = pd.merge(df, ema_df, how='inner', left_index=True, right_index=True)
-        self.logger.debug(f"store daily metrics of {pair} to tiledb")
-        self.tiledb.store_df("health", f"{pair}_DAILY_METRICS", df)
+        return df
+
+    def _cal_metrics(self, pair, from_ts, to_ts):
+        self.logger.debug(f"getting daily data of pair {pair} to calculate midclose rate")
+        df = self.tiledb.aggregate(pair, from_ts, to_ts, 'D', how='ohlc', attrs=['bidclose', 'askclose'])
+        df = self._metrics_df(pair, df)
+        if df is not None:
+            self.logger.debug(f"store daily metrics of {pair} to tiledb")
+            self.tiledb.store_df("health", f"{pair}_DAILY_METRICS", df)
+
+    async def _cal_metrics_async(self, pair, from_ts, to_ts):
+        # tiledb reads and writes go through the io executor, only the pandas work runs on TPOOL
+        self.logger.debug(f"getting daily data of pair {pair} to calculate midclose rate")
+        df = await self.atiledb.aggregate(pair, from_ts, to_ts, 'D', how='ohlc', attrs=['bidclose', 'askclose'])
+        df = await self.evl_loop.run_in_executor(TPOOL, self._metrics_df, pair, df)
+        if df is not None:
+            self.logger.debug(f"store daily metrics of {pair} to tiledb")
+            await self.atiledb.store_df("health", f"{pair}_DAILY_METRICS", df)
 
     def cal_metrics(self, pair, from_ts, to_ts):
         self.logger.debug(f"awaiting for metric fcalculation rom {from_ts} to {to_ts} for pair {pair}")
@@ -63,13 +76,20 @@ class MetricsCalculator:
 
             self.cal_metrics(pair, from_ts, to_ts)
 
+    async def cal_range_async(self, from_ts=None, to_ts=None):
+        for pair in self._CCY_PAIRS:
+            self.logger.debug(f"calculate metric from {from_ts} to {to_ts} for pair {pair}")
+            data_domain = await self.atiledb.get_data_domain('raw', pair)
+            await self._cal_metrics_async(pair, data_domain[0] if from_ts is None else from_ts,
+                                          data_domain[1] if to_ts is None else to_ts)
+
     async def cal_async(self):
         for pair in self._CCY_PAIRS:
-            from_ts = self.tiledb.get_data_domain("health", f"{pair}_DAILY_METRICS")[1]
-            to_ts = self.tiledb.get_data_domain("raw", pair)[1]
+            from_ts = (await self.atiledb.get_data_domain("health", f"{pair}_DAILY_METRICS"))[1]
+            to_ts = (await self.atiledb.get_data_domain("raw", pair))[1]
             if to_ts > from_ts:
                 self.logger.debug(f"calculate data metrics from {from_ts} to {to_ts}")
-                await self.evl_loop.run_in_executor(TPOOL, self.cal_metrics, pair, from_ts, to_ts)
+                await self._cal_metrics_async(pair, from_ts, to_ts)
             else:
                 self.logger.debug(f"data metrics is already up to date")
 
@@ -1 +1,112 @@
-__all__ = []
\ No newline at end of file
+from __future__ import annotations
+
+import time
+import asyncio
+import functools
+
+import numpy as np
+import pandas as pd
+
+from adit.config import Config
+import adit.constants as const
+from adit.ingestors import make_candle_source
+from adit.utils import missing_bars
+from .candle_job import CandleJob
+
+__all__ = ['DataPopulator']
+
+
+class DataPopulator(CandleJob):
+    # backfills history of [start, end) per pair. the range is split into chunks of at most `chunk_bars`
+    # candles, up to `workers` chunks are fetched at once and fetched chunks are written in sorted batches of
+    # about `write_rows` rows. chunks lie on a grid anchored at the epoch and every written chunk is recorded in a
+    # ledger of checkpoints under backfill/<pair>/<chunk start>, a later run over any overlapping range skips them
+    # and only fetches what is missing. holes of written chunks go to the gap index like the ones of the crawler.
+    TASK_NAME = "data-populator"
+    JOB_NAME = "backfill"
+    PROGRESS_UNIT = "chunks"
+    LEDGER = "backfill"
+    _INSTANCE = None
+
+    def __init__(self):
+        config = Config.instance()
+        super().__init__(source_name=config.get_str("backfill", "source", const.DEFAULT_BACKFILL_SOURCE),
+                         workers=config.get_int("backfill", "workers", const.DEFAULT_BACKFILL_WORKERS),
+                         retries=config.get_int("backfill", "retries", const.DEFAULT_BACKFILL_RETRIES))
+        self.chunk_bars = self.config.get_int("backfill", "chunk_bars", const.DEFAULT_BACKFILL_CHUNK_BARS)
+        self.write_rows = self.config.get_int("backfill", "write_rows", const.DEFAULT_BACKFILL_WRITE_ROWS)
+        self.start_date = self.config.get_str("backfill", "start", const.DEFAULT_BACKFILL_START)
+        self.min_gap = self.config.get_int("gaps", "min_gap", const.DEFAULT_GAP_MIN)
+
+    async def backfill(self, pairs=None, start=None, end=None, source=None):
+        pairs = self.pairs if pairs is None else pairs
+        start = np.datetime64(self.start_date if start is None else start, 'ns')
+        end = np.datetime64('now', 'ns') if end is None else np.datetime64(end, 'ns')
+        candles = make_candle_source(source or self.source_name, period=self.period, max_bars=self.chunk_bars)
+        self.logger.info(f"backfilling {pairs} from {start} to {end} with {self.workers} workers")
+        return await self._run_pairs(candles, pairs, functools.partial(self._backfill_pair, start=start, end=end))
+
+    run = backfill
+
+    async def _backfill_pair(self, candles, executor, slots, pair, start, end):
+        name = pair.replace("/", "")
+        ledger = await self.tiledb.list_kv(self.LEDGER)
+        chunks = candles.chunks(start, end)
+        todo = []
+        for chunk_start, chunk_stop in chunks:
+            done_until = ledger.get(self._ledger_key(name, chunk_start))
+            if done_until is None or done_until < chunk_stop:
+                todo.append((chunk_start, chunk_start if done_until is None else done_until, chunk_stop))
+
+        nchunks = len(chunks)
+        state = {'state': 'running', 'chunks': nchunks, 'done': nchunks - len(todo), 'skipped': nchunks - len(todo),
+                 'failed': 0, 'rows': 0, 'started_at': time.time(), 'finished_at': None}
+        self.progress[pair] = state
+        self.logger.info(f"backfill of {pair}: {len(todo)} of {nchunks} chunks to fetch")
+
+        frames, nrows, done, crawled = [], 0, {}, []
+        # every chunk is (chunk start, fetch start, chunk stop)
+        fetches = [self._fetch(candles, executor, slots, pair, chunk[1], chunk[2], tag=chunk) for chunk in todo]
+        for fetch in asyncio.as_completed(fetches):
+            (chunk_start, fetch_start, chunk_stop), df = await fetch
+            if df is None:
+                state['failed'] += 1
+                continue
+            if len(df.index) > 0:
+                frames.append(df)
+                nrows += len(df.index)
+            done[(self.LEDGER, self._ledger_key(name, chunk_start))] = chunk_stop
+            missing = missing_bars(df.index, candles.bar_span, fetch_start, chunk_stop)
+            crawled.append((fetch_start, chunk_stop, missing.drop_shorter(self.min_gap * 10 ** 9)))
+            if nrows >= self.write_rows:
+                await self._write(name, frames, done, crawled, state)
+                frames, nrows, done, crawled = [], 0, {}, []
+        await self._write(name, frames, done, crawled, state)
+
+        state['state'] = 'failed' if state['failed'] > 0 else 'done'
+        state['finished_at'] = time.time()
+        self.logger.info(f"backfill of {pair} {state['state']}: {state['rows']} rows, {state['failed']} failed chunks")
+
+    async def _write(self, name, frames, done, crawled, state):
+        # one sorted frame per batch, flushed right away so the ledger never gets ahead of the data
+        if len(frames) > 0:
+            df = pd.concat(frames).sort_index()
+            df = df[~df.index.duplicated(keep='last')]
+            await self.tiledb.store_df("raw", name, df)
+            await self.tiledb.flush(self.tiledb.tiledb.get_uri("raw", name))
+            state['rows'] += len(df.index)
+        if len(done) > 0:
+            await self.tiledb.store_kv_many(done)
+            state['done'] += len(done)
+        for start, stop, missing in crawled:
+            await self.tiledb.record_crawl(name, start, stop, missing)
+
+    @staticmethod
+    def _ledger_key(name, chunk_start):
+        return f"{name}/{int(np.datetime64(chunk_start, 'ns').astype(np.int64))}"
+
+    @classmethod
+    def instance(cls):
+        if cls._INSTANCE is None:
+            cls._INSTANCE = DataPopulator()
+        return cls._INSTANCE
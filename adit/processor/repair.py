@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import time
+import asyncio
+import functools
+
+import numpy as np
+import pandas as pd
+
+from adit.config import Config
+import adit.constants as const
+from adit.ingestors import make_candle_source
+from adit.utils import IntervalSet, missing_bars
+from .candle_job import CandleJob
+
+__all__ = ['GapRepairer']
+
+
+class GapRepairer(CandleJob):
+    # fetches the gaps of the gap index again instead of scanning the raw arrays for holes. gaps close to each other
+    # share one request of at most `max_bars` candles and only the candles falling into a gap are written. the parts
+    # of a gap still without candles after a repair are kept as unavailable, they are only fetched again when asked.
+    TASK_NAME = "gap-repairer"
+    JOB_NAME = "gap repair"
+    PROGRESS_UNIT = "requests"
+    _INSTANCE = None
+
+    def __init__(self):
+        config = Config.instance()
+        super().__init__(source_name=config.get_str("crawlers", "source", const.DEFAULT_CRAWL_SOURCE),
+                         workers=config.get_int("gaps", "repair_workers", const.DEFAULT_GAP_REPAIR_WORKERS),
+                         retries=config.get_int("gaps", "repair_retries", const.DEFAULT_GAP_REPAIR_RETRIES))
+        self.max_bars = self.config.get_int("fxcm", "max_bars", const.DEFAULT_CRAWL_MAX_BARS)
+
+    async def repair(self, pairs=None, retry_unavailable=False, source=None):
+        pairs = self.pairs if pairs is None else pairs
+        candles = make_candle_source(source or self.source_name, period=self.period, max_bars=self.max_bars)
+        self.logger.info(f"repairing the gaps of {pairs} with {self.workers} workers")
+        return await self._run_pairs(candles, pairs,
+                                     functools.partial(self._repair_pair, retry_unavailable=retry_unavailable))
+
+    run = repair
+
+    @staticmethod
+    def requests(gaps: IntervalSet, span: int):
+        # [start, stop) requests of at most `span` nanoseconds with the gaps each of them repairs. a request starts
+        # at the first gap it repairs and takes every following gap that ends within `span`, longer gaps are split.
+        requests = []
+        for start, end in gaps:
+            while start < end:
+                if len(requests) == 0 or requests[-1][0] + span <= start:
+                    requests.append([start, start, IntervalSet()])
+                request = requests[-1]
+                stop = min(end, request[0] + span)
+                request[1] = stop
+                request[2].add(start, stop)
+                start = stop
+        return [tuple(request) for request in requests]
+
+    async def _repair_pair(self, candles, executor, slots, pair, retry_unavailable):
+        name = pair.replace("/", "")
+        record = await self.tiledb.get_gap_record(name)
+        gaps = IntervalSet() if record is None else record.gaps
+        if record is not None and retry_unavailable:
+            gaps.update(record.unavailable)
+        span = int((candles.bar_span * candles.max_bars).astype('timedelta64[ns]').astype(np.int64))
+        requests = self.requests(gaps, span)
+
+        state = {'state': 'running', 'gaps': len(gaps), 'missing_seconds': gaps.total() / 1e9,
+                 'requests': len(requests), 'done': 0, 'failed': 0, 'rows': 0, 'repaired_seconds': 0.0,
+                 'unavailable_seconds': 0.0, 'started_at': time.time(), 'finished_at': None}
+        self.progress[pair] = state
+        self.logger.info(f"gap repair of {pair}: {len(gaps)} gaps, {state['missing_seconds']:.0f}s missing, "
+                         f"{len(requests)} requests")
+
+        fetches = [self._fetch(candles, executor, slots, pair, pd.Timestamp(start), pd.Timestamp(stop),
+                               tag=(start, stop, repaired)) for start, stop, repaired in requests]
+        for fetch in asyncio.as_completed(fetches):
+            (start, stop, repaired), df = await fetch
+            if df is None:
+                state['failed'] += 1
+                continue
+            # candles between the gaps are stored already
+            df = df[repaired.contains(df.index)] if len(df.index) > 0 else df
+            if len(df.index) > 0:
+                await self.tiledb.store_df("raw", name, df)
+                await self.tiledb.flush(self.tiledb.tiledb.get_uri("raw", name))
+                state['rows'] += len(df.index)
+            unavailable = missing_bars(df.index, candles.bar_span, start, stop).intersection(repaired)
+            await self.tiledb.record_repair(name, repaired, unavailable)
+            state['done'] += 1
+            state['repaired_seconds'] += (repaired.total() - unavailable.total()) / 1e9
+            state['unavailable_seconds'] += unavailable.total() / 1e9
+
+        state['state'] = 'failed' if state['failed'] > 0 else 'done'
+        state['finished_at'] = time.time()
+        self.logger.info(f"gap repair of {pair} {state['state']}: {state['rows']} rows, "
+                         f"{state['repaired_seconds']:.0f}s repaired, {state['unavailable_seconds']:.0f}s unavailable")
+
+    @classmethod
+    def instance(cls):
+        if cls._INSTANCE is None:
+            cls._INSTANCE = GapRepairer()
+        return cls._INSTANCE
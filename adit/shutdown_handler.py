@@ -12,6 +12,14 @@ def atexit_handler():
     import logging
     logger = logging.getLogger(__file__+".atexit_handler")
     logger.info("Shutting down Adit.")
+    try:
+        from adit.ingestors import FXCMConnectionPool
+        if FXCMConnectionPool._INSTANCE is not None:
+            logger.info("Closing fxcm sessions...")
+            FXCMConnectionPool.instance().close()
+    except Exception as ex:
+        logger.error("Failed to close fxcm sessions.", exc_info=ex)
+
     try:
         logger.info("Shuting down AsyncIO Event Loop Controller...")
         evl_ctr = EventLoopController.instance()
@@ -19,6 +27,19 @@ def atexit_handler():
     except Exception as ex:
         logger.error("Failed to shut down AsyncIO event loop controller...", exc_info=ex)
 
+    try:
+        logger.info("Waiting for pending TileDB io calls...")
+        AsyncTileDBController.instance().shutdown(wait=True)
+    except Exception as ex:
+        logger.error("Failed to wait for pending TileDB io calls.", exc_info=ex)
+
+    try:
+        logger.info("Flushing TileDB write buffers...")
+        tiledb_ctr = TileDBController.instance()
+        tiledb_ctr.flush()
+    except Exception as ex:
+        logger.error("Failed to flush TileDB write buffers, buffered data may be lost.", exc_info=ex)
+
     try:
         logger.info("Shutting down Adit Web App...")
         webapp_ctr = AditWebApp.instance()
@@ -4,7 +4,7 @@ import logging
 import logging.config
 
 from adit.config import Config
-from adit.controllers import DfsController, DaskController, EventLoopController
+from adit.controllers import DfsController, DaskController, EventLoopController, TileDBController, TileDBMaintenance
 from adit.dashboard import AditWebApp
 from adit import constants as const
 
@@ -89,6 +89,8 @@ def start_ingestor():
     logger = logging.getLogger(os.path.basename(__file__))
     from adit.ingestors import FXCMCrawler
     logger.info("Starting ingestor....")
+    logger.info("Starting TileDB write buffer flusher....")
+    TileDBController.instance().start_periodic_flush()
     crawler = FXCMCrawler()
     logger.info("Starting FXCM crawler....")
     crawler.start()
@@ -104,12 +106,94 @@ def start_dataprocessor():
     metric_cal.start()
 
 
+def start_storage_maintenance(mode: str = None) -> None:
+    logger = logging.getLogger(os.path.basename(__file__))
+    if mode != const.SERVER_MODE:
+        return
+    logger.info("Starting TileDB maintenance job....")
+    TileDBMaintenance.instance().start()
+
+
 def start_event_loop() -> None:
     logger = logging.getLogger(os.path.basename(__file__))
     logger.info(f"Starting Main Loop...")
     EventLoopController.instance().start()
 
 
+def init_storage() -> None:
+    init_logging()
+    init_config(mode=const.SERVER_MODE, args=None)
+    start_dfs(mode=const.SERVER_MODE)
+
+
+def run_benchmark(name: str, **kwargs) -> dict:
+    logger = logging.getLogger(os.path.basename(__file__))
+    from adit.benchmarks import BENCHMARKS
+    init_storage()
+    logger.info(f"Running {name} benchmark with {kwargs}...")
+    return BENCHMARKS[name](**kwargs)
+
+
+def run_layout_migration(datatype: str, name: str, layout: str, period: str = None) -> int:
+    logger = logging.getLogger(os.path.basename(__file__))
+    init_storage()
+    logger.info(f"Migrating {datatype} array {name} to the {layout} layout...")
+    return TileDBController.instance().migrate_layout(datatype, name, layout=layout, period=period)
+
+
+def run_rollup_build(pairs: list = None) -> dict:
+    logger = logging.getLogger(os.path.basename(__file__))
+    init_storage()
+    if pairs is None:
+        pairs = [pair.strip() for pair in Config.instance().get_str("fxcm", "ccypairs", "").strip().split("\n")
+                 if pair.strip() != ""]
+    tiledb = TileDBController.instance()
+    built = {}
+    for pair in pairs:
+        name = pair.replace("/", "")
+        logger.info(f"Building the rollups of {name}...")
+        tiledb.rollups.rebuild(name)
+        built[pair] = tiledb.rollups.is_built(name)
+    return built
+
+
+def run_storage_tuning(profile: str, workload: str, rows: int, save: bool = True) -> dict:
+    logger = logging.getLogger(os.path.basename(__file__))
+    from adit.benchmarks import run_storage_tuning as tune
+    init_storage()
+    logger.info(f"Tuning tiledb profile {profile} with a {workload} workload...")
+    return tune(rows=rows, profile=profile, workload=workload, save=save)
+
+
+def run_load_test(pair_counts: list, duration: float, latency: float, error_rate: float, concurrency: int = None) -> dict:
+    logger = logging.getLogger(os.path.basename(__file__))
+    from adit.benchmarks import run_ingest_load_test
+    init_storage()
+    logger.info(f"Load testing the ingest path with {pair_counts} pairs...")
+    return run_ingest_load_test(pair_counts=pair_counts, duration=duration, latency=latency, error_rate=error_rate,
+                                concurrency=concurrency)
+
+
+def run_backfill(pairs: list = None, start: str = None, end: str = None, source: str = None) -> dict:
+    logger = logging.getLogger(os.path.basename(__file__))
+    from adit.processor import DataPopulator
+    init_storage()
+    logger.info(f"Backfilling {pairs or 'all configured pairs'} from {start} to {end}...")
+    populator = DataPopulator.instance()
+    return EventLoopController.instance().get_loop().run_until_complete(
+        populator.backfill(pairs=pairs, start=start, end=end, source=source))
+
+
+def run_gap_repair(pairs: list = None, retry_unavailable: bool = False, source: str = None) -> dict:
+    logger = logging.getLogger(os.path.basename(__file__))
+    from adit.processor import GapRepairer
+    init_storage()
+    logger.info(f"Repairing the gaps of {pairs or 'all configured pairs'}...")
+    repairer = GapRepairer.instance()
+    return EventLoopController.instance().get_loop().run_until_complete(
+        repairer.repair(pairs=pairs, retry_unavailable=retry_unavailable, source=source))
+
+
 def start(mode: str = None, args: dict = None) -> None:
     logger = logging.getLogger(os.path.basename(__file__))
     try:
@@ -120,6 +204,7 @@ def start(mode: str = None, args: dict = None) -> None:
         start_dask_and_webapp(mode=mode)
         start_stream_engine(mode=mode, args=args)
         start_ingestor()
+        start_storage_maintenance(mode=mode)
         #start_dataprocessor()
         start_event_loop()
     except Exception as ex:
@@ -1,9 +1,17 @@
 from .platform import *
 from .downloaders import *
 from .proxy import *
+from .synthetic import *
+from .metrics import *
+from .ratelimit import *
+from .intervals import *
 
 __all__ = (
     platform.__all__ +
     downloaders.__all__ +
-    proxy.__all__
+    proxy.__all__ +
+    synthetic.__all__ +
+    metrics.__all__ +
+    ratelimit.__all__ +
+    intervals.__all__
 )
\ No newline at end of file
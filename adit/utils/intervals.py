@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import bisect
+from typing import Iterable, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+__all__ = ['IntervalSet', 'missing_bars', 'market_closed', 'market_open', 'is_market_open', 'FX_WEEKLY_CLOSE']
+
+_HOUR = 3600 * 10 ** 9
+_WEEK = 7 * 24 * _HOUR
+# 1970-01-05, the first monday of the epoch
+_FIRST_MONDAY = 4 * 24 * _HOUR
+
+# hours after monday 00:00 utc of the weekly fx close, from friday 22:00 to sunday 22:00
+FX_WEEKLY_CLOSE = (4 * 24 + 22, 6 * 24 + 22)
+
+
+def _ns(value) -> int:
+    return int(np.datetime64(value, 'ns').astype(np.int64)) if not isinstance(value, (int, np.integer)) else int(value)
+
+
+class IntervalSet:
+    # sorted, disjoint and non-adjacent [start, end) intervals of nanoseconds since the epoch
+    def __init__(self, intervals: Iterable[Tuple] = ()) -> None:
+        self.starts: List[int] = []
+        self.ends: List[int] = []
+        for start, end in intervals:
+            self.add(start, end)
+
+    @classmethod
+    def from_flat(cls, values: Sequence[int]) -> IntervalSet:
+        return cls(zip(values[0::2], values[1::2]))
+
+    def to_flat(self) -> List[int]:
+        return [value for interval in zip(self.starts, self.ends) for value in interval]
+
+    def add(self, start, end) -> None:
+        start, end = _ns(start), _ns(end)
+        if end <= start:
+            return
+        # every interval touching [start, end) is merged into it
+        first = bisect.bisect_left(self.ends, start)
+        last = bisect.bisect_right(self.starts, end)
+        if first < last:
+            start = min(start, self.starts[first])
+            end = max(end, self.ends[last - 1])
+        self.starts[first:last] = [start]
+        self.ends[first:last] = [end]
+
+    def remove(self, start, end) -> None:
+        start, end = _ns(start), _ns(end)
+        if end <= start:
+            return
+        first = bisect.bisect_right(self.ends, start)
+        last = bisect.bisect_left(self.starts, end)
+        if first >= last:
+            return
+        starts, ends = [], []
+        if self.starts[first] < start:
+            starts.append(self.starts[first])
+            ends.append(start)
+        if self.ends[last - 1] > end:
+            starts.append(end)
+            ends.append(self.ends[last - 1])
+        self.starts[first:last] = starts
+        self.ends[first:last] = ends
+
+    def update(self, other: IntervalSet) -> None:
+        for start, end in other:
+            self.add(start, end)
+
+    def difference_update(self, other: IntervalSet) -> None:
+        for start, end in other:
+            self.remove(start, end)
+
+    def difference(self, other: IntervalSet) -> IntervalSet:
+        result = self.copy()
+        result.difference_update(other)
+        return result
+
+    def intersection(self, other: IntervalSet) -> IntervalSet:
+        result = IntervalSet()
+        for start, end in other:
+            result.update(self.clip(start, end))
+        return result
+
+    def clip(self, start, end) -> IntervalSet:
+        # the parts of this set inside [start, end)
+        start, end = _ns(start), _ns(end)
+        result = IntervalSet()
+        first = bisect.bisect_right(self.ends, start)
+        last = bisect.bisect_left(self.starts, end)
+        result.starts = [max(start, value) for value in self.starts[first:last]]
+        result.ends = [min(end, value) for value in self.ends[first:last]]
+        return result
+
+    def contains(self, values) -> np.ndarray:
+        # mask of the dates of `values` falling into one of the intervals
+        values = np.asarray(values, dtype='datetime64[ns]').astype(np.int64)
+        if len(self.starts) == 0:
+            return np.zeros(len(values), dtype=bool)
+        position = np.searchsorted(np.asarray(self.starts, dtype=np.int64), values, side='right') - 1
+        ends = np.asarray(self.ends, dtype=np.int64)
+        return (position >= 0) & (values < ends[np.maximum(position, 0)])
+
+    def drop_shorter(self, length: int) -> IntervalSet:
+        return IntervalSet((start, end) for start, end in self if end - start >= length)
+
+    def total(self) -> int:
+        return sum(self.ends) - sum(self.starts)
+
+    def copy(self) -> IntervalSet:
+        result = IntervalSet()
+        result.starts = list(self.starts)
+        result.ends = list(self.ends)
+        return result
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        return iter(list(zip(self.starts, self.ends)))
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, IntervalSet) and self.starts == other.starts and self.ends == other.ends
+
+    def __repr__(self) -> str:
+        intervals = ", ".join(f"[{np.datetime64(start, 'ns')}, {np.datetime64(end, 'ns')})" for start, end in self)
+        return f"IntervalSet({intervals})"
+
+
+def missing_bars(index, bar_span, start, end) -> IntervalSet:
+    # parts of [start, end) not covered by a bar of `bar_span` starting at one of the sorted dates of `index`
+    start, end = _ns(start), _ns(end)
+    span = int(np.timedelta64(bar_span, 'ns').astype(np.int64))
+    dates = np.asarray(index, dtype='datetime64[ns]').astype(np.int64)
+    dates = dates[(dates + span > start) & (dates < end)]
+    if len(dates) == 0:
+        return IntervalSet([(start, end)])
+    holes = np.flatnonzero(dates[1:] > dates[:-1] + span)
+    result = IntervalSet(zip((dates[holes] + span).tolist(), dates[holes + 1].tolist()))
+    result.add(start, int(dates[0]))
+    result.add(int(dates[-1]) + span, end)
+    return result
+
+
+def market_closed(start, end, weekly_close: Tuple[int, int] = FX_WEEKLY_CLOSE) -> IntervalSet:
+    # the weekly closes overlapping [start, end)
+    start, end = _ns(start), _ns(end)
+    close, reopen = weekly_close[0] * _HOUR, weekly_close[1] * _HOUR
+    first_week = (start - _FIRST_MONDAY - reopen) // _WEEK + 1
+    last_week = (end - _FIRST_MONDAY - close) // _WEEK + 1
+    closed = IntervalSet(
+        (_FIRST_MONDAY + week * _WEEK + close, _FIRST_MONDAY + week * _WEEK + reopen)
+        for week in range(first_week, last_week))
+    return closed.clip(start, end)
+
+
+def market_open(start, end, weekly_close: Tuple[int, int] = FX_WEEKLY_CLOSE) -> IntervalSet:
+    return IntervalSet([(start, end)]).difference(market_closed(start, end, weekly_close))
+
+
+def is_market_open(index, weekly_close: Tuple[int, int] = FX_WEEKLY_CLOSE) -> np.ndarray:
+    dates = np.asarray(index, dtype='datetime64[ns]').astype(np.int64)
+    hours = ((dates - _FIRST_MONDAY) % _WEEK) // _HOUR
+    return (hours < weekly_close[0]) | (hours >= weekly_close[1])
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import bisect
+import threading
+from collections import OrderedDict
+from typing import Dict, Sequence
+
+__all__ = ['Histogram', 'DURATION_BUCKETS']
+
+# seconds, from a fast cached call to a request hitting its timeout
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+class Histogram:
+    # per bucket (not cumulative) counts of observed values, the last bucket counts everything above the highest bound.
+    # quantiles are estimated by linear interpolation inside the bucket that holds them.
+    def __init__(self, buckets: Sequence[float] = DURATION_BUCKETS) -> None:
+        self.bounds = sorted(buckets)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self.lock:
+            self.counts = [0] * (len(self.bounds) + 1)
+            self.count = 0
+            self.total = 0.0
+            self.min = None
+            self.max = None
+
+    def observe(self, value: float) -> None:
+        with self.lock:
+            self.counts[bisect.bisect_left(self.bounds, value)] += 1
+            self.count += 1
+            self.total += value
+            self.min = value if self.min is None else min(self.min, value)
+            self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        with self.lock:
+            return self._quantile(q)
+
+    def _quantile(self, q: float) -> float:
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count > 0 and seen + count >= rank:
+                low = self.min if i == 0 else max(self.bounds[i - 1], self.min)
+                high = self.max if i == len(self.bounds) else min(self.bounds[i], self.max)
+                return low + (high - low) * (rank - seen) / count
+            seen += count
+        return self.max
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            buckets = OrderedDict()
+            for bound, count in zip(self.bounds, self.counts):
+                buckets[f"le_{bound:g}"] = count
+            buckets['inf'] = self.counts[-1]
+            return {
+                'count': self.count,
+                'sum': self.total,
+                'avg': self.total / self.count if self.count > 0 else 0.0,
+                'min': self.min or 0.0,
+                'max': self.max or 0.0,
+                'p50': self._quantile(0.5),
+                'p95': self._quantile(0.95),
+                'p99': self._quantile(0.99),
+                'buckets': buckets,
+            }
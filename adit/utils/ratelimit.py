@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import time
+import random
+import asyncio
+import threading
+from typing import Callable, Dict, Tuple, Union
+
+__all__ = ['TokenBucket', 'RateLimiter', 'RetryPolicy']
+
+
+class TokenBucket:
+    # `rate` tokens per second refill a bucket of at most `burst` tokens, a rate of 0 never throttles.
+    # tokens are reserved when asked for, so waiters are served in the order they arrived.
+    def __init__(self, rate: float, burst: float = None) -> None:
+        self.rate = rate
+        self.burst = max(1.0, rate if burst is None else burst)
+        self.tokens = self.burst
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+        self.stats = {
+            'acquired': 0,
+            'throttled': 0,
+            'wait_time': 0.0,
+            'max_wait': 0.0,
+        }
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        # takes the tokens now and returns how long the caller has to wait before using them
+        with self.lock:
+            self.stats['acquired'] += 1
+            if self.rate <= 0:
+                return 0.0
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.tokens -= tokens
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            if wait > 0:
+                self.stats['throttled'] += 1
+                self.stats['wait_time'] += wait
+                self.stats['max_wait'] = max(self.stats['max_wait'], wait)
+            return wait
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, tokens: float = 1.0) -> float:
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            stats = dict(self.stats)
+        stats['rate'] = self.rate
+        stats['burst'] = self.burst
+        stats['avg_wait'] = stats['wait_time'] / stats['throttled'] if stats['throttled'] > 0 else 0.0
+        return stats
+
+
+class RateLimiter:
+    # one token bucket per source, plus one per instrument of a source when an instrument rate is set. every
+    # request of a source takes a token of both, whichever is the tightest decides the wait.
+    _INSTANCE = None
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.limits: Dict[str, Tuple[float, float, float, float]] = {}
+        self.buckets: Dict[Tuple[str, Union[str, None]], TokenBucket] = {}
+
+    def configure(self, source: str, rate: float, burst: float = None, instrument_rate: float = 0.0,
+                  instrument_burst: float = None) -> None:
+        with self.lock:
+            self.limits[source] = (rate, burst, instrument_rate, instrument_burst)
+            for key in [key for key in self.buckets if key[0] == source]:
+                del self.buckets[key]
+
+    def _limits(self, source: str) -> Tuple[float, float, float, float]:
+        # sources without a configured limit are read from the [ratelimit] config section
+        if source not in self.limits:
+            from adit.config import Config
+            import adit.constants as const
+            config = Config.instance()
+            self.limits[source] = (
+                config.get_float("ratelimit", f"{source}_rate", const.DEFAULT_SOURCE_RATE),
+                config.get_float("ratelimit", f"{source}_burst", None),
+                config.get_float("ratelimit", f"{source}_instrument_rate", const.DEFAULT_INSTRUMENT_RATE),
+                config.get_float("ratelimit", f"{source}_instrument_burst", None),
+            )
+        return self.limits[source]
+
+    def bucket(self, source: str, instrument: str = None) -> Union[TokenBucket, None]:
+        with self.lock:
+            key = (source, instrument)
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                rate, burst, instrument_rate, instrument_burst = self._limits(source)
+                if instrument is not None:
+                    if instrument_rate <= 0:
+                        return None
+                    rate, burst = instrument_rate, instrument_burst
+                bucket = TokenBucket(rate, burst)
+                self.buckets[key] = bucket
+            return bucket
+
+    def _buckets(self, source: str, instrument: str = None):
+        buckets = [self.bucket(source)]
+        if instrument is not None:
+            buckets.append(self.bucket(source, instrument))
+        return [bucket for bucket in buckets if bucket is not None]
+
+    def reserve(self, source: str, instrument: str = None) -> float:
+        return max([bucket.reserve() for bucket in self._buckets(source, instrument)])
+
+    def acquire(self, source: str, instrument: str = None) -> float:
+        wait = self.reserve(source, instrument)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, source: str, instrument: str = None) -> float:
+        wait = self.reserve(source, instrument)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            buckets = list(self.buckets.items())
+        stats = {}
+        for (source, instrument), bucket in buckets:
+            stats[source if instrument is None else f"{source}/{instrument}"] = bucket.get_stats()
+        return stats
+
+    @classmethod
+    def instance(cls):
+        if cls._INSTANCE is None:
+            cls._INSTANCE = RateLimiter()
+        return cls._INSTANCE
+
+
+class RetryPolicy:
+    # exponential backoff with full jitter: the n-th retry waits a random time in [0, min(max_delay, base * 2^n)],
+    # so callers failing together do not come back together
+    def __init__(self, retries: int = 3, base: float = 0.5, max_delay: float = 30.0) -> None:
+        self.retries = retries
+        self.base = base
+        self.max_delay = max_delay
+        self.lock = threading.Lock()
+        self.stats = {
+            'calls': 0,
+            'retries': 0,
+            'giveups': 0,
+            'backoff_time': 0.0,
+        }
+
+    def delay(self, attempt: int) -> float:
+        delay = random.uniform(0, min(self.max_delay, self.base * (2 ** attempt)))
+        with self.lock:
+            self.stats['retries'] += 1
+            self.stats['backoff_time'] += delay
+        return delay
+
+    async def call_async(self, func: Callable, *args, retry_on=(Exception,), **kwargs):
+        with self.lock:
+            self.stats['calls'] += 1
+        for attempt in range(self.retries):
+            try:
+                return await func(*args, **kwargs)
+            except retry_on:
+                if attempt >= self.retries - 1:
+                    with self.lock:
+                        self.stats['giveups'] += 1
+                    raise
+                await asyncio.sleep(self.delay(attempt))
+
+    def get_stats(self) -> Dict:
+        with self.lock:
+            return dict(self.stats)
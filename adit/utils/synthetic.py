@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+
+__all__ = ['make_fx_bars']
+
+
+def make_fx_bars(rows: int, start: str = '2015-01-01', freq: str = '1min', seed: int = 13,
+                 base: float = 1.1, spread: float = 0.0002) -> pd.DataFrame:
+    rng = np.random.RandomState(seed)
+    index = pd.date_range(start=start, periods=rows, freq=freq, name='date')
+    mid_close = base * np.exp(np.cumsum(rng.normal(0.0, 0.0002, rows)))
+    mid_open = np.concatenate(([base], mid_close[:-1]))
+    wick = np.abs(rng.normal(0.0, 0.0001, rows))
+    mid_high = np.maximum(mid_open, mid_close) + wick
+    mid_low = np.minimum(mid_open, mid_close) - wick
+    half_spread = spread / 2
+
+    return pd.DataFrame({
+        'bidopen': mid_open - half_spread,
+        'bidclose': mid_close - half_spread,
+        'bidhigh': mid_high - half_spread,
+        'bidlow': mid_low - half_spread,
+        'askopen': mid_open + half_spread,
+        'askclose': mid_close + half_spread,
+        'askhigh': mid_high + half_spread,
+        'asklow': mid_low + half_spread,
+        'tickqty': rng.randint(1, 500, rows).astype(np.int64),
+    }, index=index)
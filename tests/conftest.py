@@ -0,0 +1,16 @@
+import os
+
+import pytest
+
+import adit.constants as const
+from adit.config import Config
+from adit.controllers import TileDBController
+
+
+@pytest.fixture(scope="session")
+def tiledb(tmp_path_factory):
+    # one controller on the in-memory filesystem for every test, nothing touches the disk nor seaweedfs
+    os.environ[const.ADIT_HOME_ENV] = str(tmp_path_factory.mktemp("adit"))
+    Config.init()
+    Config.instance().set("tiledb", "storage_root", "mem://adit-test")
+    return TileDBController.instance()
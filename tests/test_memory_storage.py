@@ -0,0 +1,44 @@
+import numpy as np
+
+from adit.benchmarks import run_ingest_load_test
+from adit.controllers import AsyncTileDBController, EventLoopController
+from adit.utils import make_fx_bars
+
+
+def test_store_flush_read(tiledb):
+    # the writes and reads run on different io threads, they all have to see the same in-memory arrays
+    atiledb = AsyncTileDBController.instance()
+    loop = EventLoopController.instance().get_loop()
+    df = make_fx_bars(500)
+    from_ts, to_ts = df.index[0].to_datetime64(), df.index[-1].to_datetime64()
+
+    async def run():
+        await atiledb.store_df('raw', 'TESTUSD', df)
+        buffered = await atiledb.get_ts_dataarray('raw', 'TESTUSD', from_ts, to_ts)
+        await atiledb.flush(tiledb.get_uri('raw', 'TESTUSD'))
+        stored = await atiledb.get_ts_dataarray('raw', 'TESTUSD', from_ts, to_ts)
+        return buffered, stored
+
+    buffered, stored = loop.run_until_complete(run())
+    try:
+        assert len(buffered['date']) == 500
+        assert len(stored['date']) == 500
+        assert tiledb.get_write_stats()['pending_rows'] == 0
+        np.testing.assert_array_equal(stored['date'], df.index.values)
+        np.testing.assert_allclose(stored['bidclose'], df['bidclose'].values)
+    finally:
+        tiledb.remove_array('raw', 'TESTUSD')
+        tiledb.rollups.remove('TESTUSD')
+    assert tiledb.list_arrays('raw') == []
+
+
+def test_ingest_load_test(tiledb):
+    # crawler -> write buffer -> flush against the synthetic source, the run removes everything it wrote
+    results = run_ingest_load_test(pair_counts=(2,), duration=2, latency=0.01, error_rate=0.0, backlog=600,
+                                   frequency=0.5)
+    run = results['2 pairs']
+    assert run['rows'] > 0
+    assert run['flushes'] > 0
+    assert run['flush_errors'] == 0
+    assert tiledb.list_arrays('raw') == []
+    assert tiledb.get_write_stats()['pending_rows'] == 0